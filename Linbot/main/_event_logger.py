@@ -1,6 +1,9 @@
 # main/_event_logger.py
-from typing import Callable, TypeAlias, Awaitable
+from typing import Callable, TypeAlias, Awaitable, Dict, Optional
 from functools import wraps
+import asyncio
+import random
+import time
 from event import *
 from logger import Logging, Colors
 from message_method import send_group_msg
@@ -21,38 +24,146 @@ def loggermanage(name: str=None) -> Callable[[ExperFn], ExperFn]:
         return wrapper
     return decorator
 
+class EventLogSampler:
+    """事件日志采样与汇总
+
+    sample_rates 按 "post_type" 或 "post_type.message_type" 设置记录比例（0~1），
+    后者优先；group_cap 限制每个群在一个汇总周期内最多记录的日志条数。
+    汇总由 start 启动的定时器每个周期输出一次，包括各类事件数量及最活跃群的消息数，
+    没有新事件到达时也会按时输出。
+    """
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, group_cap: Optional[int] = None,
+                 summary_interval: Optional[float] = 60.0, summary_top_groups: int = 10):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._summary_handle: Optional[asyncio.TimerHandle] = None
+        self.configure(sample_rates, group_cap, summary_interval, summary_top_groups)
+
+    def configure(self, sample_rates: Optional[Dict[str, float]] = None, group_cap: Optional[int] = None,
+                  summary_interval: Optional[float] = 60.0, summary_top_groups: int = 10):
+        self.sample_rates = dict(sample_rates or {})
+        self.group_cap = group_cap
+        self.summary_interval = summary_interval
+        self.summary_top_groups = summary_top_groups
+        self._rate_cache: Dict[tuple, float] = {}
+        self._reset_window(time.monotonic())
+        # 定时器运行中修改了汇总间隔时按新间隔重新计时
+        if self._summary_handle is not None:
+            self._schedule_summary()
+
+    def start(self):
+        """在当前事件循环中启动汇总定时器，summary_interval 为空时不输出汇总"""
+        loop = asyncio.get_running_loop()
+        if self._summary_handle is not None and self._loop is loop:
+            return
+        self._loop = loop
+        self._reset_window(time.monotonic())
+        self._schedule_summary()
+
+    def stop(self):
+        """停止汇总定时器"""
+        if self._summary_handle is not None:
+            self._summary_handle.cancel()
+            self._summary_handle = None
+
+    def _schedule_summary(self):
+        self.stop()
+        if self.summary_interval and self._loop is not None and not self._loop.is_closed():
+            self._summary_handle = self._loop.call_later(self.summary_interval, self._on_summary_timer)
+
+    def _on_summary_timer(self):
+        self._summary_handle = None
+        self.log_summary()
+        self._schedule_summary()
+
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._totals: Dict[tuple, int] = {}
+        self._group_counts: Dict[int, int] = {}
+        self._group_logged: Dict[int, int] = {}
+        self._suppressed = 0
+
+    def _sample_rate(self, post_type: str, message_type: Optional[str]) -> float:
+        key = (post_type, message_type)
+        rate = self._rate_cache.get(key)
+        if rate is None:
+            rate = self.sample_rates.get(f"{post_type}.{message_type}", self.sample_rates.get(post_type, 1.0))
+            self._rate_cache[key] = rate
+        return rate
+
+    def should_log(self, event: base_event) -> bool:
+        """统计事件，并判断这条事件是否需要输出日志"""
+        post_type = event.post_type
+        message_type = getattr(event, 'message_type', None)
+        key = (post_type, message_type)
+        self._totals[key] = self._totals.get(key, 0) + 1
+        group_id = getattr(event, 'group_id', None)
+        if group_id is not None:
+            self._group_counts[group_id] = self._group_counts.get(group_id, 0) + 1
+
+        rate = self._sample_rate(post_type, message_type)
+        if rate < 1.0 and (rate <= 0.0 or random.random() >= rate):
+            self._suppressed += 1
+            return False
+
+        if group_id is not None and self.group_cap is not None:
+            logged = self._group_logged.get(group_id, 0)
+            if logged >= self.group_cap:
+                self._suppressed += 1
+                return False
+            self._group_logged[group_id] = logged + 1
+        return True
+
+    def log_summary(self, now: Optional[float] = None):
+        """输出当前汇总周期的统计并开始新的周期"""
+        now = time.monotonic() if now is None else now
+        if self._totals:
+            elapsed = now - self._window_start
+            totals = ", ".join(f"{post_type}.{message_type} {count:,}" if message_type else f"{post_type} {count:,}"
+                               for (post_type, message_type), count in self._totals.items())
+            logger.info("[汇总] 近 %.0f 秒: %s，省略日志 %s 条", elapsed, totals, f"{self._suppressed:,}")
+            top_groups = sorted(self._group_counts.items(), key=lambda item: item[1], reverse=True)[:self.summary_top_groups]
+            for group_id, count in top_groups:
+                logger.info("[汇总] 群 %s: 近 %.0f 秒 %s 条", group_id, elapsed, f"{count:,}")
+        self._reset_window(now)
+
+# 全局事件日志采样器
+event_log_sampler = EventLogSampler()
+
 async def call_logger(fun_name: str, event: base_event) -> None:
+    if not event_log_sampler.should_log(event):
+        return
     if fun_name in fun_call_list:
         func = fun_call_list[fun_name]
         await func(event)
     else:
-        logger.warning(f"{fun_name} 暂不支持")
+        logger.warning("%s 暂不支持", fun_name)
     
 @loggermanage("message")
 async def _(event: MessageEvent) -> None:
     if event.message_type == "group":
         event: GroupMessageEvent = event
-        logger.success(f"[{event.message_type}.{event.sub_type}] 来自用户 {event.user_id} @群 {event.group_id} 的消息： {Colors.BLUE}{event.raw_message}{Colors.END}")
+        logger.success(f"[%s.%s] 来自用户 %s @群 %s 的消息： {Colors.BLUE}%s{Colors.END}", event.message_type, event.sub_type, event.user_id, event.group_id, event.raw_message)
         # 测试消息发送 - 现在应该可以正常工作了
         # await send_group_msg(f"收到来自用户 {event.user_id} @群 {event.group_id} 的消息： {event.raw_message}")
     elif event.message_type == "private":
         event: PrivateMessageEvent = event
         if event.sub_type == "friend":
-            logger.success(f"[{event.message_type}.{event.sub_type}] 来自好友 {event.user_id} 的消息： {Colors.BLUE}{event.raw_message}{Colors.END}")
+            logger.success(f"[%s.%s] 来自好友 %s 的消息： {Colors.BLUE}%s{Colors.END}", event.message_type, event.sub_type, event.user_id, event.raw_message)
         elif event.sub_type == "group":
-            logger.success(f"[{event.message_type}.{event.sub_type}] 来自用户 {event.user_id} @群 {event.sender.group_id} 的临时会话： {Colors.BLUE}{event.raw_message}{Colors.END}")
+            logger.success(f"[%s.%s] 来自用户 %s @群 %s 的临时会话： {Colors.BLUE}%s{Colors.END}", event.message_type, event.sub_type, event.user_id, event.sender.group_id, event.raw_message)
 
 @loggermanage("message_sent")
 async def _(event: MessageEvent) -> None:
     if event.message_type == "group":
         event: GroupMessageEvent = event
-        logger.success(f"[{event.message_type}.{event.sub_type}] bot向群 {event.group_id} 发送消息： {Colors.BLUE}{event.raw_message}{Colors.END}")
+        logger.success(f"[%s.%s] bot向群 %s 发送消息： {Colors.BLUE}%s{Colors.END}", event.message_type, event.sub_type, event.group_id, event.raw_message)
     elif event.message_type == "private":
         event: PrivateMessageEvent = event
         if event.sender.group_id :
-            logger.success(f"[{event.message_type}.{event.sub_type}] bot向用户 {event.target_id} @群 {event.sender.group_id} 发送临时会话消息： {Colors.BLUE}{event.raw_message}{Colors.END}")
+            logger.success(f"[%s.%s] bot向用户 %s @群 %s 发送临时会话消息： {Colors.BLUE}%s{Colors.END}", event.message_type, event.sub_type, event.target_id, event.sender.group_id, event.raw_message)
         else:
-            logger.success(f"[{event.message_type}.{event.sub_type}] bot向用户 {event.target_id} 发送好友消息： {Colors.BLUE}{event.raw_message}{Colors.END}")
+            logger.success(f"[%s.%s] bot向用户 %s 发送好友消息： {Colors.BLUE}%s{Colors.END}", event.message_type, event.sub_type, event.target_id, event.raw_message)
 
 @loggermanage("meta_event")
 async def _(event: base_event) -> None:
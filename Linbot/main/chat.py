@@ -1,26 +1,40 @@
 # main/chat.py
-from typing import Callable, TypeAlias, Awaitable, Optional
+from typing import Callable, TypeAlias, Awaitable, Optional, Iterable
 from functools import wraps
 import pydantic
 import inspect
+import asyncio
+import time
 from message_type import Messgaechat, chat_type
 from logger import Logging
-from registry import registry
-from context import EventContext, get_current_websocket
+from registry import registry, DEFAULT_PRIORITY
+from profiler import handler_profiler
+from executors import handler_executors, EXECUTION_MODES
+from context import EventContext, current_event, get_current_event, get_current_websocket
 
 logger = Logging.logger
 
 class register_meta(pydantic.BaseModel):
     name: str = None
     block: bool = False
+    """执行成功后阻止更低优先级的处理器"""
+    priority: int = DEFAULT_PRIORITY
+    """优先级，数值越小越先执行；同一优先级的处理器并发执行"""
     on_msg: Optional[Callable] = Messgaechat.on_message
     event_types: list[str] = None
+    executor: str = 'loop'
+    """执行方式：loop 在事件循环中执行；thread 在线程池中执行；process 在进程池中执行，
+    处理器须为插件模块顶层的函数。thread 和 process 下处理器可以是同步函数，不能使用共享 HTTP 客户端"""
 
     class Config:
         extra = "allow"
 
 ExperFn: TypeAlias = Callable[..., Awaitable[None]]
 
+# on_message 总是匹配，复用同一个结果对象
+_MESSAGE_MATCHED = chat_type(type=True)
+_NOT_MATCHED = chat_type(type=False)
+
 _current_plugin_name = None
 
 def set_current_plugin_name(name: str):
@@ -31,59 +45,74 @@ def clear_current_plugin_name():
     global _current_plugin_name
     _current_plugin_name = None
 
+def _plugin_name_for(func: Callable) -> str:
+    """确定函数所属的插件：优先使用正在加载的插件名，否则根据源文件路径推断"""
+    plugin_name = _current_plugin_name or "unknown"
+    
+    if plugin_name == "unknown":
+        try:
+            module = inspect.getmodule(func)
+            if module and hasattr(module, '__file__'):
+                file_path = module.__file__
+                if 'plugins' in file_path:
+                    parts = file_path.split('plugins')
+                    if len(parts) > 1:
+                        plugin_part = parts[1].lstrip('\\/')
+                        if '\\' in plugin_part:
+                            plugin_name = plugin_part.split('\\')[0]
+                        elif '/' in plugin_part:
+                            plugin_name = plugin_part.split('/')[0]
+                        else:
+                            plugin_name = plugin_part
+                    
+                    if plugin_name == '__init__.py':
+                        plugin_name = '__root__'
+                    elif plugin_name.endswith('.py'):
+                        plugin_name = plugin_name[:-3]
+        except Exception as e:
+            logger.debug(f"推断插件名称失败: {e}")
+    return plugin_name
+
 def fun_call_register(name: str = None, *fun_arg, **fun_kwarg) -> Callable[[ExperFn], ExperFn]:
     def decorator(func: ExperFn) -> ExperFn:
         @wraps(func)
         async def wrapper(*args, **kwargs) -> None:
-            # 在函数执行期间保持事件上下文
+            # 直接调用时保持事件上下文，fun_call 分派时上下文已经设置好
             event = None
-            websocket = get_current_websocket()
             
             for arg in args:
                 if isinstance(arg, pydantic.BaseModel) and hasattr(arg, 'post_type'):
                     event = arg
                     break
             
-            if event and websocket:
+            if event is None or event is get_current_event():
+                return await call(*args, **kwargs)
+            
+            websocket = get_current_websocket()
+            if websocket:
                 async with EventContext(event, websocket):
-                    return await func(*args, **kwargs)
-            elif event:
-                async with EventContext(event):
-                    return await func(*args, **kwargs)
+                    return await call(*args, **kwargs)
             else:
-                return await func(*args, **kwargs)
+                async with EventContext(event):
+                    return await call(*args, **kwargs)
         
-        # 确定插件名称
-        plugin_name = _current_plugin_name or "unknown"
+        async def call(*args, **kwargs):
+            # 在线程池或进程池中执行的处理器可以是同步函数，直接调用时在当前线程执行
+            result = func(*args, **kwargs)
+            return await result if inspect.isawaitable(result) else result
         
-        if plugin_name == "unknown":
-            try:
-                module = inspect.getmodule(func)
-                if module and hasattr(module, '__file__'):
-                    file_path = module.__file__
-                    if 'plugins' in file_path:
-                        parts = file_path.split('plugins')
-                        if len(parts) > 1:
-                            plugin_part = parts[1].lstrip('\\/')
-                            if '\\' in plugin_part:
-                                plugin_name = plugin_part.split('\\')[0]
-                            elif '/' in plugin_part:
-                                plugin_name = plugin_part.split('/')[0]
-                            else:
-                                plugin_name = plugin_part
-                        
-                        if plugin_name == '__init__.py':
-                            plugin_name = '__root__'
-                        elif plugin_name.endswith('.py'):
-                            plugin_name = plugin_name[:-3]
-            except Exception as e:
-                logger.debug(f"推断插件名称失败: {e}")
+        # 确定插件名称
+        plugin_name = _plugin_name_for(func)
         
         # 创建 register_meta 实例
         fun_arg_data = register_meta(name=name, *fun_arg, **fun_kwarg)
+        if fun_arg_data.executor not in EXECUTION_MODES:
+            raise ValueError(f"未知的执行方式: {fun_arg_data.executor}")
+        if fun_arg_data.executor == 'process' and func.__qualname__ != func.__name__:
+            raise TypeError(f"在进程池中执行的处理器必须是模块顶层的函数: {func.__qualname__}")
         
-        # 注册函数
-        func_id = registry.register(wrapper, name, plugin_name, fun_arg_data=fun_arg_data)
+        # 注册原函数，分派时直接调用，省去包装函数的开销
+        func_id = registry.register(func, name, plugin_name, fun_arg_data=fun_arg_data)
         
         # 保存注册信息到包装函数
         wrapper._fun_call_register_meta = {
@@ -96,86 +125,121 @@ def fun_call_register(name: str = None, *fun_arg, **fun_kwarg) -> Callable[[Expe
         return wrapper
     return decorator
 
-def _is_event_matching(event: pydantic.BaseModel, param_annotations: dict) -> bool:
-    """检查事件是否匹配函数的参数类型要求"""
-    if not any(param_annotations.values()):
-        return True
-    
-    for param_name, annotation in param_annotations.items():
-        if annotation is None:
-            continue
-            
-        if (inspect.isclass(annotation) and 
-            issubclass(annotation, pydantic.BaseModel)):
-            if isinstance(event, annotation):
-                return True
-            elif event.__class__.__name__ == annotation.__name__:
-                return True
-            elif annotation.__name__ == 'base_event':
-                return True
+def _hook_decorator(kind: str, func: Optional[ExperFn], after: Iterable[str]):
+    def decorator(func: ExperFn) -> ExperFn:
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"{kind} 钩子必须是异步函数: {func.__name__}")
+        registry.register_hook(kind, func, _plugin_name_for(func), tuple(after))
+        return func
+    return decorator(func) if func is not None else decorator
+
+def on_startup(func: Optional[ExperFn] = None, *, after: Iterable[str] = ()):
+    """注册插件启动钩子，在服务器开始接收事件前执行一次
     
-    return False
+    不同插件的启动钩子并发执行；after 中列出的插件会先完成启动。
+    可直接用作装饰器 @on_startup，也可写作 @on_startup(after=["db"])。
+    """
+    return _hook_decorator('startup', func, after)
+
+def on_shutdown(func: Optional[ExperFn] = None):
+    """注册插件关闭钩子，在服务器正常停止时执行；依赖本插件的插件会先关闭"""
+    return _hook_decorator('shutdown', func, ())
 
 async def fun_call(event: pydantic.BaseModel) -> None:
     """根据事件类型调用匹配的注册函数"""
+    # 每个事件只设置一次事件上下文，处理器直接调用，不再逐个进入上下文
+    event_token = current_event.set(event) if get_current_event() is not event else None
+    try:
+        await _dispatch(event)
+    finally:
+        if event_token:
+            current_event.reset(event_token)
+
+async def _call_handler(func_info: dict, call_kwargs: dict) -> bool:
+    """调用单个处理器并隔离其异常，返回是否阻断后续优先级"""
+    latency, errors = func_info['metrics']
+    start = time.perf_counter()
+    failed = False
+    try:
+        if func_info['executor'] == 'loop':
+            await func_info['function'](**call_kwargs)
+        else:
+            await handler_executors.run(func_info, call_kwargs)
+    except Exception as e:
+        failed = True
+        errors.inc()
+        logger.error(f"调用函数 {func_info['name']} (ID: {func_info['id']}) 时出错: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return False
+    finally:
+        elapsed = time.perf_counter() - start
+        latency.observe(elapsed)
+        if handler_profiler.enabled:
+            handler_profiler.record(func_info, elapsed, failed)
+    fun_arg_data = func_info['fun_arg_data']
+    return bool(fun_arg_data and fun_arg_data.block)
+
+async def _run_tier(tier: list) -> bool:
+    """并发执行同一优先级的处理器，返回是否阻断后续优先级
+    
+    第一个处理器直接在分派事件的任务中执行，其余的各自在新任务中执行，
+    只有一个处理器的优先级不创建任务。
+    """
+    if len(tier) == 1:
+        return await _call_handler(*tier[0])
+    tasks = [asyncio.ensure_future(_call_handler(func_info, call_kwargs)) for func_info, call_kwargs in tier[1:]]
+    try:
+        blocked = await _call_handler(*tier[0])
+        return any(await asyncio.gather(*tasks)) or blocked
+    finally:
+        # 分派被取消时不留下仍在运行的处理器
+        for task in tasks:
+            task.cancel()
+
+async def _dispatch(event: pydantic.BaseModel) -> None:
     event_type = getattr(event, 'post_type', None)
     
-    # 从注册器获取所有函数
-    functions = registry.get_functions()
+    # 从分派索引获取可能匹配该事件的函数及其参数绑定方式，已按优先级排序
+    functions = registry.get_handlers(event_type, event.__class__)
     
-    for func_info in functions:
-        func_id = func_info['id']
-        name = func_info['name']
-        func = func_info['function']
-        param_annotations = func_info['param_annotations']
-        signature = func_info['signature']
-        original_name = func_info['original_name']
-        fun_arg_data = func_info.get('fun_arg_data')
-        
-        
-        # 检查事件类型过滤
-        if fun_arg_data and fun_arg_data.event_types and event_type and event_type not in fun_arg_data.event_types:
-            continue
+    msg_content = getattr(event, 'raw_message', '') if hasattr(event, 'raw_message') else ''
+    # 本事件匹配到的指令，首次遇到指令处理器时通过前缀树一次性计算
+    commands = None
+    
+    # 当前优先级中已匹配、等待执行的处理器
+    tier = []
+    tier_priority = None
+    
+    for func_info, (event_param_names, bind_commandargs) in functions:
+        # 进入下一个优先级前先执行完当前优先级
+        if tier and func_info['priority'] != tier_priority:
+            if await _run_tier(tier):
+                return
+            tier = []
+        tier_priority = func_info['priority']
         
-        # 检查参数类型匹配
-        if not _is_event_matching(event, param_annotations):
-            continue
+        name = func_info['name']
         
         # 消息匹配逻辑
-        msg_content = getattr(event, 'raw_message', '') if hasattr(event, 'raw_message') else ''
-        
-        # 使用 register_meta 中定义的 on_msg 函数
-        on_msg_func = Messgaechat.on_message
-        if fun_arg_data and fun_arg_data.on_msg:
-            on_msg_func = fun_arg_data.on_msg
-            
-        match_result: chat_type = on_msg_func(name, msg_content)
+        matcher = func_info['matcher']
+        if matcher == 'message':
+            match_result = _MESSAGE_MATCHED
+        elif matcher == 'command':
+            if commands is None:
+                commands = registry.get_command_trie().match(msg_content)
+            match_result = commands.get(name, _NOT_MATCHED)
+        else:
+            match_result: chat_type = func_info['fun_arg_data'].on_msg(name, msg_content)
         
+        if not match_result.type:
+            continue
         
-        if match_result.type:
-            
-            # 构建参数字典
-            call_kwargs = {}
-            for param_name in signature.parameters:
-                annotation = param_annotations.get(param_name)
-                if (annotation and 
-                    inspect.isclass(annotation) and 
-                    issubclass(annotation, pydantic.BaseModel) and
-                    _is_event_matching(event, {param_name: annotation})):
-                    call_kwargs[param_name] = event
-                elif param_name == 'commandargs' and hasattr(match_result, 'commandargs'):
-                    call_kwargs[param_name] = match_result.commandargs
-            
-            try:
-                block = fun_arg_data.block if fun_arg_data else False
-                if block:
-                    await func(**call_kwargs)
-                    break
-                else:
-                    await func(**call_kwargs)
-            except Exception as e:
-                logger.error(f"调用函数 {name} (ID: {func_id}) 时出错: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-        else:
-            pass
\ No newline at end of file
+        # 按注册时计算好的方式绑定参数
+        call_kwargs = dict.fromkeys(event_param_names, event)
+        if bind_commandargs:
+            call_kwargs['commandargs'] = match_result.commandargs
+        tier.append((func_info, call_kwargs))
+    
+    if tier:
+        await _run_tier(tier)
@@ -0,0 +1,85 @@
+# main/codec.py
+import os
+import json
+from typing import Any, Callable, Dict, Optional, Union
+from logger import Logging
+
+logger = Logging.logger
+
+class JsonCodec:
+    """JSON 编解码器：decode 接受 str 或 bytes，encode 输出 UTF-8 编码的 bytes"""
+
+    def __init__(self, name: str, decode: Callable[[Union[str, bytes]], Any], encode: Callable[[Any], bytes]):
+        self.name = name
+        self.decode = decode
+        self.encode = encode
+
+    def __repr__(self):
+        return f"JsonCodec({self.name!r})"
+
+def _stdlib_codec() -> JsonCodec:
+    def encode(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return JsonCodec('json', json.loads, encode)
+
+def _orjson_codec() -> Optional[JsonCodec]:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return JsonCodec('orjson', orjson.loads, orjson.dumps)
+
+def _msgspec_codec() -> Optional[JsonCodec]:
+    try:
+        import msgspec
+    except ImportError:
+        return None
+    return JsonCodec('msgspec', msgspec.json.decode, msgspec.json.Encoder().encode)
+
+# 自动选择时的优先顺序
+_BACKENDS: Dict[str, Callable[[], Optional[JsonCodec]]] = {
+    'orjson': _orjson_codec,
+    'msgspec': _msgspec_codec,
+    'json': _stdlib_codec,
+}
+
+def available_codecs() -> Dict[str, JsonCodec]:
+    """当前环境中可用的编解码器"""
+    codecs = {}
+    for name, factory in _BACKENDS.items():
+        backend = factory()
+        if backend is not None:
+            codecs[name] = backend
+    return codecs
+
+def select_codec(name: Optional[str] = None) -> JsonCodec:
+    """按名称选择编解码器；未指定时依次尝试 orjson、msgspec，最后使用标准库"""
+    if name:
+        if name not in _BACKENDS:
+            raise ValueError(f"未知的 JSON 后端: {name}")
+        backend = _BACKENDS[name]()
+        if backend is None:
+            raise ImportError(f"JSON 后端 {name} 未安装")
+        return backend
+    for factory in _BACKENDS.values():
+        backend = factory()
+        if backend is not None:
+            return backend
+
+def set_codec(name: Optional[str] = None) -> JsonCodec:
+    """切换全局使用的编解码器"""
+    global codec
+    codec = select_codec(name)
+    logger.debug(f"使用 JSON 后端: {codec.name}")
+    return codec
+
+def decode(data: Union[str, bytes]) -> Any:
+    """解码一帧 JSON，bytes 无需先转为 str"""
+    return codec.decode(data)
+
+def encode(obj: Any) -> bytes:
+    """编码为 UTF-8 JSON"""
+    return codec.encode(obj)
+
+# 全局编解码器，可通过环境变量 LINBOT_JSON 指定后端
+codec: JsonCodec = select_codec(os.environ.get('LINBOT_JSON') or None)
@@ -0,0 +1,138 @@
+# main/connections.py
+import time
+from typing import Dict, Optional
+from aiohttp import web
+from logger import Logging
+from event import base_event
+from context import get_current_websocket
+
+logger = Logging.logger
+
+class BotConnection:
+    """一个 OneBot 实现的 WebSocket 连接"""
+    __slots__ = ('ws', 'self_id', 'groups', 'in_flight', 'requests', 'connected_at', 'last_heartbeat')
+
+    def __init__(self, ws: web.WebSocketResponse, self_id: Optional[int] = None):
+        self.ws = ws
+        self.self_id = self_id
+        """机器人QQ号，收到带 self_id 的上报或握手头之前为 None"""
+        self.groups: set = set()
+        """从上报中观察到的该账号所在的群"""
+        self.in_flight = 0
+        """正在等待响应的请求数"""
+        self.requests = 0
+        """累计发出的请求数"""
+        self.connected_at = time.time()
+        self.last_heartbeat: Optional[float] = None
+
+class ConnectionRegistry:
+    """按 self_id 索引的连接表
+
+    连接建立时登记，self_id 来自握手头 X-Self-ID，或之后的生命周期、心跳等任意上报。
+    不在事件上下文中的发送（定时任务、启动钩子等）通过这里找到连接。
+    """
+
+    def __init__(self):
+        self._by_ws: Dict[web.WebSocketResponse, BotConnection] = {}
+        self._by_self_id: Dict[int, BotConnection] = {}
+
+    def add(self, ws: web.WebSocketResponse, self_id: Optional[int] = None) -> BotConnection:
+        """登记新连接"""
+        connection = self._by_ws[ws] = BotConnection(ws)
+        if self_id is not None:
+            self._bind(connection, self_id)
+        return connection
+
+    def remove(self, ws: web.WebSocketResponse):
+        """移除已关闭的连接"""
+        connection = self._by_ws.pop(ws, None)
+        if connection is not None and self._by_self_id.get(connection.self_id) is connection:
+            del self._by_self_id[connection.self_id]
+
+    def _bind(self, connection: BotConnection, self_id: int):
+        previous = self._by_self_id.get(self_id)
+        if previous is not None and previous is not connection:
+            # 同一账号重连时旧连接可能尚未关闭，以新连接为准
+            connection.groups |= previous.groups
+            logger.info(f"账号 {self_id} 使用新的连接")
+        if connection.self_id is not None and self._by_self_id.get(connection.self_id) is connection:
+            del self._by_self_id[connection.self_id]
+        connection.self_id = self_id
+        self._by_self_id[self_id] = connection
+        logger.info(f"账号 {self_id} 已连接，当前账号数: {len(self._by_self_id)}")
+
+    def observe(self, ws: web.WebSocketResponse, event: base_event):
+        """根据收到的上报更新连接信息"""
+        connection = self._by_ws.get(ws)
+        if connection is None:
+            return
+        self_id = event.self_id
+        if self_id is not None and self_id != connection.self_id:
+            self._bind(connection, self_id)
+
+        post_type = event.post_type
+        if post_type == 'meta_event':
+            if getattr(event, 'meta_event_type', None) == 'heartbeat':
+                connection.last_heartbeat = time.time()
+        elif post_type in ('message', 'notice'):
+            group_id = getattr(event, 'group_id', None)
+            if group_id is None:
+                return
+            if (post_type == 'notice' and getattr(event, 'notice_type', None) == 'group_decrease'
+                    and getattr(event, 'user_id', None) == connection.self_id):
+                connection.groups.discard(group_id)
+            else:
+                connection.groups.add(group_id)
+
+    def get(self, self_id: int) -> Optional[BotConnection]:
+        """按 self_id 获取连接"""
+        return self._by_self_id.get(self_id)
+
+    def for_websocket(self, ws: web.WebSocketResponse) -> Optional[BotConnection]:
+        return self._by_ws.get(ws)
+
+    def resolve(self, self_id: Optional[int] = None) -> Optional[BotConnection]:
+        """确定请求使用的连接
+
+        指定 self_id 时使用该账号的连接；否则使用当前事件所在的连接；
+        不在事件上下文中时使用最早连接的账号。
+        """
+        if self_id is not None:
+            return self._by_self_id.get(self_id)
+        ws = get_current_websocket()
+        if ws is not None:
+            return self._by_ws.get(ws)
+        for connection in self._by_self_id.values():
+            return connection
+        return None
+
+    def pick(self, group_id: Optional[int] = None) -> Optional[BotConnection]:
+        """选择负载最低的账号；指定 group_id 时只在已知在该群中的账号里选择，没有则在全部账号中选择"""
+        connections = self._by_self_id.values()
+        if group_id is not None:
+            members = [connection for connection in connections if group_id in connection.groups]
+            if members:
+                connections = members
+        return min(connections, key=lambda connection: (connection.in_flight, connection.requests), default=None)
+
+    @property
+    def accounts(self) -> list:
+        """已连接的账号"""
+        return list(self._by_self_id)
+
+    def __len__(self) -> int:
+        return len(self._by_ws)
+
+    def stats(self) -> list:
+        """各连接的状态"""
+        return [{
+            'self_id': connection.self_id,
+            'groups': len(connection.groups),
+            'in_flight': connection.in_flight,
+            'requests': connection.requests,
+            'connected_at': connection.connected_at,
+            'last_heartbeat': connection.last_heartbeat,
+        } for connection in self._by_ws.values()]
+
+# 全局连接表
+connection_registry = ConnectionRegistry()
@@ -2,7 +2,9 @@
 import contextvars
 from typing import Optional, Any
 from aiohttp import web
+import aiohttp
 from event import base_event
+from http_client import http_client
 
 # 全局上下文变量
 current_event: contextvars.ContextVar[Optional[base_event]] = contextvars.ContextVar('current_event', default=None)
@@ -38,3 +40,10 @@ def get_current_event() -> Optional[base_event]:
 def get_current_websocket() -> Optional[web.WebSocketResponse]:
     """获取当前 WebSocket 连接"""
     return current_websocket.get()
+
+def get_http_session() -> aiohttp.ClientSession:
+    """获取服务器共享的 HTTP 客户端会话，插件应复用它而不是自行创建或关闭
+
+    会话只能在主事件循环中使用，线程池和进程池中的处理器需要自行创建 ClientSession。
+    """
+    return http_client.session
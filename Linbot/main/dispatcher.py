@@ -0,0 +1,257 @@
+# main/dispatcher.py
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional, Iterable
+from aiohttp import web
+from logger import Logging
+from event import base_event
+from context import EventContext
+from _event_logger import call_logger, event_log_sampler
+from plugins_manager import plugin_manager
+from metrics import events_total, event_dispatch_seconds
+
+logger = Logging.logger
+
+# 队列满时的处理策略
+OVERLOAD_POLICIES = ('block', 'drop_oldest', 'drop_meta', 'reject')
+
+class EventQueue:
+    """有界事件队列，队列满时按策略处理新事件
+
+    - drop_oldest：丢弃队列中最早的事件（默认），读取端从不阻塞
+    - block：阻塞读取端直到有空位
+    - drop_meta：优先丢弃心跳等 meta_event，没有可丢弃的事件时阻塞
+    - reject：直接拒绝 reject_post_types 中的事件，其他事件阻塞
+
+    注意：读取端被阻塞时同一连接上的 API 响应也无法读取，
+    等待响应的处理器只能等到超时，因此会阻塞的策略需要足够大的队列。
+    """
+
+    def __init__(self, maxsize: int = 1000, policy: str = 'drop_oldest',
+                 reject_post_types: Iterable[str] = ('meta_event',)):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"未知的过载策略: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.reject_post_types = frozenset(reject_post_types)
+        self._items: deque = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self.max_depth = 0
+        """队列深度峰值"""
+        self.dropped: Dict[str, int] = {}
+        """按 post_type 统计的丢弃数量"""
+        self._last_drop_warning = 0.0
+
+    @property
+    def depth(self) -> int:
+        """当前队列深度"""
+        return len(self._items)
+
+    async def put(self, event: base_event, websocket: Optional[web.WebSocketResponse] = None) -> bool:
+        """放入事件，返回事件是否被接收"""
+        post_type = event.post_type
+        while len(self._items) >= self.maxsize:
+            if self.policy == 'drop_oldest':
+                self._drop(self._items.popleft()[0])
+                break
+            elif self.policy == 'drop_meta':
+                if post_type == 'meta_event':
+                    self._drop(event)
+                    return False
+                if self._drop_first_meta():
+                    break
+            elif self.policy == 'reject' and post_type in self.reject_post_types:
+                self._drop(event)
+                return False
+            # 阻塞读取端直到有空位
+            self._not_full.clear()
+            await self._not_full.wait()
+
+        self._items.append((event, websocket))
+        if len(self._items) > self.max_depth:
+            self.max_depth = len(self._items)
+        self._not_empty.set()
+        return True
+
+    async def get(self) -> tuple:
+        """取出最早的 (事件, 连接)"""
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        item = self._items.popleft()
+        self._not_full.set()
+        return item
+
+    def _drop_first_meta(self) -> bool:
+        """丢弃队列中最早的 meta_event"""
+        for item in self._items:
+            if item[0].post_type == 'meta_event':
+                self._items.remove(item)
+                self._drop(item[0])
+                return True
+        return False
+
+    def _drop(self, event: base_event, where: Optional[str] = None):
+        post_type = event.post_type
+        self.dropped[post_type] = self.dropped.get(post_type, 0) + 1
+        # 过载时避免每丢弃一条就输出一次日志
+        now = time.monotonic()
+        if now - self._last_drop_warning >= 10:
+            self._last_drop_warning = now
+            logger.warning(f"{where or f'事件队列已满（{self.maxsize}）'}，按 {self.policy} 策略丢弃事件，累计丢弃: {self.dropped}")
+
+    def overflow(self, items: deque, item: tuple, where: str) -> bool:
+        """按过载策略把 item 放入已满的 items，从不等待，返回 item 是否被接收
+
+        drop_meta 和 reject 先按各自的规则丢弃；没有可丢弃的事件时，
+        以及 block、drop_oldest 策略下，丢弃 items 中最早的事件。
+        """
+        post_type = item[0].post_type
+        if ((self.policy == 'drop_meta' and post_type == 'meta_event')
+                or (self.policy == 'reject' and post_type in self.reject_post_types)):
+            self._drop(item[0], where)
+            return False
+        dropped = None
+        if self.policy == 'drop_meta':
+            dropped = next((queued for queued in items if queued[0].post_type == 'meta_event'), None)
+        if dropped is not None:
+            items.remove(dropped)
+        else:
+            dropped = items.popleft()
+        self._drop(dropped[0], where)
+        items.append(item)
+        return True
+
+    def stats(self) -> dict:
+        """队列状态"""
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'maxsize': self.maxsize,
+            'policy': self.policy,
+            'dropped': dict(self.dropped),
+        }
+
+def session_key(event: base_event) -> Optional[tuple]:
+    """事件所属的会话：群事件按 group_id，其余按 user_id；没有会话的事件返回 None"""
+    group_id = getattr(event, 'group_id', None)
+    if group_id is not None:
+        return ('group', group_id)
+    user_id = getattr(event, 'user_id', None)
+    if user_id is not None:
+        return ('private', user_id)
+    return None
+
+class _Session:
+    """正在处理中的会话：排队等待处理的事件"""
+    __slots__ = ('pending',)
+
+    def __init__(self):
+        self.pending: deque = deque()
+
+class EventDispatcher:
+    """事件分派器：读取端把事件放入有界队列，由固定数量的工作协程处理
+
+    ordered 为 True 时同一会话的事件严格按到达顺序处理，不同会话之间并行。
+    会话的排队事件超过 session_queue_size 时按队列的过载策略丢弃，工作协程从不在会话上等待，
+    一个繁忙的会话不会占住其他会话的工作协程。
+    会话处理完所有排队事件后即被移除，不会随见过的群数量增长。
+    """
+
+    def __init__(self, workers: int = 16, queue_size: int = 1000, policy: str = 'drop_oldest',
+                 reject_post_types: Iterable[str] = ('meta_event',), ordered: bool = True,
+                 session_queue_size: int = 100):
+        if session_queue_size < 1:
+            raise ValueError(f"会话队列上限必须不小于 1: {session_queue_size}")
+        self.workers = workers
+        self.queue = EventQueue(queue_size, policy, reject_post_types)
+        self.ordered = ordered
+        self.session_queue_size = session_queue_size
+        self._sessions: Dict[tuple, _Session] = {}
+        self._tasks: list[asyncio.Task] = []
+        # 按 post_type 缓存的 (事件计数, 分派耗时) 指标
+        self._metrics: Dict[str, tuple] = {}
+
+    def start(self):
+        """启动工作协程"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        event_log_sampler.start()
+        logger.debug(f"事件分派器已启动，工作协程数: {self.workers}，队列容量: {self.queue.maxsize}，过载策略: {self.queue.policy}")
+
+    async def stop(self):
+        """停止工作协程"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        event_log_sampler.stop()
+        self._sessions.clear()
+
+    async def submit(self, event: base_event, websocket: Optional[web.WebSocketResponse] = None) -> bool:
+        """提交事件，返回事件是否被接收"""
+        return await self.queue.put(event, websocket)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            key = session_key(item[0]) if self.ordered else None
+            if key is None:
+                await self._handle(*item)
+                continue
+
+            session = self._sessions.get(key)
+            if session is not None:
+                # 会话正在由其他工作协程处理，排到它的队列里以保持顺序
+                self._enqueue(session, item, key)
+                continue
+
+            session = self._sessions[key] = _Session()
+            try:
+                await self._run_session(session, item)
+            finally:
+                del self._sessions[key]
+
+    def _enqueue(self, session: _Session, item: tuple, key: tuple) -> bool:
+        """放入会话队列；队列已满时按过载策略丢弃，不等待"""
+        if len(session.pending) < self.session_queue_size:
+            session.pending.append(item)
+            return True
+        return self.queue.overflow(session.pending, item, f"会话 {key[0]} {key[1]} 排队事件已满（{self.session_queue_size}）")
+
+    async def _run_session(self, session: _Session, item: tuple):
+        """依次处理会话中的事件，直到队列为空"""
+        while True:
+            await self._handle(*item)
+            if not session.pending:
+                return
+            item = session.pending.popleft()
+
+    async def _handle(self, event: base_event, websocket: Optional[web.WebSocketResponse]):
+        post_type = event.post_type
+        event_metrics = self._metrics.get(post_type)
+        if event_metrics is None:
+            event_metrics = self._metrics[post_type] = (events_total.labels(post_type),
+                                                        event_dispatch_seconds.labels(post_type))
+        start = time.perf_counter()
+        try:
+            async with EventContext(event, websocket):
+                await call_logger(post_type, event)
+                await plugin_manager.handle_event(post_type, event)
+        except Exception as e:
+            logger.error(f"处理事件时出错: {e}")
+        finally:
+            event_metrics[0].inc()
+            event_metrics[1].observe(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        """分派器状态"""
+        stats = self.queue.stats()
+        stats['workers'] = len(self._tasks)
+        stats['active_sessions'] = len(self._sessions)
+        stats['session_pending'] = sum(len(session.pending) for session in self._sessions.values())
+        return stats
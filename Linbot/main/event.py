@@ -1,15 +1,23 @@
 import pydantic
+from typing import ClassVar
+
+def _wrap_dict_fields(model: pydantic.BaseModel):
+    """将模型中仍为字典的字段转换为 fix_event，使其支持属性访问"""
+    for field_name, field_value in model.__dict__.items():
+        if isinstance(field_value, dict):
+            model.__dict__[field_name] = fix_event.model_validate(field_value)
+    extra = model.__pydantic_extra__
+    if extra:
+        for field_name, field_value in extra.items():
+            if isinstance(field_value, dict):
+                extra[field_name] = fix_event.model_validate(field_value)
 
 class fix_event(pydantic.BaseModel):
     class Config:
         extra = "allow"
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
+
+    def model_post_init(self, __context):
+        _wrap_dict_fields(self)
 
 class base_event(pydantic.BaseModel):
     time: int = None
@@ -22,13 +30,8 @@ class base_event(pydantic.BaseModel):
     class Config:
         extra = "allow"
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
+    def model_post_init(self, __context):
+        _wrap_dict_fields(self)
 
 class SendReturn(base_event):
     status: str
@@ -40,13 +43,6 @@ class SendReturn(base_event):
 
     class Config:
         extra = "allow"
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
 
 class Sender(pydantic.BaseModel):
     """发送者"""
@@ -65,13 +61,9 @@ class Sender(pydantic.BaseModel):
 
     class Config:
         extra = "allow"
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
+
+    def model_post_init(self, __context):
+        _wrap_dict_fields(self)
 
 class Message(pydantic.BaseModel):
     """消息内容"""
@@ -82,13 +74,9 @@ class Message(pydantic.BaseModel):
 
     class Config:
         extra = "allow"
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
+
+    def model_post_init(self, __context):
+        _wrap_dict_fields(self)
 
 class MessageEvent(base_event):
     """消息事件"""
@@ -118,13 +106,6 @@ class MessageEvent(base_event):
 
     class Config:
         extra = "allow"
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
 
 class GroupMessageEvent(MessageEvent):
     """群消息事件"""
@@ -138,14 +119,6 @@ class GroupMessageEvent(MessageEvent):
     class Config:
         extra = "allow"
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
-            else:
-                setattr(self, field_name, field_value)
-
 class PrivateMessageEvent(MessageEvent):
     """私聊消息事件"""
     target_id: int
@@ -154,10 +127,134 @@ class PrivateMessageEvent(MessageEvent):
     class Config:
         extra = "allow"
 
-    def __init__(self, **data):
-        super().__init__(**data)
+class _LazyField:
+    """延迟字段：首次访问时才将原始字典构建为子对象"""
+
+    def __init__(self, name: str, model: type[pydantic.BaseModel]):
+        self.name = name
+        self.model = model
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            value = instance.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(f"{owner.__name__!r} object has no attribute {self.name!r}") from None
+        if isinstance(value, dict):
+            value = self.model.model_validate(value)
+            instance.__dict__[self.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+class LazyEvent:
+    """延迟事件视图
+
+    直接持有解码后的字典，跳过校验；Sender 等子对象以及字典类型的字段
+    只在第一次被访问时才构建。需与具体事件类一起继承，以保持 isinstance 兼容。
+    """
+
+    _lazy_defaults: ClassVar[dict] = {}
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        cls._lazy_defaults = {}
+        for field_name, field_info in cls.model_fields.items():
+            if not field_info.is_required():
+                cls._lazy_defaults[field_name] = field_info.get_default()
+            annotation = field_info.annotation
+            if isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel):
+                setattr(cls, field_name, _LazyField(field_name, annotation))
+            elif annotation is dict:
+                setattr(cls, field_name, _LazyField(field_name, fix_event))
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """由解码后的字典直接构建事件视图，不做校验和拷贝以外的任何处理"""
+        fields = cls.__pydantic_fields__
+        values = cls._lazy_defaults.copy()
+        extra = {}
         for field_name, field_value in data.items():
-            if isinstance(field_value, dict):
-                setattr(self, field_name, fix_event(**field_value))
+            if field_name in fields:
+                values[field_name] = field_value
             else:
-                setattr(self, field_name, field_value)
+                extra[field_name] = field_value
+        event = cls.__new__(cls)
+        object.__setattr__(event, '__dict__', values)
+        object.__setattr__(event, '__pydantic_extra__', extra)
+        object.__setattr__(event, '__pydantic_fields_set__', fields.keys() & data.keys())
+        object.__setattr__(event, '__pydantic_private__', None)
+        return event
+
+    def model_post_init(self, __context):
+        pass
+
+    def __getattr__(self, name: str):
+        value = super().__getattr__(name)
+        if isinstance(value, dict):
+            value = fix_event.model_validate(value)
+            self.__pydantic_extra__[name] = value
+        return value
+
+    def materialize(self):
+        """立即构建所有尚未构建的子对象"""
+        for field_name in self.__dict__:
+            getattr(self, field_name)
+        if self.__pydantic_extra__:
+            for field_name in self.__pydantic_extra__:
+                getattr(self, field_name)
+        return self
+
+    def model_dump(self, **kwargs):
+        self.materialize()
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs):
+        self.materialize()
+        return super().model_dump_json(**kwargs)
+
+class LazyBaseEvent(LazyEvent, base_event):
+    """延迟构建的通用事件"""
+
+class LazyMessageEvent(LazyEvent, MessageEvent):
+    """延迟构建的消息事件"""
+
+class LazyGroupMessageEvent(LazyEvent, GroupMessageEvent):
+    """延迟构建的群消息事件"""
+
+class LazyPrivateMessageEvent(LazyEvent, PrivateMessageEvent):
+    """延迟构建的私聊消息事件"""
+
+# 事件类型分派表：(post_type, message_type) -> 事件类
+_EVENT_CLASSES: dict[tuple, type[base_event]] = {
+    ("message", "group"): GroupMessageEvent,
+    ("message", "private"): PrivateMessageEvent,
+}
+
+# 延迟模式下使用的事件类
+_LAZY_EVENT_CLASSES: dict[type[base_event], type[base_event]] = {
+    base_event: LazyBaseEvent,
+    MessageEvent: LazyMessageEvent,
+    GroupMessageEvent: LazyGroupMessageEvent,
+    PrivateMessageEvent: LazyPrivateMessageEvent,
+}
+
+def get_event_class(data: dict) -> type[base_event]:
+    """根据上报数据的 post_type/message_type 确定事件类"""
+    post_type = data.get("post_type")
+    if post_type == "message":
+        return _EVENT_CLASSES.get((post_type, data.get("message_type")), MessageEvent)
+    return base_event
+
+def parse_event(data: dict, lazy: bool = False) -> base_event:
+    """将上报的 JSON 数据一次性解析为最终的事件对象
+
+    lazy 为 True 时返回延迟事件视图，不做字段校验，子对象在访问时才构建。
+    """
+    event_class = get_event_class(data)
+    if lazy:
+        return _LAZY_EVENT_CLASSES[event_class].from_dict(data)
+    return event_class.model_validate(data)
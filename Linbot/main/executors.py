@@ -0,0 +1,263 @@
+# main/executors.py
+import asyncio
+import concurrent.futures
+import contextvars
+import inspect
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+import pydantic
+from logger import Logging
+import codec
+from event import parse_event
+from context import current_event
+from message_method import message_sender
+from response_handler import response_handler
+
+logger = Logging.logger
+
+# 处理器的执行方式：loop 在事件循环中直接 await，thread 在线程池中执行，process 在进程池中执行
+EXECUTION_MODES = ('loop', 'thread', 'process')
+
+# 每个工作线程（以及进程池子进程）各自持有一个事件循环，在多次调用之间复用
+_local = threading.local()
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop
+
+def _run_in_thread(func: Callable, kwargs: dict) -> float:
+    """在线程池中调用处理器，异步处理器在本线程的事件循环中运行，返回耗时"""
+    start = time.perf_counter()
+    result = func(**kwargs)
+    if inspect.iscoroutine(result):
+        _worker_loop().run_until_complete(result)
+    return time.perf_counter() - start
+
+# 进程池子进程中已找到的处理器：(插件名, 模块名, 函数名) -> 函数
+_process_functions: Dict[tuple, Callable] = {}
+
+def _load_function(plugins_base_dir: str, plugin_name: str, module_name: str, function_name: str) -> Callable:
+    key = (plugin_name, module_name, function_name)
+    func = _process_functions.get(key)
+    if func is None:
+        from plugins_manager import plugin_manager
+        if plugin_name not in plugin_manager.plugins:
+            plugin_manager.plugins_base_dir = plugins_base_dir
+            plugin_manager._load_single_plugin(plugin_name, *plugin_manager._plugin_location(plugin_name))
+        # 插件入口模块不在 sys.modules 中，子模块在
+        module = plugin_manager.plugins[plugin_name] if module_name == plugin_name else sys.modules[module_name]
+        func = _process_functions[key] = inspect.unwrap(getattr(module, function_name))
+    return func
+
+def _run_in_process(requests, responses, plugins_base_dir: str, plugin_name: str, module_name: str,
+                    function_name: str, event_data: Optional[dict], event_param_names: tuple,
+                    extra_kwargs: dict) -> float:
+    """在进程池子进程中调用处理器，返回耗时
+
+    子进程没有连接：处理器发出的请求帧经 requests 队列交给主进程发出，
+    主进程把真实的响应放回 responses 队列。处理器返回后向两个队列各放入 None 表示结束。
+    """
+    start = time.perf_counter()
+    func = _load_function(plugins_base_dir, plugin_name, module_name, function_name)
+    event = parse_event(event_data, lazy=True) if event_data is not None else None
+    kwargs = dict.fromkeys(event_param_names, event)
+    kwargs.update(extra_kwargs)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+
+        def read_responses():
+            while True:
+                response = responses.get()
+                if response is None:
+                    return
+                loop.call_soon_threadsafe(response_handler.handle_response, response)
+
+        reader = threading.Thread(target=read_responses, daemon=True)
+        reader.start()
+
+        async def relay(frame: bytes, target: Optional[tuple], self_id: Optional[int], echo):
+            # 主进程总会回复（失败时回复 retcode -1），超时由主进程计算
+            requests.put((frame, self_id, echo))
+
+        message_sender.relay = relay
+        try:
+            result = func(**kwargs)
+            if inspect.isawaitable(result):
+                await result
+        finally:
+            responses.put(None)
+            requests.put(None)
+            reader.join()
+
+    token = current_event.set(event)
+    try:
+        _worker_loop().run_until_complete(run())
+    finally:
+        current_event.reset(token)
+    return time.perf_counter() - start
+
+def _next_request(requests, done: concurrent.futures.Future) -> Optional[tuple]:
+    """在线程中等待子进程的下一个请求，子进程结束（包括异常退出）后返回 None"""
+    while True:
+        try:
+            return requests.get(timeout=0.2)
+        except queue.Empty:
+            if done.done():
+                return None
+
+class _Pool:
+    __slots__ = ('executor', 'workers', 'submitted', 'completed', 'busy_seconds')
+
+    def __init__(self, executor: concurrent.futures.Executor, workers: int):
+        self.executor = executor
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+
+class HandlerExecutors:
+    """在线程池或进程池中执行处理器
+
+    线程池中的处理器可以是同步函数，也可以是异步函数。每个工作线程有一个复用的事件循环，
+    异步处理器在其中运行；处理器中的请求和 onebot_api 查询交回主事件循环执行，调用方照常得到响应。
+    共享 HTTP 客户端的会话属于主事件循环，不能在线程池中使用，需要时在处理器中自行创建 ClientSession。
+    进程池中的处理器必须是插件模块顶层的函数，事件以字典形式传给子进程，子进程按需导入插件，
+    但不执行插件的启动钩子，也没有共享 HTTP 客户端。子进程中的请求经队列交给主进程发出，
+    处理器等到的是真实的响应，查询接口同样可用，每个请求多出一次进程间往返。
+    两个池都在第一次使用时才创建。
+    """
+
+    def __init__(self, thread_workers: Optional[int] = None, process_workers: Optional[int] = None):
+        self.configure(thread_workers, process_workers)
+        self._pools: Dict[str, _Pool] = {}
+        self._manager = None
+        """multiprocessing 管理器，提供与子进程交换请求和响应的队列；重建进程池时保留"""
+
+    def configure(self, thread_workers: Optional[int] = None, process_workers: Optional[int] = None):
+        """设置线程池和进程池的大小，为空时使用 concurrent.futures 的默认值"""
+        cpu_count = os.cpu_count() or 1
+        self.thread_workers = thread_workers or min(32, cpu_count + 4)
+        self.process_workers = process_workers or cpu_count
+
+    def _pool(self, mode: str) -> _Pool:
+        pool = self._pools.get(mode)
+        if pool is None:
+            if mode == 'thread':
+                executor = concurrent.futures.ThreadPoolExecutor(self.thread_workers, thread_name_prefix='linbot-handler')
+                pool = _Pool(executor, self.thread_workers)
+            else:
+                # 不使用 fork：主进程中已有事件循环和线程
+                context = multiprocessing.get_context('spawn')
+                executor = concurrent.futures.ProcessPoolExecutor(self.process_workers, mp_context=context)
+                pool = _Pool(executor, self.process_workers)
+                if self._manager is None:
+                    self._manager = context.Manager()
+            self._pools[mode] = pool
+            # 线程中发出的请求需要交回这个事件循环
+            message_sender.loop = asyncio.get_running_loop()
+            logger.debug(f"处理器{'线程池' if mode == 'thread' else '进程池'}已创建，大小: {pool.workers}")
+        return pool
+
+    @staticmethod
+    def _process_payload(func_info: dict, call_kwargs: dict) -> tuple:
+        """子进程调用处理器所需的参数：插件位置、函数名和事件字典，都可以直接 pickle"""
+        from plugins_manager import plugin_manager
+        func = func_info['function']
+        event = None
+        event_param_names = []
+        extra_kwargs = {}
+        for name, value in call_kwargs.items():
+            if isinstance(value, pydantic.BaseModel):
+                event = value
+                event_param_names.append(name)
+            else:
+                extra_kwargs[name] = value
+        event_data = event.model_dump(exclude_none=True) if event is not None else None
+        return (plugin_manager.plugins_base_dir, func_info['plugin'], func.__module__, func.__name__,
+                event_data, tuple(event_param_names), extra_kwargs)
+
+    async def run(self, func_info: dict, call_kwargs: dict):
+        """按处理器注册的执行方式调用它"""
+        mode = func_info['executor']
+        pool = self._pool(mode)
+        loop = asyncio.get_running_loop()
+        pool.submitted += 1
+        try:
+            if mode == 'thread':
+                # 带上事件上下文，线程中的处理器同样可以使用 get_current_event
+                context = contextvars.copy_context()
+                elapsed = await loop.run_in_executor(pool.executor, context.run, _run_in_thread,
+                                                     func_info['function'], call_kwargs)
+            else:
+                elapsed = await self._run_process(pool, func_info, call_kwargs)
+            pool.busy_seconds += elapsed
+        finally:
+            pool.completed += 1
+
+    async def _run_process(self, pool: _Pool, func_info: dict, call_kwargs: dict) -> float:
+        """在子进程中调用处理器，同时替它发出请求并把响应送回"""
+        loop = asyncio.get_running_loop()
+        requests, responses = self._manager.Queue(), self._manager.Queue()
+        done = pool.executor.submit(_run_in_process, requests, responses,
+                                    *self._process_payload(func_info, call_kwargs))
+        proxies = []
+        while True:
+            item = await loop.run_in_executor(None, _next_request, requests, done)
+            if item is None:
+                break
+            proxies.append(asyncio.ensure_future(self._proxy(responses, *item)))
+        await asyncio.gather(*proxies)
+        return await asyncio.wrap_future(done)
+
+    @staticmethod
+    async def _proxy(responses, frame: bytes, self_id: Optional[int], echo):
+        data = codec.decode(frame)
+        data.pop('echo', None)
+        response = await message_sender._request(data, self_id)
+        if response is None:
+            response = {"status": "failed", "retcode": -1, "data": None, "message": "主进程发送请求失败"}
+        await asyncio.get_running_loop().run_in_executor(None, responses.put, dict(response, echo=echo))
+
+    def restart_processes(self):
+        """丢弃进程池，下次使用时重新创建；插件重载后旧的子进程仍持有旧代码"""
+        pool = self._pools.pop('process', None)
+        if pool is not None:
+            pool.executor.shutdown(wait=False)
+
+    def shutdown(self):
+        """关闭线程池和进程池，尚未开始的调用被取消"""
+        for pool in self._pools.values():
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def stats(self) -> dict:
+        """各执行方式的池大小、在途调用数和占用情况"""
+        stats = {}
+        for mode in ('thread', 'process'):
+            pool = self._pools.get(mode)
+            workers = pool.workers if pool else (self.thread_workers if mode == 'thread' else self.process_workers)
+            in_flight = pool.submitted - pool.completed if pool else 0
+            stats[mode] = {
+                'workers': workers,
+                'started': pool is not None,
+                'in_flight': in_flight,
+                'queued': max(0, in_flight - workers),
+                'utilization': min(in_flight, workers) / workers,
+                'completed': pool.completed if pool else 0,
+                'busy_seconds': pool.busy_seconds if pool else 0.0,
+            }
+        return stats
+
+# 全局执行器
+handler_executors = HandlerExecutors()
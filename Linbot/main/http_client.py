@@ -0,0 +1,127 @@
+# main/http_client.py
+import asyncio
+import aiohttp
+from typing import Optional
+from logger import Logging
+
+logger = Logging.logger
+
+class HttpClient:
+    """服务器持有的共享 HTTP 客户端
+
+    所有插件共用一个 ClientSession 和连接池，复用连接与 DNS 缓存。
+    在服务器启动插件钩子之前创建，在关闭钩子执行之后关闭。
+    会话属于创建它的主事件循环，在线程池处理器自己的事件循环中取用会抛出 RuntimeError。
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, timeout: float = 30.0,
+                 connect_timeout: float = 10.0, keepalive_timeout: float = 30.0, dns_cache_ttl: int = 300):
+        self.limit = limit
+        """连接池的总连接数上限，0 表示不限制"""
+        self.limit_per_host = limit_per_host
+        """每个主机的连接数上限，0 表示不限制"""
+        self.timeout = timeout
+        """单个请求的总超时（秒）"""
+        self.connect_timeout = connect_timeout
+        """建立连接的超时（秒）"""
+        self.keepalive_timeout = keepalive_timeout
+        """空闲连接保留的时间（秒）"""
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counters = dict.fromkeys(('requests', 'errors', 'in_flight', 'connections_created',
+                                        'connections_reused', 'queued', 'waiting', 'dns_cache_hits',
+                                        'dns_cache_misses'), 0)
+
+    def configure(self, limit: int = 100, limit_per_host: int = 10, timeout: float = 30.0,
+                  connect_timeout: float = 10.0, keepalive_timeout: float = 30.0, dns_cache_ttl: int = 300):
+        """调整连接池参数，在 start 之前调用"""
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """共享的 ClientSession，插件不应关闭它"""
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP 客户端尚未启动")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None and loop is not self._loop:
+            raise RuntimeError("共享 HTTP 客户端属于主事件循环，线程池中的处理器不能使用，请自行创建 ClientSession")
+        return self._session
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        counters = self._counters
+        trace_config = aiohttp.TraceConfig()
+
+        def counter(*names, delta=1):
+            async def on_signal(session, context, params):
+                for name in names:
+                    counters[name] += delta
+            return on_signal
+
+        trace_config.on_request_start.append(counter('requests', 'in_flight'))
+        trace_config.on_request_end.append(counter('in_flight', delta=-1))
+        trace_config.on_request_exception.append(counter('in_flight', delta=-1))
+        trace_config.on_request_exception.append(counter('errors'))
+        trace_config.on_connection_create_end.append(counter('connections_created'))
+        trace_config.on_connection_reuseconn.append(counter('connections_reused'))
+        trace_config.on_connection_queued_start.append(counter('queued', 'waiting'))
+        trace_config.on_connection_queued_end.append(counter('waiting', delta=-1))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+        return trace_config
+
+    async def start(self):
+        """创建连接池和 ClientSession"""
+        if self.started:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                               keepalive_timeout=self.keepalive_timeout,
+                                               ttl_dns_cache=self.dns_cache_ttl)
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            trace_configs=[self._trace_config()],
+        )
+        logger.debug(f"共享 HTTP 客户端已启动，连接上限: {self.limit}，每主机上限: {self.limit_per_host}")
+
+    async def close(self):
+        """关闭 ClientSession 及其所有连接"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._connector = None
+            self._loop = None
+
+    def stats(self) -> dict:
+        """连接池状态与累计计数"""
+        stats = dict(self._counters)
+        connector = self._connector
+        if connector is not None:
+            # aiohttp 没有公开连接池占用情况，读取内部状态，取不到时为 0
+            acquired = getattr(connector, '_acquired', ())
+            idle = getattr(connector, '_conns', {})
+            stats['acquired'] = len(acquired)
+            stats['idle'] = sum(len(conns) for conns in idle.values())
+            stats['utilization'] = len(acquired) / self.limit if self.limit else 0.0
+        else:
+            stats.update(acquired=0, idle=0, utilization=0.0)
+        stats['limit'] = self.limit
+        stats['limit_per_host'] = self.limit_per_host
+        return stats
+
+# 全局 HTTP 客户端
+http_client = HttpClient()
@@ -1,4 +1,10 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import re
 from logging import Logger
 
 #全局日志配置
@@ -14,47 +20,93 @@ class Colors:
     UNDERLINE = '\033[4m'   # 下划线
     END = '\033[0m'         # 结束颜色
 
+SUCCESS = 25  # 介于INFO(20)和WARNING(30)之间
+
+_ANSI_ESCAPE = re.compile(r'\033\[[0-9;]*m')
+
+class ColorFormatter(logging.Formatter):
+    """控制台格式：在消息前加上带颜色的级别标签"""
+    LEVEL_TAGS = {
+        logging.DEBUG: f"{Colors.BLUE}[DEBUG]{Colors.END} ",
+        logging.INFO: f"{Colors.UNDERLINE}[INFO]{Colors.END} ",
+        SUCCESS: f"{Colors.GREEN}[SUCCESS]{Colors.END} ",
+        logging.WARNING: f"{Colors.YELLOW}[WARNING]{Colors.END} ",
+        logging.ERROR: f"{Colors.RED}[ERROR]{Colors.END} ",
+    }
+
+    def __init__(self):
+        super().__init__(fmt='%(asctime)s - %(level_tag)s%(message)s', datefmt='%H:%M:%S')
+
+    def format(self, record):
+        record.level_tag = self.LEVEL_TAGS.get(record.levelno, "")
+        return super().format(record)
+
+class JsonFormatter(logging.Formatter):
+    """结构化格式：每条记录输出一行 JSON，去掉颜色控制符，extra 中的字段原样输出"""
+    _RESERVED = frozenset(logging.LogRecord('', 0, '', 0, '', None, None).__dict__) | {'message', 'asctime', 'level_tag'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': _ANSI_ESCAPE.sub('', record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RESERVED:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """把日志记录原样放入队列，消息格式化推迟到后台线程真正输出时进行
+
+    与标准 QueueHandler 不同，这里不会在调用线程中拼接消息，
+    因此传给日志的参数在记录之后不应再被修改。
+    """
+
+    def prepare(self, record):
+        # 异常信息中的栈帧不能跨线程保留，先转换为文本
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 class Logging:
-    logging.addLevelName(25, 'SUCCESS')  # 25介于INFO(20)和WARNING(30)之间
+    logging.addLevelName(SUCCESS, 'SUCCESS')
 
-    # 2. 创建记录success级别日志的方法
+    # 创建记录success级别日志的方法
     def success(self, message, *args, **kwargs):
-        if self.isEnabledFor(25):
-            message = f"{Colors.GREEN}[SUCCESS]{Colors.END} {message}"
-            self._log(25, message, args, **kwargs)
-    
-    def warning(self, message, *args, **kwargs):
-        if self.isEnabledFor(30):
-            message = f"{Colors.YELLOW}[WARNING]{Colors.END} {message}"
-            self._log(30, message, args, **kwargs)
-
-    def error(self, message, *args, **kwargs):
-        if self.isEnabledFor(40):
-            message = f"{Colors.RED}[ERROR]{Colors.END} {message}"
-            self._log(40, message, args, **kwargs)
-
-    def debug(self, message, *args, **kwargs):
-        if self.isEnabledFor(10):
-            message = f"{Colors.BLUE}[DEBUG]{Colors.END} {message}"
-            self._log(10, message, args, **kwargs)
-
-    def info(self, message, *args, **kwargs):
-        if self.isEnabledFor(20):
-            message = f"{Colors.UNDERLINE}[INFO]{Colors.END} {message}"
-            self._log(20, message, args, **kwargs)
+        if self.isEnabledFor(SUCCESS):
+            self._log(SUCCESS, message, args, **kwargs)
 
     logger = logging.getLogger("linbot")
     logger.setLevel(logging.DEBUG)
 
+    # 实际输出由后台线程完成，事件循环线程只负责入队
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.DEBUG)
+    console_handler.setFormatter(JsonFormatter() if os.environ.get('LINBOT_LOG_FORMAT') == 'json' else ColorFormatter())
 
-    formatter = logging.Formatter(fmt='%(asctime)s - %(message)s',datefmt='%H:%M:%S')
-    console_handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
-    logger.addHandler(console_handler)
+    logger.addHandler(queue_handler)
     Logger.success = success
-    Logger.warning = warning
-    Logger.error = error
-    Logger.debug = debug
-    Logger.info = info
\ No newline at end of file
+
+    @classmethod
+    def configure(cls, log_format: str = None, level: int = None):
+        """调整日志输出：log_format 为 color 或 json，level 为日志级别"""
+        if log_format == 'json':
+            cls.console_handler.setFormatter(JsonFormatter())
+        elif log_format == 'color':
+            cls.console_handler.setFormatter(ColorFormatter())
+        if level is not None:
+            cls.logger.setLevel(level)
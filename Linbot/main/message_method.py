@@ -1,50 +1,357 @@
 # main/message_method.py
 import asyncio
-import json
-import uuid
-from typing import Optional
+import heapq
+import itertools
+import socket
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+from aiohttp import web, WSMsgType
 from logger import Logging
+import codec
 from event import SendReturn, GroupMessageEvent, PrivateMessageEvent
 from context import get_current_event, get_current_websocket
 from onebot_protocol import OneBotProtocol
 from response_handler import response_handler
+from connections import connection_registry
 
 logger = Logging.logger
 
+class TokenBucket:
+    """令牌桶限速器"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """距离有可用令牌还需等待的秒数，0 表示可以立即发送"""
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+def _send_target(data: dict) -> Optional[tuple]:
+    """消息发送动作的目标：('group', 群号) 或 ('private', QQ号)，其他动作返回 None"""
+    action = data.get("action")
+    params = data.get("params") or {}
+    if action == "send_group_msg" or (action == "send_msg" and params.get("message_type") == "group"):
+        return ("group", params.get("group_id"))
+    elif action in ("send_private_msg", "send_msg"):
+        return ("private", params.get("user_id"))
+    return None
+
+class OutboundPipeline:
+    """出站发送管线
+
+    消息发送帧先进入按目标划分的队列，按群、用户和全局三级令牌桶限速；
+    同一轮就绪的帧作为一批连续写出，Linux 下用 TCP_CORK 合并为更少的 TCP 报文。
+    速率为 None 或 0 时不限制该级别。
+    在队列中等待超过 max_queue_wait 秒的帧不再发送，send 抛出 asyncio.TimeoutError；
+    响应超时从帧写出后才开始计时，这里限制的是排队的时间。
+    """
+
+    def __init__(self, group_rate: float = 2.0, group_burst: int = 5, user_rate: float = 2.0,
+                 user_burst: int = 5, global_rate: float = 20.0, global_burst: int = 20,
+                 max_queue_wait: Optional[float] = 30.0):
+        self.configure(group_rate, group_burst, user_rate, user_burst, global_rate, global_burst, max_queue_wait)
+        self._pending: Dict[tuple, deque] = {}
+        # 每个有待发帧的目标只会出现在 _ready 或 _delayed 之一中
+        self._ready: deque = deque()
+        self._delayed: list = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep = 0.0
+        # 统计
+        self.sent = 0
+        self.batches = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.expired = 0
+        """排队超时而未发送的帧数"""
+
+    def configure(self, group_rate: float = 2.0, group_burst: int = 5, user_rate: float = 2.0,
+                  user_burst: int = 5, global_rate: float = 20.0, global_burst: int = 20,
+                  max_queue_wait: Optional[float] = 30.0):
+        """设置限速参数，已有的令牌桶会被重置；max_queue_wait 为 None 或 0 时不限制排队时间"""
+        self.max_queue_wait = max_queue_wait
+        self._limits = {"group": (group_rate, group_burst), "private": (user_rate, user_burst)}
+        self._global_limit = (global_rate, global_burst)
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._global_bucket: Optional[TokenBucket] = None
+
+    async def send(self, ws: web.WebSocketResponse, frame: bytes, target: tuple):
+        """排队发送一帧 UTF-8 编码的 JSON 文本，写出后返回；排队超时抛出 asyncio.TimeoutError"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.get(target)
+        if queue is None:
+            queue = self._pending[target] = deque()
+            self._ready.append(target)
+        queue.append((ws, frame, loop.time(), future))
+
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        # 到期时直接使 future 失败，_collect 跳过已完成的帧
+        timer = loop.call_later(self.max_queue_wait, self._expire, future) if self.max_queue_wait else None
+        try:
+            await future
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _expire(self, future: asyncio.Future):
+        if not future.done():
+            self.expired += 1
+            future.set_exception(asyncio.TimeoutError(f"在发送队列中等待超过 {self.max_queue_wait} 秒"))
+
+    def _wait_time(self, target: tuple, now: float) -> float:
+        rate, burst = self._limits.get(target[0], (None, None))
+        if not rate:
+            return 0.0
+        bucket = self._buckets.get(target)
+        if bucket is None:
+            bucket = self._buckets[target] = TokenBucket(rate, burst, now)
+        return bucket.wait_time(now)
+
+    def _consume(self, target: tuple):
+        bucket = self._buckets.get(target)
+        if bucket is not None:
+            bucket.consume()
+        if self._global_bucket is not None:
+            self._global_bucket.consume()
+
+    def _collect(self, now: float) -> Tuple[list, float]:
+        """按轮询顺序为每个就绪目标取出一帧，返回 (本批帧, 全局限速需等待的秒数)"""
+        global_rate, global_burst = self._global_limit
+        if global_rate and self._global_bucket is None:
+            self._global_bucket = TokenBucket(global_rate, global_burst, now)
+
+        batch = []
+        for _ in range(len(self._ready)):
+            if self._global_bucket is not None:
+                global_wait = self._global_bucket.wait_time(now)
+                if global_wait:
+                    return batch, global_wait
+
+            target = self._ready.popleft()
+            wait = self._wait_time(target, now)
+            if wait:
+                heapq.heappush(self._delayed, (now + wait, next(self._sequence), target))
+                continue
+
+            queue = self._pending[target]
+            item = queue.popleft()
+            if item[3].done():
+                # 调用方已取消，不再发送
+                if queue:
+                    self._ready.append(target)
+                else:
+                    del self._pending[target]
+                continue
+
+            self._consume(target)
+            batch.append(item)
+            if queue:
+                self._ready.append(target)
+            else:
+                del self._pending[target]
+        return batch, 0.0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._ready.append(heapq.heappop(self._delayed)[2])
+
+            if not self._ready:
+                self._sweep(now)
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batch, global_wait = self._collect(now)
+            if batch:
+                await self._write(batch, now)
+            elif global_wait:
+                await asyncio.sleep(global_wait)
+
+    async def _write(self, batch: list, now: float):
+        """连续写出一批帧"""
+        self.batches += 1
+        corked = self._cork(batch, True) if len(batch) > 1 else []
+        try:
+            for ws, frame, enqueued, future in batch:
+                wait = now - enqueued
+                self.sent += 1
+                self.wait_total += wait
+                if wait > self.wait_max:
+                    self.wait_max = wait
+                try:
+                    await ws.send_frame(frame, WSMsgType.TEXT)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(None)
+        finally:
+            for sock in corked:
+                self._set_cork(sock, False)
+
+    def _cork(self, batch: list, enabled: bool) -> list:
+        sockets = []
+        for ws in {id(item[0]): item[0] for item in batch}.values():
+            sock = ws.get_extra_info('socket')
+            if sock is not None and self._set_cork(sock, enabled):
+                sockets.append(sock)
+        return sockets
+
+    @staticmethod
+    def _set_cork(sock, enabled: bool) -> bool:
+        if not hasattr(socket, 'TCP_CORK'):
+            return False
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1 if enabled else 0)
+            return True
+        except OSError:
+            return False
+
+    def _sweep(self, now: float):
+        """移除已经回满的令牌桶，避免随目标数量增长"""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for target, bucket in list(self._buckets.items()):
+            if target not in self._pending and bucket.wait_time(now) == 0 and bucket.tokens >= bucket.capacity:
+                del self._buckets[target]
+
+    def stats(self) -> dict:
+        """发送管线状态"""
+        return {
+            'queued': sum(len(queue) for queue in self._pending.values()),
+            'sent': self.sent,
+            'batches': self.batches,
+            'wait_avg': self.wait_total / self.sent if self.sent else 0.0,
+            'wait_max': self.wait_max,
+            'expired': self.expired,
+        }
+
+# 全局发送管线
+outbound_pipeline = OutboundPipeline()
+
 class MessageSender:
     def __init__(self):
-        pass
+        self.relay: Optional[Callable] = None
+        """分片工作进程中设置的转发函数 relay(帧, 限速目标, self_id, echo)，请求交给主进程发出，
+        帧写出后由它调用 response_handler.start_timeout"""
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        """持有连接的事件循环；在线程池中运行的处理器的请求交回这里发出"""
     
-    async def _send_and_wait(self, data: dict) -> Optional[SendReturn]:
-        """发送消息并等待响应"""
-        ws = get_current_websocket()
-        if not ws:
-            logger.error("WebSocket 未连接")
+    async def _send_and_wait(self, data: dict, self_id: Optional[int] = None,
+                             encode: Optional[Callable[[Union[int, str]], bytes]] = None) -> Optional[SendReturn]:
+        """发送消息并等待响应，没有响应时返回 None"""
+        response_data = await self._request(data, self_id, encode)
+        if response_data is None:
             return None
+        if response_data.get('data') is None:
+            # 发送失败的响应中 data 为 null，视为发送失败
+            logger.warning(f"{data.get('action')} 请求失败，retcode: {response_data.get('retcode')}，{response_data.get('message', '')}")
+            return None
+        return SendReturn(**response_data)
+
+    async def _request(self, data: dict, self_id: Optional[int] = None,
+                       encode: Optional[Callable[[Union[int, str]], bytes]] = None) -> Optional[dict]:
+        """发送动作请求并返回未经转换的响应字典
+
+        self_id 指定通过哪个账号发送，为空时使用当前事件所在的连接，不在事件上下文中时使用最早连接的账号。
+        encode 为 echo -> 已编码帧 的函数，给出时不再编码 data，data 只用于确定限速目标。
+        """
+        if self.loop is not None and asyncio.get_running_loop() is not self.loop:
+            future = asyncio.run_coroutine_threadsafe(self._request(data, self_id, encode), self.loop)
+            return await asyncio.wrap_future(future)
+        
+        connection = ws = None
+        if self.relay is None:
+            connection = connection_registry.resolve(self_id)
+            if connection is not None:
+                ws = connection.ws
+            elif self_id is None:
+                ws = get_current_websocket()
+            else:
+                logger.error(f"账号 {self_id} 未连接")
+                return None
+            if not ws:
+                logger.error("WebSocket 未连接")
+                return None
         
-        echo = str(uuid.uuid4())
-        data["echo"] = echo
+        if connection is not None:
+            connection.in_flight += 1
+            connection.requests += 1
+        # 帧写出后才开始计时，在限速管线中排队的时间不计入响应超时
+        echo, response_future = response_handler.register_request(start=False)
         
         try:
-            # 先准备等待响应
-            response_task = asyncio.create_task(response_handler.wait_for_response(echo))
-            
-            # 然后发送消息
-            await ws.send_str(json.dumps(data))
+            # 先登记等待，再发送消息；消息发送动作经过限速管线
+            if encode is not None:
+                frame = encode(echo)
+            else:
+                data["echo"] = echo
+                frame = codec.encode(data)
+            target = _send_target(data)
+            if self.relay is not None:
+                # 由转发函数在主进程写出帧后开始计时
+                await self.relay(frame, target, self_id, echo)
+            else:
+                if target is None:
+                    await ws.send_frame(frame, WSMsgType.TEXT)
+                else:
+                    try:
+                        await outbound_pipeline.send(ws, frame, target)
+                    except asyncio.TimeoutError as e:
+                        logger.error(f"{data.get('action')} 未发出，{e}")
+                        return None
+                response_handler.start_timeout(echo)
             
             # 等待响应
-            response_data = await response_task
-            return SendReturn(**response_data)
+            return await response_future
             
         except asyncio.TimeoutError:
             logger.error(f"等待响应超时，echo: {echo}")
             return None
         except Exception as e:
-            logger.error(f"发送消息失败: {e}")
+            logger.error(f"发送 {data.get('action')} 请求失败: {e}")
             return None
+        finally:
+            response_handler.discard(echo)
+            if connection is not None:
+                connection.in_flight -= 1
     
-    async def send_group_msg(self, message: list, group_id: Optional[int] = None) -> Optional[SendReturn]:
-        """发送群消息"""
+    async def call_action(self, action: str, self_id: Optional[int] = None, **params) -> Optional[dict]:
+        """调用任意 OneBot 动作，返回完整的响应字典（含 status、retcode、data）"""
+        return await self._request(OneBotProtocol.create_action(action, **params), self_id)
+
+    async def send_group_msg(self, message: list, group_id: Optional[int] = None, self_id: Optional[int] = None,
+                             balance: bool = False) -> Optional[SendReturn]:
+        """发送群消息
+
+        self_id 指定发送的账号；balance 为 True 时在已知在该群中的账号里选择负载最低的一个。
+        """
         if group_id is None:
             current_event = get_current_event()
             if current_event and hasattr(current_event, 'group_id'):
@@ -55,17 +362,23 @@ class MessageSender:
                 logger.error("未指定 group_id 且无法从当前事件获取")
                 return None
         
+        if balance and self_id is None:
+            connection = connection_registry.pick(group_id)
+            if connection is not None:
+                self_id = connection.self_id
+        
         action_data = OneBotProtocol.create_group_message(group_id, message)
-        response = await self._send_and_wait(action_data)
+        response = await self._send_and_wait(action_data, self_id)
         
-        if response:
-            logger.success(f"群消息发送成功: {response.status}")
+        if response is not None and response.retcode == 0:
+            logger.success("群消息发送成功: %s", response.status)
         else:
             logger.error("群消息发送失败")
         return response
     
-    async def send_private_msg(self, message:list, user_id: Optional[int] = None) -> Optional[SendReturn]:
-        """发送私聊消息"""
+    async def send_private_msg(self, message:list, user_id: Optional[int] = None,
+                               self_id: Optional[int] = None) -> Optional[SendReturn]:
+        """发送私聊消息，self_id 指定发送的账号"""
         if user_id is None:
             current_event = get_current_event()
             if current_event and hasattr(current_event, 'user_id'):
@@ -77,20 +390,156 @@ class MessageSender:
                 return None
         
         action_data = OneBotProtocol.create_private_message(user_id, message)
-        response = await self._send_and_wait(action_data)
+        response = await self._send_and_wait(action_data, self_id)
         
-        if response:
-            logger.success(f"私聊消息发送成功: {response.status}")
+        if response is not None and response.retcode == 0:
+            logger.success("私聊消息发送成功: %s", response.status)
         else:
             logger.error("私聊消息发送失败")
         return response
 
+    def broadcast(self, message: list, group_ids: Iterable[int] = (), user_ids: Iterable[int] = (),
+                  window: int = 50, self_id: Optional[int] = None, balance: bool = False,
+                  on_progress: Optional[Callable[['Broadcast'], None]] = None) -> 'Broadcast':
+        """向多个群和用户发送同一条消息，立即返回 Broadcast，await 它得到每个目标的结果"""
+        targets = [("group", int(group_id)) for group_id in group_ids]
+        targets += [("private", int(user_id)) for user_id in user_ids]
+        return Broadcast(self, message, targets, window, self_id, balance, on_progress)
+
+class Broadcast:
+    """批量发送任务
+
+    消息只编码一次，按目标拼接成请求帧；最多 window 个请求同时在途，
+    每帧仍经过出站管线按群、用户和全局速率限速。
+    调用 cancel() 后不再发出新的请求，在途的请求也被放弃。
+    results 记录每个已完成目标的响应，发送失败的目标为 None，未发送的目标不在其中。
+    """
+
+    def __init__(self, sender: MessageSender, message: list, targets: list, window: int = 50,
+                 self_id: Optional[int] = None, balance: bool = False,
+                 on_progress: Optional[Callable[['Broadcast'], None]] = None):
+        self.sender = sender
+        self.targets = targets
+        self.total = len(targets)
+        self.results: Dict[tuple, Optional[SendReturn]] = {}
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = False
+        self.self_id = self_id
+        self.balance = balance
+        self.on_progress = on_progress
+        self._message = codec.encode(message)
+        self._remaining = iter(targets)
+        self.started_at = asyncio.get_running_loop().time()
+        self.finished_at: Optional[float] = None
+
+        # 超过全局速率在一个超时周期内能发出的数量时，多出的请求只会在限速管线中排队，不会更快
+        global_rate = outbound_pipeline._global_limit[0]
+        if global_rate:
+            limit = max(1, int(global_rate * response_handler.timeout / 2))
+            if window > limit:
+                logger.debug(f"批量发送窗口 {window} 超过全局速率允许的 {limit}，已调整")
+                window = limit
+        self.window = max(1, window)
+        self._task = asyncio.ensure_future(self._run())
+
+    def _encoder(self, target: tuple) -> Callable[[Union[int, str]], bytes]:
+        if target[0] == "group":
+            head = b'{"action":"send_group_msg","params":{"group_id":%d,"message":' % target[1]
+        else:
+            head = b'{"action":"send_private_msg","params":{"user_id":%d,"message":' % target[1]
+        return lambda echo: b'%s%s},"echo":%s}' % (head, self._message, codec.encode(echo))
+
+    async def _run(self):
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(min(self.window, self.total))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.finished_at = asyncio.get_running_loop().time()
+            logger.info(f"批量发送{'已取消' if self.cancelled else '完成'}：成功 {self.succeeded}，"
+                        f"失败 {self.failed}，未发送 {self.total - len(self.results)}，"
+                        f"耗时 {self.finished_at - self.started_at:.1f} 秒")
+
+    async def _worker(self):
+        # 所有工作协程共享同一个目标迭代器
+        for target in self._remaining:
+            self_id = self.self_id
+            if self.balance and self_id is None and target[0] == "group":
+                connection = connection_registry.pick(target[1])
+                if connection is not None:
+                    self_id = connection.self_id
+            action = "send_group_msg" if target[0] == "group" else "send_private_msg"
+            key = "group_id" if target[0] == "group" else "user_id"
+            try:
+                response = await self.sender._send_and_wait({"action": action, "params": {key: target[1]}},
+                                                            self_id, self._encoder(target))
+            except Exception as e:
+                # 单个目标出错不影响其余目标
+                logger.error(f"批量发送到 {target[0]} {target[1]} 时出错: {e}")
+                response = None
+            self.results[target] = response
+            if response is not None and response.retcode == 0:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            if self.on_progress is not None:
+                try:
+                    self.on_progress(self)
+                except Exception as e:
+                    logger.error(f"批量发送进度回调出错: {e}")
+
+    @property
+    def done(self) -> int:
+        """已完成的目标数"""
+        return len(self.results)
+
+    def progress(self) -> dict:
+        """当前进度"""
+        return {
+            'total': self.total,
+            'done': self.done,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+        }
+
+    def cancel(self):
+        """停止发送剩余的目标"""
+        if not self._task.done():
+            self.cancelled = True
+            self._task.cancel()
+
+    async def wait(self) -> Dict[tuple, Optional[SendReturn]]:
+        """等待发送结束，返回 {(类型, 目标): 响应}"""
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            if not self.cancelled:
+                raise
+        return self.results
+
+    def __await__(self):
+        return self.wait().__await__()
+
 # 全局实例
 message_sender = MessageSender()
 
 # 用户API
-async def send_group_msg(message: list, group_id: Optional[int] = None) -> Optional[SendReturn]:
-    return await message_sender.send_group_msg(message, group_id)
+async def send_group_msg(message: list, group_id: Optional[int] = None, self_id: Optional[int] = None,
+                         balance: bool = False) -> Optional[SendReturn]:
+    return await message_sender.send_group_msg(message, group_id, self_id, balance)
+
+async def send_private_msg(message: list, user_id: Optional[int] = None,
+                           self_id: Optional[int] = None) -> Optional[SendReturn]:
+    return await message_sender.send_private_msg(message, user_id, self_id)
+
+async def call_action(action: str, self_id: Optional[int] = None, **params) -> Optional[dict]:
+    return await message_sender.call_action(action, self_id, **params)
 
-async def send_private_msg(message: list, user_id: Optional[int] = None) -> Optional[SendReturn]:
-    return await message_sender.send_private_msg(message, user_id)
\ No newline at end of file
+def broadcast(message: list, group_ids: Iterable[int] = (), user_ids: Iterable[int] = (), window: int = 50,
+              self_id: Optional[int] = None, balance: bool = False,
+              on_progress: Optional[Callable[[Broadcast], None]] = None) -> Broadcast:
+    return message_sender.broadcast(message, group_ids, user_ids, window, self_id, balance, on_progress)
\ No newline at end of file
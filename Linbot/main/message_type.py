@@ -1,5 +1,4 @@
 import pydantic
-import re
 
 class chat_type(pydantic.BaseModel):
     type:bool = False
@@ -8,6 +7,48 @@ class chat_type(pydantic.BaseModel):
     "除指令外剩余的参数，适用于指令+参数的情况"
 
 
+def _command_result(rest: str) -> chat_type:
+    """根据指令后剩余的内容构建匹配结果，参数只取到第一个换行为止"""
+    arg = rest.partition("\n")[0]
+    if len(arg) == 0:
+        arg = " "
+    return chat_type(type=True, commandargs=arg)
+
+
+class CommandTrie:
+    """指令前缀树，遍历一次消息即可得到所有匹配的指令及其参数"""
+    def __init__(self, instructions=()):
+        self._root: dict = {}
+        for instruction in instructions:
+            self.add(instruction)
+
+    def add(self, instruction: str):
+        """添加一条指令，指令按字面量匹配"""
+        if instruction is None:
+            return
+        node = self._root
+        for char in instruction:
+            node = node.setdefault(char, {})
+        # 空字符串不会与单个字符冲突，用作指令结束标记
+        node[""] = instruction
+
+    def match(self, msg: str) -> dict[str, chat_type]:
+        """返回 {指令: 匹配结果}，包含所有是 msg 前缀的指令"""
+        results = {}
+        if not isinstance(msg, str):
+            return results
+        node = self._root
+        if "" in node:
+            results[node[""]] = _command_result(msg)
+        for index, char in enumerate(msg):
+            node = node.get(char)
+            if node is None:
+                break
+            if "" in node:
+                results[node[""]] = _command_result(msg[index + 1:])
+        return results
+
+
 class Messgaechat:
     @staticmethod
     def on_message(*args, **kwargs):
@@ -16,9 +57,6 @@ class Messgaechat:
     @staticmethod
     def on_command(instruction: str=None, msg:str=None):
         if instruction is not None and msg is not None:
-            if res:= re.match(rf"^{instruction}(.*)", msg):
-                arg = res.groups()[0]
-                if len(arg) == 0:
-                    arg = " "
-                return chat_type(type=True, commandargs=arg)
-        return chat_type(type=False)
\ No newline at end of file
+            if msg.startswith(instruction):
+                return _command_result(msg[len(instruction):])
+        return chat_type(type=False)
@@ -0,0 +1,183 @@
+# main/metrics.py
+import abc
+import bisect
+import math
+from typing import Callable, Dict, Iterable, Tuple, Union
+
+# 默认的延迟分桶（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class _CounterChild:
+    """计数器的一组标签取值"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: Union[int, float] = 1):
+        self.value += amount
+
+class _HistogramChild:
+    """直方图的一组标签取值，各分桶的计数在创建时预先分配"""
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class _Metric(abc.ABC):
+    """带标签的指标：每组标签取值对应的子对象只创建一次，调用方应保存并复用"""
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+
+    def labels(self, *values):
+        """获取指定标签取值的子对象"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def remove(self, *values):
+        """移除指定标签取值的子对象，之后不再导出"""
+        self._children.pop(values, None)
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """创建一组标签取值对应的子对象"""
+
+    @abc.abstractmethod
+    def collect(self) -> Iterable[str]:
+        """按 Prometheus 文本格式逐行输出各子对象的取值"""
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def collect(self):
+        for values, child in list(self._children.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}'
+
+class Histogram(_Metric):
+    """分桶直方图"""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def collect(self):
+        for values, child in list(self._children.items()):
+            # 导出时才累加为 Prometheus 要求的累计计数
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}'
+            labels = _format_labels(self.labelnames, values)
+            yield f'{self.name}_sum{labels} {_format_value(child.sum)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+class CallbackMetric:
+    """在导出时调用函数取值的指标
+
+    函数返回一个数值，或以标签取值元组为键的字典。
+    """
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], Union[float, Dict[Tuple, float]]],
+                 labelnames: Iterable[str] = (), type: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def collect(self):
+        result = self.func()
+        if isinstance(result, dict):
+            for values, value in result.items():
+                yield f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}'
+        else:
+            yield f'{self.name} {_format_value(result)}'
+
+class MetricsRegistry:
+    """指标注册表，按 Prometheus 文本格式导出"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[_Metric, CallbackMetric]] = {}
+
+    def register(self, metric):
+        """注册指标，同名指标会被替换"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, func: Callable, labelnames: Iterable[str] = (),
+                 type: str = 'gauge') -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, func, labelnames, type))
+
+    def render(self) -> str:
+        """导出所有指标"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+events_total = metrics.counter('linbot_events_total', '已处理的事件数', ('post_type',))
+event_dispatch_seconds = metrics.histogram('linbot_event_dispatch_seconds', '单个事件分派给所有处理器的耗时（秒）', ('post_type',))
+handler_seconds = metrics.histogram('linbot_handler_seconds', '单个处理器的执行耗时（秒）', ('plugin', 'handler'))
+handler_errors_total = metrics.counter('linbot_handler_errors_total', '处理器抛出异常的次数', ('plugin', 'handler'))
+
+def handler_metrics(plugin_name: str, handler_name: str) -> Tuple[_HistogramChild, _CounterChild]:
+    """处理器的 (耗时直方图, 异常计数)，注册时获取一次并随处理器保存"""
+    return handler_seconds.labels(plugin_name, handler_name), handler_errors_total.labels(plugin_name, handler_name)
+
+def remove_handler_metrics(plugin_name: str, handler_name: str):
+    """处理器注销后移除它的指标，避免 /metrics 随插件重载不断增长"""
+    handler_seconds.remove(plugin_name, handler_name)
+    handler_errors_total.remove(plugin_name, handler_name)
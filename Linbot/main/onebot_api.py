@@ -0,0 +1,230 @@
+# main/onebot_api.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from logger import Logging
+from event import base_event
+from message_method import message_sender
+from connections import connection_registry
+from context import get_current_event
+
+logger = Logging.logger
+
+# 各查询动作默认的缓存时间（秒）
+DEFAULT_TTLS = {
+    'get_group_member_info': 300.0,
+    'get_group_member_list': 300.0,
+    'get_friend_list': 600.0,
+    'get_group_info': 600.0,
+    'get_login_info': 3600.0,
+}
+
+class TTLCache:
+    """有容量上限的 LRU 缓存，每个条目带有过期时间"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires, value = item
+        if expires <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+def _cache_key(self_id: Optional[int], action: str, params: dict) -> tuple:
+    return (self_id, action, *sorted(params.items()))
+
+class OneBotAPI:
+    """带缓存的 OneBot 查询接口
+
+    查询结果按 (账号, 动作, 参数) 缓存，过期或超出容量后重新请求；
+    同一查询同时只会发出一个请求，其余调用方共享它的结果。
+    群成员变动、管理员变更、名片修改等通知会使相关缓存失效。
+    返回的数据是缓存中的共享对象，调用方不应修改它。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttls: Optional[Dict[str, float]] = None):
+        self.cache = TTLCache(maxsize)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.invalidations = 0
+
+    def configure(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """设置缓存容量和缓存时间，ttl 为空时使用各动作的默认值；maxsize 为 0 时不缓存"""
+        self.cache.maxsize = maxsize
+        self.ttls = dict.fromkeys(DEFAULT_TTLS, ttl) if ttl is not None else dict(DEFAULT_TTLS)
+        self.cache.clear()
+
+    async def call(self, action: str, no_cache: bool = False, self_id: Optional[int] = None, **params) -> Optional[Any]:
+        """调用查询动作并返回响应中的 data，失败时返回 None
+
+        no_cache 为 True 时跳过缓存直接请求，结果仍会写入缓存。
+        self_id 为空时查询当前事件所在的账号，选择规则与发送消息相同。
+        """
+        if self_id is None:
+            connection = connection_registry.resolve()
+            if connection is not None:
+                self_id = connection.self_id
+            else:
+                # 分片工作进程中没有连接，按当前事件的账号区分
+                event = get_current_event()
+                self_id = event.self_id if event is not None else None
+        if message_sender.loop is not None and asyncio.get_running_loop() is not message_sender.loop:
+            # 线程池中的处理器在自己的事件循环中运行，缓存和共享的请求都属于主事件循环，交回主事件循环查询
+            future = asyncio.run_coroutine_threadsafe(self.call(action, no_cache, self_id, **params),
+                                                      message_sender.loop)
+            return await asyncio.wrap_future(future)
+        key = _cache_key(self_id, action, params)
+        if not no_cache:
+            value = self.cache.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+                # 一个调用方被取消不影响其他共享同一请求的调用方
+                return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(self._fetch(key, action, self_id, params))
+        self._inflight[key] = future
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key: tuple, action: str, self_id: Optional[int], params: dict) -> Optional[Any]:
+        try:
+            response = await message_sender.call_action(action, self_id, **params)
+            if response is None or response.get('retcode') != 0:
+                if response is not None:
+                    logger.warning(f"{action} 请求失败，retcode: {response.get('retcode')}，{response.get('message', '')}")
+                return None
+            data = response.get('data')
+            # 请求期间收到了使其失效的通知时不写入缓存
+            if self._inflight.get(key) is asyncio.current_task() and data is not None:
+                self.cache.set(key, data, self.ttls.get(action, 60.0))
+                if action == 'get_group_member_list':
+                    self._fill_members(self_id, params.get('group_id'), data)
+            return data
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _fill_members(self, self_id: Optional[int], group_id, members: list):
+        """用群成员列表补全单个成员的缓存，省去逐个查询"""
+        ttl = self.ttls.get('get_group_member_info', 60.0)
+        for member in members:
+            user_id = member.get('user_id')
+            if user_id is not None:
+                key = _cache_key(self_id, 'get_group_member_info', {'group_id': group_id, 'user_id': user_id})
+                if key not in self.cache and key not in self._inflight:
+                    self.cache.set(key, member, ttl)
+
+    def invalidate(self, action: str, self_id: Optional[int] = None, **params):
+        """使一条缓存失效，正在进行的同一查询的结果也不会再写入缓存"""
+        key = _cache_key(self_id, action, params)
+        removed = self.cache.pop(key)
+        if self._inflight.pop(key, None) is not None or removed:
+            self.invalidations += 1
+
+    def handle_notice(self, event: base_event):
+        """根据通知事件使相关缓存失效"""
+        notice_type = getattr(event, 'notice_type', None)
+        group_id = getattr(event, 'group_id', None)
+        user_id = getattr(event, 'user_id', None)
+        self_id = event.self_id
+        if notice_type in ('group_increase', 'group_decrease'):
+            self.invalidate('get_group_member_list', self_id, group_id=group_id)
+            self.invalidate('get_group_member_info', self_id, group_id=group_id, user_id=user_id)
+            self.invalidate('get_group_info', self_id, group_id=group_id)
+        elif notice_type in ('group_admin', 'group_card') or (
+                notice_type == 'notify' and getattr(event, 'sub_type', None) == 'title'):
+            self.invalidate('get_group_member_list', self_id, group_id=group_id)
+            self.invalidate('get_group_member_info', self_id, group_id=group_id, user_id=user_id)
+        elif notice_type == 'friend_add':
+            self.invalidate('get_friend_list', self_id)
+
+    async def get_group_member_info(self, group_id: int, user_id: int, no_cache: bool = False,
+                                    self_id: Optional[int] = None) -> Optional[dict]:
+        """获取群成员信息"""
+        return await self.call('get_group_member_info', no_cache, self_id, group_id=int(group_id), user_id=int(user_id))
+
+    async def get_group_member_list(self, group_id: int, no_cache: bool = False,
+                                    self_id: Optional[int] = None) -> Optional[list]:
+        """获取群成员列表"""
+        return await self.call('get_group_member_list', no_cache, self_id, group_id=int(group_id))
+
+    async def get_friend_list(self, no_cache: bool = False, self_id: Optional[int] = None) -> Optional[list]:
+        """获取好友列表"""
+        return await self.call('get_friend_list', no_cache, self_id)
+
+    async def get_group_info(self, group_id: int, no_cache: bool = False,
+                             self_id: Optional[int] = None) -> Optional[dict]:
+        """获取群信息"""
+        return await self.call('get_group_info', no_cache, self_id, group_id=int(group_id))
+
+    async def get_login_info(self, no_cache: bool = False, self_id: Optional[int] = None) -> Optional[dict]:
+        """获取登录号信息"""
+        return await self.call('get_login_info', no_cache, self_id)
+
+    def stats(self) -> dict:
+        """缓存状态"""
+        return {
+            'entries': len(self.cache),
+            'maxsize': self.cache.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'invalidations': self.invalidations,
+            'in_flight': len(self._inflight),
+        }
+
+# 全局查询接口
+onebot_api = OneBotAPI()
+
+# 用户API
+async def get_group_member_info(group_id: int, user_id: int, no_cache: bool = False,
+                                self_id: Optional[int] = None) -> Optional[dict]:
+    return await onebot_api.get_group_member_info(group_id, user_id, no_cache, self_id)
+
+async def get_group_member_list(group_id: int, no_cache: bool = False, self_id: Optional[int] = None) -> Optional[list]:
+    return await onebot_api.get_group_member_list(group_id, no_cache, self_id)
+
+async def get_friend_list(no_cache: bool = False, self_id: Optional[int] = None) -> Optional[list]:
+    return await onebot_api.get_friend_list(no_cache, self_id)
+
+async def get_group_info(group_id: int, no_cache: bool = False, self_id: Optional[int] = None) -> Optional[dict]:
+    return await onebot_api.get_group_info(group_id, no_cache, self_id)
+
+async def get_login_info(no_cache: bool = False, self_id: Optional[int] = None) -> Optional[dict]:
+    return await onebot_api.get_login_info(no_cache, self_id)
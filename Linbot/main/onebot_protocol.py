@@ -29,6 +29,14 @@ class OneBotProtocol:
             }
         }
     
+    @staticmethod
+    def create_action(action: str, **params) -> dict:
+        """创建任意动作请求"""
+        return {
+            "action": action,
+            "params": params
+        }
+    
     @staticmethod
     def validate_response(response: dict) -> bool:
         """验证响应格式"""
@@ -3,23 +3,95 @@ import os,asyncio
 import importlib
 import inspect
 import sys
-from typing import Dict, List, Any
+import json
+import time
+import hashlib
+from typing import Dict, List, Any, Optional, Set
 from logger import Logging
-from registry import registry
+from registry import registry, _annotation_accepts
+import event as event_module
 from chat import set_current_plugin_name, clear_current_plugin_name
+from executors import handler_executors
 
 logger = Logging.logger
 
+# 插件加载方式
+LOAD_MODES = ('eager', 'lazy', 'background')
+
+# 插件处理器元数据缓存的文件名，位于插件目录下
+CACHE_FILE = '.plugin_cache.json'
+
+def _handler_metadata(func_info: Dict) -> dict:
+    """缓存中保存的处理器信息，足以判断一个事件是否可能匹配该处理器"""
+    fun_arg_data = func_info['fun_arg_data']
+    event_types = fun_arg_data.event_types if fun_arg_data else None
+    return {
+        'name': func_info['name'],
+        'matcher': func_info['matcher'],
+        'event_types': list(event_types) if event_types else None,
+        'event_params': [annotation.__name__ for _, annotation in func_info['event_params']],
+    }
+
+def _may_match(metadata: dict, event: Any) -> bool:
+    """根据缓存的处理器信息判断事件是否可能匹配；无法确定时视为可能匹配"""
+    event_types = metadata['event_types']
+    if event_types and getattr(event, 'post_type', None) not in event_types:
+        return False
+    if metadata['event_params']:
+        event_class = type(event)
+        accepted = False
+        for annotation_name in metadata['event_params']:
+            annotation = getattr(event_module, annotation_name, None)
+            # 插件自定义的事件模型无法在这里解析，保守地认为可能匹配
+            if not isinstance(annotation, type) or _annotation_accepts(annotation, event_class):
+                accepted = True
+                break
+        if not accepted:
+            return False
+    if metadata['matcher'] == 'command':
+        raw_message = getattr(event, 'raw_message', None)
+        return isinstance(raw_message, str) and raw_message.startswith(metadata['name'])
+    return True
+
 class PluginManager:
     def __init__(self):
         self.plugins = {}
+        self.plugins_base_dir: Optional[str] = None
+        self.plugin_paths: Dict[str, str] = {}
+        """插件名 -> 插件目录"""
+        self.plugin_modules: Dict[str, Set[str]] = {}
+        """插件名 -> 加载该插件时新导入的、位于插件目录中的模块名"""
+        self.import_times: Dict[str, float] = {}
+        """插件名 -> 导入耗时（秒）"""
+        self.pending: Dict[str, List[dict]] = {}
+        """尚未导入的插件 -> 缓存的处理器信息"""
+        self.load_mode = 'eager'
+        self._cache: Dict[str, dict] = {}
+        self.started = False
+        """启动钩子是否已经执行；之后加载的插件在加载时执行自己的启动钩子"""
+        self._starting: Dict[str, tuple] = {}
+        """正在导入或启动的插件 -> (完成时结束的 Future, 处理器信息)，可能匹配这些插件的事件需要等待"""
+        self._import_lock: Optional[asyncio.Lock] = None
+        self._import_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+    def load_plugins(self, plugins_base_dir: str, mode: str = 'eager'):
+        """加载所有插件
         
-    def load_plugins(self, plugins_base_dir: str):
-        """加载所有插件"""
+        mode 为 eager 时立即导入全部插件；lazy 时处理器信息已缓存且源码未变的插件
+        推迟到第一个可能匹配它的事件到达时才导入；background 在 lazy 的基础上
+        由 load_pending_in_background 在服务器启动后在线程池中逐个导入其余插件。
+        根目录插件以及没有有效缓存的插件总是立即导入。
+        """
+        if mode not in LOAD_MODES:
+            raise ValueError(f"未知的插件加载方式: {mode}")
+        self.plugins_base_dir = plugins_base_dir
+        self.load_mode = mode
         if not os.path.exists(plugins_base_dir):
             logger.error(f"插件目录不存在: {plugins_base_dir}")
             return
-            
+        
+        self._cache = self._read_cache() if mode != 'eager' else {}
+        
         plugin_count = 0
         
         # 1. 加载根目录的 __init__.py
@@ -38,6 +110,8 @@ class PluginManager:
             if os.path.isdir(item_path):
                 plugin_init_file = os.path.join(item_path, "__init__.py")
                 if os.path.exists(plugin_init_file):
+                    if mode != 'eager' and self._defer(item_name, item_path):
+                        continue
                     try:
                         self._load_single_plugin(item_name, item_path, plugin_init_file)
                         logger.success(f"加载插件 {item_name} 成功")
@@ -50,10 +124,243 @@ class PluginManager:
         
         logger.debug(f"插件加载完成，共加载 {plugin_count} 个插件")
         logger.debug(f"注册的函数处理器数量: {len(functions)}")
+        if self.pending:
+            logger.info(f"{len(self.pending)} 个插件将在需要时导入: {', '.join(self.pending)}")
+        # 去掉已不存在的插件
+        self._cache = {name: entry for name, entry in self._cache.items() if name in self.plugins or name in self.pending}
+        self._write_cache()
+        self.log_import_report()
+    
+    @staticmethod
+    def _fingerprint(plugin_path: str) -> str:
+        """插件源码的指纹，任一 .py 文件的修改时间或大小变化都会改变指纹"""
+        digest = hashlib.sha1()
+        for root, dirs, names in os.walk(plugin_path):
+            dirs[:] = sorted(name for name in dirs if name != '__pycache__')
+            for name in sorted(names):
+                if name.endswith('.py'):
+                    file_path = os.path.join(root, name)
+                    stat = os.stat(file_path)
+                    digest.update(f"{os.path.relpath(file_path, plugin_path)}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        return digest.hexdigest()
+    
+    def _cache_path(self) -> str:
+        return os.path.join(self.plugins_base_dir, CACHE_FILE)
+    
+    def _read_cache(self) -> Dict[str, dict]:
+        try:
+            with open(self._cache_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_cache(self):
+        if self.load_mode == 'eager':
+            return
+        try:
+            with open(self._cache_path(), 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            logger.warning(f"写入插件缓存失败: {e}")
+    
+    def _update_cache(self, plugin_name: str, plugin_path: str):
+        """记录已导入插件的处理器信息"""
+        if plugin_name == "__root__" or self.load_mode == 'eager':
+            return
+        self._cache[plugin_name] = {
+            'fingerprint': self._fingerprint(plugin_path),
+            'import_time': self.import_times.get(plugin_name),
+            'handlers': [_handler_metadata(func_info) for func_info in registry.get_plugin_functions(plugin_name)],
+            'hooks': bool(registry.get_hooks('startup', [plugin_name]) or registry.get_hooks('shutdown', [plugin_name])),
+        }
+    
+    def _defer(self, plugin_name: str, plugin_path: str) -> bool:
+        """缓存有效时推迟导入插件；有生命周期钩子的插件需要在启动时执行钩子，不推迟"""
+        entry = self._cache.get(plugin_name)
+        if not entry or entry.get('hooks', True) or entry.get('fingerprint') != self._fingerprint(plugin_path):
+            return False
+        self.pending[plugin_name] = entry['handlers']
+        return True
+    
+    def load_pending(self, plugin_name: str) -> bool:
+        """导入一个推迟的插件"""
+        if self.pending.pop(plugin_name, None) is None:
+            return False
+        return self._import_deferred(plugin_name)
+    
+    def _import_deferred(self, plugin_name: str) -> bool:
+        """导入已从 pending 中取出的插件"""
+        plugin_path, plugin_file = self._plugin_location(plugin_name)
+        try:
+            self._load_single_plugin(plugin_name, plugin_path, plugin_file)
+        except Exception as e:
+            logger.error(f"加载插件 {plugin_name} 失败: {e}")
+            return False
+        logger.success(f"加载插件 {plugin_name} 成功（{self.import_times[plugin_name] * 1000:.0f} ms）")
+        self._write_cache()
+        return True
+    
+    def _get_import_lock(self) -> asyncio.Lock:
+        """导入插件的锁，保证同一时间只有一个插件在导入"""
+        loop = asyncio.get_running_loop()
+        if self._import_lock_loop is not loop:
+            self._import_lock = asyncio.Lock()
+            self._import_lock_loop = loop
+        return self._import_lock
+    
+    async def _import_pending(self, plugin_name: str) -> bool:
+        """在线程池中导入推迟的插件，服务器已启动时接着执行它的启动钩子
+        
+        导入在线程中进行，事件循环继续处理其他事件；导入和启动完成前，
+        可能匹配该插件的事件在 handle_event 中等待。
+        """
+        handlers = self.pending.pop(plugin_name, None)
+        if handlers is None:
+            return False
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self._starting[plugin_name] = (done, handlers)
+        try:
+            async with self._get_import_lock():
+                loaded = await loop.run_in_executor(None, self._import_deferred, plugin_name)
+            if loaded and self.started:
+                await self._start_loaded([plugin_name])
+            return loaded
+        finally:
+            if self._starting.get(plugin_name, (None,))[0] is done:
+                del self._starting[plugin_name]
+            done.set_result(None)
+    
+    async def _load_pending_for(self, event: Any) -> List[str]:
+        """导入可能匹配该事件的推迟插件，返回导入成功的插件名"""
+        loaded = []
+        for plugin_name, handlers in list(self.pending.items()):
+            if any(_may_match(metadata, event) for metadata in handlers):
+                if await self._import_pending(plugin_name):
+                    loaded.append(plugin_name)
+        return loaded
+    
+    async def load_pending_in_background(self):
+        """在线程池中逐个导入剩余的推迟插件，导入期间事件循环继续处理事件"""
+        while self.pending:
+            await self._import_pending(next(iter(self.pending)))
+    
+    @staticmethod
+    def _startup_dependencies(plugin_names: Set[str]) -> Dict[str, Set[str]]:
+        """插件之间声明的启动顺序：插件 -> 需要先完成启动的插件（只保留 plugin_names 之内的）"""
+        dependencies = {plugin_name: set() for plugin_name in plugin_names}
+        for hook in registry.get_hooks('startup'):
+            if hook['plugin'] in dependencies:
+                dependencies[hook['plugin']].update(name for name in hook['after']
+                                                    if name in dependencies and name != hook['plugin'])
+        return dependencies
+    
+    @staticmethod
+    def _has_cycle(dependencies: Dict[str, Set[str]]) -> bool:
+        visiting, done = set(), set()
+        def visit(plugin_name: str) -> bool:
+            if plugin_name in done:
+                return False
+            if plugin_name in visiting:
+                return True
+            visiting.add(plugin_name)
+            if any(visit(dependency) for dependency in dependencies[plugin_name]):
+                return True
+            visiting.discard(plugin_name)
+            done.add(plugin_name)
+            return False
+        return any(visit(plugin_name) for plugin_name in dependencies)
+    
+    async def _run_hooks(self, kind: str, plugin_names: Optional[List[str]] = None) -> List[str]:
+        """按插件并发执行钩子，同一插件的多个钩子按注册顺序执行，返回出错的插件名
+        
+        启动时插件等待其 after 中的插件完成；关闭时顺序相反，依赖者先关闭。
+        """
+        hooks_by_plugin: Dict[str, List[Dict]] = {}
+        for hook in registry.get_hooks(kind, plugin_names):
+            hooks_by_plugin.setdefault(hook['plugin'], []).append(hook)
+        if not hooks_by_plugin:
+            return []
+        
+        dependencies = self._startup_dependencies(set(hooks_by_plugin))
+        if kind == 'shutdown':
+            reversed_dependencies = {plugin_name: set() for plugin_name in dependencies}
+            for plugin_name, after in dependencies.items():
+                for dependency in after:
+                    reversed_dependencies[dependency].add(plugin_name)
+            dependencies = reversed_dependencies
+        if self._has_cycle(dependencies):
+            logger.error(f"插件的启动顺序存在循环依赖，{kind} 钩子将不按顺序执行: {dependencies}")
+            dependencies = {plugin_name: set() for plugin_name in dependencies}
+        
+        failed = []
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        async def run_plugin(plugin_name: str):
+            for dependency in dependencies[plugin_name]:
+                await tasks[dependency]
+            start = time.perf_counter()
+            for hook in hooks_by_plugin[plugin_name]:
+                try:
+                    await hook['function']()
+                except Exception as e:
+                    failed.append(plugin_name)
+                    logger.error(f"插件 {plugin_name} 的 {kind} 钩子 {hook['name']} 出错: {e}")
+                    import traceback
+                    logger.error(traceback.format_exc())
+                    break
+            logger.debug(f"插件 {plugin_name} 的 {kind} 钩子执行完成，耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+        
+        tasks.update((plugin_name, asyncio.ensure_future(run_plugin(plugin_name))) for plugin_name in hooks_by_plugin)
+        await asyncio.gather(*tasks.values())
+        return failed
+    
+    async def run_startup_hooks(self) -> List[str]:
+        """执行所有已加载插件的启动钩子，返回出错的插件名"""
+        failed = await self._run_hooks('startup')
+        self.started = True
+        return failed
+    
+    async def run_shutdown_hooks(self, timeout: float = 10.0) -> List[str]:
+        """执行所有已加载插件的关闭钩子，超过 timeout 秒未完成的钩子会被取消"""
+        self.started = False
+        try:
+            return await asyncio.wait_for(self._run_hooks('shutdown'), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"关闭钩子在 {timeout} 秒内未完成，已取消")
+            return []
+    
+    async def _start_loaded(self, plugin_names: List[str]):
+        """服务器运行期间加载的插件执行自己的启动钩子，完成前该插件的处理器不会被调用"""
+        task = asyncio.ensure_future(self._run_hooks('startup', plugin_names))
+        for plugin_name in plugin_names:
+            handlers = [_handler_metadata(func_info) for func_info in registry.get_plugin_functions(plugin_name)]
+            self._starting[plugin_name] = (task, handlers)
+        try:
+            await asyncio.shield(task)
+        finally:
+            for plugin_name in plugin_names:
+                if self._starting.get(plugin_name, (None,))[0] is task:
+                    del self._starting[plugin_name]
+    
+    def import_report(self) -> List[tuple]:
+        """各插件的导入耗时，按耗时从高到低排列"""
+        return sorted(self.import_times.items(), key=lambda item: item[1], reverse=True)
+    
+    def log_import_report(self, limit: int = 10):
+        """输出最慢的几个插件的导入耗时"""
+        report = self.import_report()
+        if not report:
+            return
+        logger.info(f"插件导入耗时共 {sum(seconds for _, seconds in report) * 1000:.0f} ms，最慢的插件:")
+        for plugin_name, seconds in report[:limit]:
+            logger.info(f"  {plugin_name:<24} {seconds * 1000:8.1f} ms")
     
     def _load_single_plugin(self, plugin_name: str, plugin_path: str, plugin_file: str):
         """加载单个插件"""
         original_sys_path = sys.path.copy()
+        modules_before = set(sys.modules)
+        start = time.perf_counter()
         
         try:
             if plugin_path not in sys.path:
@@ -71,6 +378,9 @@ class PluginManager:
             # 注册处理器
             self._register_handlers(module, plugin_name)
             self.plugins[plugin_name] = module
+            self.plugin_paths[plugin_name] = plugin_path
+            self.import_times[plugin_name] = time.perf_counter() - start
+            self._update_cache(plugin_name, plugin_path)
             
         except Exception as e:
             logger.error(f"导入插件 {plugin_name} 时出错: {e}")
@@ -81,6 +391,17 @@ class PluginManager:
             # 清除当前插件名称
             clear_current_plugin_name()
             sys.path[:] = original_sys_path
+            # 记录插件导入的、位于插件目录中的模块，重载时需要一并移除；
+            # 标准库和第三方模块即使由该插件首次导入也不记录，它们由所有插件共享
+            base_dir = os.path.abspath(self.plugins_base_dir or plugin_path)
+            self.plugin_modules[plugin_name] = {module_name for module_name in set(sys.modules) - modules_before
+                                                if self._is_under(sys.modules.get(module_name), base_dir)}
+    
+    @staticmethod
+    def _is_under(module, directory: str) -> bool:
+        """模块的源文件是否位于指定目录中"""
+        module_file = getattr(module, '__file__', None)
+        return bool(module_file) and os.path.abspath(module_file).startswith(directory + os.sep)
     
     def _register_handlers(self, module, plugin_name: str):
         """注册模块中的所有处理器"""
@@ -90,13 +411,221 @@ class PluginManager:
             if hasattr(obj, '_fun_call_register_meta'):
                 fun_call_count += 1
     
+    def plugin_for_path(self, file_path: str) -> Optional[str]:
+        """文件所属的插件名：插件目录下的文件属于对应插件，插件根目录下的文件属于 __root__"""
+        if not self.plugins_base_dir:
+            return None
+        base_dir = os.path.abspath(self.plugins_base_dir)
+        file_path = os.path.abspath(file_path)
+        if os.path.commonpath([base_dir, file_path]) != base_dir:
+            return None
+        relative = os.path.relpath(file_path, base_dir)
+        first = relative.split(os.sep)[0]
+        if first == os.curdir or first.endswith('.py'):
+            return "__root__"
+        return first
+    
+    def _stale_modules(self, plugin_name: str) -> Set[str]:
+        """插件导入过的模块，以及文件位于插件目录中的模块"""
+        stale = set(self.plugin_modules.get(plugin_name, ()))
+        plugin_path = self.plugin_paths.get(plugin_name)
+        if plugin_path and plugin_name != "__root__":
+            plugin_dir = os.path.abspath(plugin_path)
+            for module_name, module in list(sys.modules.items()):
+                if self._is_under(module, plugin_dir):
+                    stale.add(module_name)
+        return stale
+    
+    def _uses_modules(self, plugin_name: str, module_names: Set[str]) -> bool:
+        """插件或其导入的模块是否引用了指定模块（import 模块或 from 模块 import 对象）"""
+        modules = [self.plugins.get(plugin_name)]
+        modules.extend(sys.modules.get(name) for name in self.plugin_modules.get(plugin_name, ()))
+        for module in modules:
+            if module is None:
+                continue
+            for value in list(vars(module).values()):
+                if inspect.ismodule(value):
+                    if value.__name__ in module_names:
+                        return True
+                elif getattr(value, '__module__', None) in module_names:
+                    return True
+        return False
+    
+    def _reload_order(self, plugin_name: str) -> List[str]:
+        """需要重载的插件：发生变化的插件及所有（间接）依赖它的插件"""
+        order = [plugin_name]
+        stale = self._stale_modules(plugin_name)
+        changed = True
+        while changed:
+            changed = False
+            for other in self.plugins:
+                if other not in order and self._uses_modules(other, stale):
+                    order.append(other)
+                    stale |= self._stale_modules(other)
+                    changed = True
+        return order
+    
+    @staticmethod
+    def _check_syntax(files: List[str]) -> bool:
+        """重载前检查插件源码能否编译，避免因语法错误卸载正在运行的插件"""
+        for file_path in files:
+            try:
+                with open(file_path, 'rb') as f:
+                    compile(f.read(), file_path, 'exec')
+            except SyntaxError as e:
+                logger.error(f"插件源码存在语法错误，已跳过重载: {e}")
+                return False
+            except OSError:
+                continue
+        return True
+    
+    def _plugin_location(self, plugin_name: str) -> tuple:
+        """插件的 (目录, 入口文件)"""
+        if plugin_name == "__root__":
+            return self.plugins_base_dir, os.path.join(self.plugins_base_dir, "__init__.py")
+        plugin_path = os.path.join(self.plugins_base_dir, plugin_name)
+        return plugin_path, os.path.join(plugin_path, "__init__.py")
+    
+    def unload_plugin(self, plugin_name: str):
+        """注销插件的处理器并移除它导入的模块"""
+        for module_name in self._stale_modules(plugin_name):
+            sys.modules.pop(module_name, None)
+        registry.unregister_plugin(plugin_name)
+        self.plugins.pop(plugin_name, None)
+        self.plugin_paths.pop(plugin_name, None)
+        self.plugin_modules.pop(plugin_name, None)
+        # 进程池的子进程中仍是旧代码
+        handler_executors.restart_processes()
+    
+    async def reload_plugin(self, plugin_name: str) -> List[str]:
+        """在进程内重新导入插件及依赖它的插件，返回重新加载成功的插件名
+        
+        连接、等待中的 API 响应和其他插件不受影响；正在执行的处理器继续使用旧代码直到结束。
+        服务器已启动时，旧插件先执行关闭钩子，新插件加载后执行启动钩子。
+        插件目录被删除时只卸载插件。
+        """
+        if not self.plugins_base_dir:
+            return []
+        plugin_path, plugin_file = self._plugin_location(plugin_name)
+        if not os.path.exists(plugin_file):
+            self.pending.pop(plugin_name, None)
+            self._cache.pop(plugin_name, None)
+            if plugin_name in self.plugins:
+                if self.started:
+                    await self._run_hooks('shutdown', [plugin_name])
+                self.unload_plugin(plugin_name)
+                logger.info(f"插件 {plugin_name} 已移除，已卸载")
+            return []
+        if plugin_name == "__root__":
+            source_files = [plugin_file]
+        else:
+            source_files = [os.path.join(root, name) for root, _, names in os.walk(plugin_path)
+                            for name in names if name.endswith('.py')]
+        if not self._check_syntax(source_files):
+            return []
+        
+        self.pending.pop(plugin_name, None)
+        order = self._reload_order(plugin_name) if plugin_name in self.plugins else [plugin_name]
+        if self.started:
+            await self._run_hooks('shutdown', order)
+        
+        reloaded = []
+        # 等待线程池中正在进行的导入完成，避免同时导入两个插件
+        async with self._get_import_lock():
+            for name in order:
+                self.unload_plugin(name)
+            for name in order:
+                path, init_file = self._plugin_location(name)
+                try:
+                    self._load_single_plugin(name, path, init_file)
+                    reloaded.append(name)
+                except Exception as e:
+                    logger.error(f"重载插件 {name} 失败: {e}")
+        logger.success(f"已重载插件: {', '.join(reloaded) if reloaded else '无'}")
+        self._write_cache()
+        if self.started and reloaded:
+            await self._start_loaded(reloaded)
+        return reloaded
+    
     async def handle_event(self, event_type: str, event_data: Any):
         """处理事件"""
+        if self.pending:
+            await self._load_pending_for(event_data)
+        if self._starting:
+            # 只等待可能匹配该事件的插件完成导入和启动
+            waiting = {future for future, handlers in list(self._starting.values())
+                       if any(_may_match(metadata, event_data) for metadata in handlers)}
+            if waiting:
+                await asyncio.wait(waiting)
         try:
             from chat import fun_call
             await fun_call(event_data)
         except Exception as e:
             logger.error(f"调用 fun_call 时出错: {e}")
 
+class PluginWatcher:
+    """监视插件目录，文件变化时在事件循环中重载对应的插件
+    
+    watchdog 的回调在监视线程中执行，这里只把插件名转交给事件循环；
+    同一插件在 debounce 秒内的多次变化只触发一次重载。
+    """
+    
+    def __init__(self, manager: PluginManager, loop: asyncio.AbstractEventLoop, debounce: float = 0.5):
+        self.manager = manager
+        self.loop = loop
+        self.debounce = debounce
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._observer = None
+    
+    def start(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            logger.error("未安装 watchdog，无法开启插件热重载")
+            return
+        
+        watcher = self
+        
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.on_event(event)
+        
+        self._observer = Observer()
+        self._observer.schedule(_Handler(), self.manager.plugins_base_dir, recursive=True)
+        self._observer.start()
+        logger.info(f"已开启插件热重载，监视目录: {self.manager.plugins_base_dir}")
+    
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+    
+    def on_event(self, event):
+        """在监视线程中调用，只关心 .py 文件的变化；目录事件和插件缓存文件的写入不触发重载"""
+        if event.is_directory or event.event_type not in ('modified', 'created', 'deleted', 'moved'):
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path and path.endswith('.py'):
+                self.loop.call_soon_threadsafe(self._schedule, path)
+    
+    def _schedule(self, path: str):
+        plugin_name = self.manager.plugin_for_path(path)
+        if plugin_name is None or '__pycache__' in path:
+            return
+        timer = self._timers.pop(plugin_name, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[plugin_name] = self.loop.call_later(self.debounce, self._reload, plugin_name)
+    
+    def _reload(self, plugin_name: str):
+        self._timers.pop(plugin_name, None)
+        logger.info(f"检测到插件 {plugin_name} 变化，正在重载")
+        asyncio.ensure_future(self.manager.reload_plugin(plugin_name))
+
 # 全局插件管理器实例
 plugin_manager = PluginManager()
\ No newline at end of file
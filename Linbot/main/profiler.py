@@ -0,0 +1,160 @@
+# main/profiler.py
+import io
+import os
+import re
+import time
+import asyncio
+import cProfile
+import inspect
+import pstats
+from collections import deque
+from typing import Dict, List, Optional
+from logger import Logging
+
+logger = Logging.logger
+
+def _percentile(ordered: list, p: float) -> float:
+    """已排序样本的第 p 百分位"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+class HandlerStats:
+    """单个处理器的执行统计，随注册表中的处理器信息一起保存
+
+    分位数基于最近 sample_size 次调用计算。
+    """
+    __slots__ = ('calls', 'errors', 'total_time', 'max_time', 'samples')
+
+    def __init__(self, sample_size: int = 1024):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.samples: deque = deque(maxlen=sample_size)
+
+    def record(self, elapsed: float, failed: bool = False):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        if failed:
+            self.errors += 1
+        self.samples.append(elapsed)
+
+    def percentile(self, p: float) -> float:
+        """最近调用耗时的第 p 百分位（秒）"""
+        return _percentile(sorted(self.samples), p)
+
+    def reset(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.samples.clear()
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'avg_time': self.total_time / self.calls if self.calls else 0.0,
+            'p50': _percentile(ordered, 50),
+            'p99': _percentile(ordered, 99),
+            'max_time': self.max_time,
+        }
+
+class HandlerProfiler:
+    """处理器性能分析：可选的逐处理器统计、慢处理器告警，以及按插件的 cProfile 采集"""
+
+    def __init__(self):
+        self.enabled = False
+        """是否记录处理器统计，默认关闭"""
+        self.slow_threshold: Optional[float] = None
+        """处理器单次执行超过该耗时（秒）时输出警告，None 表示不检测"""
+        self._profiling_plugin: Optional[str] = None
+
+    def enable(self, slow_threshold: Optional[float] = None):
+        """开启处理器统计"""
+        self.enabled = True
+        self.slow_threshold = slow_threshold
+        logger.info(f"已开启处理器性能统计，慢处理器阈值: {slow_threshold if slow_threshold else '不检测'}")
+
+    def disable(self):
+        """关闭处理器统计，已有的统计保留"""
+        self.enabled = False
+
+    def record(self, func_info: Dict, elapsed: float, failed: bool = False):
+        """记录一次处理器调用"""
+        func_info['stats'].record(elapsed, failed)
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            logger.warning("慢处理器: %s.%s 耗时 %.3f 秒（阈值 %.3f 秒）",
+                           func_info['plugin'], func_info['name'], elapsed, self.slow_threshold)
+
+    def report(self, plugin_name: Optional[str] = None) -> List[dict]:
+        """各处理器的统计，按累计耗时从高到低排列"""
+        from registry import registry
+        functions = registry.get_plugin_functions(plugin_name) if plugin_name else registry.get_functions()
+        rows = []
+        for func_info in functions:
+            row = {'plugin': func_info['plugin'], 'handler': func_info['name']}
+            row.update(func_info['stats'].snapshot())
+            rows.append(row)
+        rows.sort(key=lambda row: row['total_time'], reverse=True)
+        return rows
+
+    def reset(self):
+        """清空所有处理器的统计"""
+        from registry import registry
+        for func_info in registry.get_functions():
+            func_info['stats'].reset()
+
+    async def profile_plugin(self, plugin_name: str, seconds: float = 10.0, output: Optional[str] = None,
+                             sort: str = 'cumulative', limit: int = 30) -> str:
+        """对事件循环线程运行 cProfile seconds 秒，返回只包含该插件源码的统计报告
+
+        output 不为空时同时保存原始的 pstats 数据，可用 snakeviz 等工具查看。
+        同一时间只能进行一次采集。
+        """
+        from registry import registry
+        functions = registry.get_plugin_functions(plugin_name)
+        if not functions:
+            raise KeyError(f"插件 {plugin_name} 没有注册任何处理器")
+        if self._profiling_plugin is not None:
+            raise RuntimeError(f"正在对插件 {self._profiling_plugin} 进行性能分析")
+
+        # 以处理器所在的目录（包插件）或文件（单文件插件）过滤报告
+        paths = set()
+        for func_info in functions:
+            source = inspect.getsourcefile(func_info['function'])
+            if source:
+                module_dir = os.path.dirname(source)
+                paths.add(module_dir if os.path.basename(module_dir) == plugin_name else source)
+        pattern = '|'.join(re.escape(path) for path in sorted(paths)) or re.escape(plugin_name)
+
+        profile = cProfile.Profile()
+        self._profiling_plugin = plugin_name
+        logger.info(f"开始对插件 {plugin_name} 进行性能分析，持续 {seconds} 秒")
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+        finally:
+            self._profiling_plugin = None
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats(sort).print_stats(pattern, limit)
+        if output:
+            stats.dump_stats(output)
+            logger.info(f"性能分析数据已保存到: {output}")
+        report = f"插件 {plugin_name} 性能分析（{time.perf_counter() - start:.1f} 秒）\n{stream.getvalue()}"
+        logger.info(report)
+        return report
+
+# 全局处理器性能分析器
+handler_profiler = HandlerProfiler()
@@ -1,15 +1,70 @@
 # main/registry.py
 import uuid
+import bisect
+import threading
 import inspect
-from typing import Dict, List, Callable, Any, Optional
+import pydantic
+from typing import Dict, List, Callable, Any, Optional, Tuple
 from logger import Logging
+from message_type import Messgaechat, CommandTrie
+from metrics import handler_metrics, remove_handler_metrics
+from profiler import HandlerStats
 
 logger = Logging.logger
 
+# 未指定优先级时的默认值，数值越小越先执行
+DEFAULT_PRIORITY = 1
+
+def _annotation_accepts(annotation: type, event_class: type) -> bool:
+    """判断事件参数的类型注解能否接收指定事件类"""
+    if issubclass(event_class, annotation):
+        return True
+    elif event_class.__name__ == annotation.__name__:
+        return True
+    elif annotation.__name__ == 'base_event':
+        return True
+    return False
+
+def _accepts_event(func_info: Dict, post_type: Optional[str], event_class: type) -> bool:
+    """判断处理器能否接收指定上报类型和事件类的事件"""
+    fun_arg_data = func_info['fun_arg_data']
+    if fun_arg_data and fun_arg_data.event_types and post_type and post_type not in fun_arg_data.event_types:
+        return False
+    
+    if not any(func_info['param_annotations'].values()):
+        return True
+    
+    return any(_annotation_accepts(annotation, event_class) for _, annotation in func_info['event_params'])
+
+def _build_call_plan(func_info: Dict, event_class: type) -> Tuple[Tuple[str, ...], bool]:
+    """计算处理器针对指定事件类的参数绑定方式：(接收事件的参数名, 是否传入 commandargs)"""
+    event_param_names = tuple(param_name for param_name, annotation in func_info['event_params']
+                              if _annotation_accepts(annotation, event_class))
+    bind_commandargs = 'commandargs' in func_info['param_annotations'] and 'commandargs' not in event_param_names
+    return event_param_names, bind_commandargs
+
+def _matcher_kind(fun_arg_data: Any) -> str:
+    """根据 on_msg 判断匹配器类型：message（总是匹配）、command（指令前缀）或 custom"""
+    on_msg = fun_arg_data.on_msg if fun_arg_data and fun_arg_data.on_msg else Messgaechat.on_message
+    if on_msg is Messgaechat.on_message:
+        return 'message'
+    elif on_msg is Messgaechat.on_command:
+        return 'command'
+    return 'custom'
+
 class FunctionRegistry:
     def __init__(self):
         self._functions: Dict[str, Dict] = {}
         self._plugin_functions: Dict[str, List[str]] = {}
+        # 分派索引：(post_type, 事件类) -> 按优先级、注册顺序排列的 (候选处理器, 参数绑定方式)
+        self._dispatch_index: Dict[Tuple[Optional[str], type], Tuple[Tuple[Dict, Tuple], ...]] = {}
+        # 所有 on_command 指令的前缀树，注册表变化后在下次使用时重建
+        self._command_trie: Optional[CommandTrie] = None
+        # 插件生命周期钩子：startup / shutdown -> 按注册顺序排列的钩子信息
+        self._hooks: Dict[str, List[Dict]] = {'startup': [], 'shutdown': []}
+        # 后台导入插件时在导入线程中注册处理器，修改注册表和建立索引时加锁；
+        # 索引命中时不加锁
+        self._lock = threading.RLock()
     
     def register(self, func: Callable, name: str = None, plugin_name: str = "unknown", 
                  fun_arg_data: Any = None) -> str:
@@ -26,48 +81,127 @@ class FunctionRegistry:
             else:
                 param_annotations[param_name] = None
         
-        # 存储函数信息
-        self._functions[func_id] = {
-            'id': func_id,
-            'name': name or func.__name__,
-            'function': func,
-            'param_annotations': param_annotations,
-            'signature': signature,
-            'original_name': func.__name__,
-            'plugin': plugin_name,
-            'fun_arg_data': fun_arg_data  # 存储 register_meta 实例
-        }
+        # 类型注解为 pydantic 模型的参数，分派时用于接收事件
+        event_params = tuple((param_name, annotation) for param_name, annotation in param_annotations.items()
+                             if inspect.isclass(annotation) and issubclass(annotation, pydantic.BaseModel))
         
-        # 记录插件与函数的关联
-        if plugin_name not in self._plugin_functions:
-            self._plugin_functions[plugin_name] = []
-        self._plugin_functions[plugin_name].append(func_id)
+        with self._lock:
+            # 存储函数信息
+            func_info = self._functions[func_id] = {
+                'id': func_id,
+                'name': name or func.__name__,
+                'function': func,
+                'param_annotations': param_annotations,
+                'event_params': event_params,
+                'signature': signature,
+                'original_name': func.__name__,
+                'plugin': plugin_name,
+                'fun_arg_data': fun_arg_data,  # 存储 register_meta 实例
+                'matcher': _matcher_kind(fun_arg_data),
+                'priority': fun_arg_data.priority if fun_arg_data else DEFAULT_PRIORITY,
+                'executor': getattr(fun_arg_data, 'executor', 'loop') if fun_arg_data else 'loop',
+                'metrics': handler_metrics(plugin_name, name or func.__name__),  # (耗时直方图, 异常计数)
+                'stats': HandlerStats()  # 开启处理器统计时记录
+            }
+        
+            # 记录插件与函数的关联
+            if plugin_name not in self._plugin_functions:
+                self._plugin_functions[plugin_name] = []
+            self._plugin_functions[plugin_name].append(func_id)
+        
+            if func_info['matcher'] == 'command':
+                self._command_trie = None
+        
+            # 增量更新已建立的分派索引
+            for key, handlers in self._dispatch_index.items():
+                post_type, event_class = key
+                if _accepts_event(func_info, post_type, event_class):
+                    # 插入到同优先级处理器的末尾
+                    index = bisect.bisect_right(handlers, func_info['priority'], key=lambda handler: handler[0]['priority'])
+                    entry = (func_info, _build_call_plan(func_info, event_class))
+                    self._dispatch_index[key] = handlers[:index] + (entry,) + handlers[index:]
 
         return func_id
     
     def unregister(self, func_id: str):
         """注销函数"""
-        if func_id in self._functions:
-            func_info = self._functions[func_id]
-            plugin_name = func_info['plugin']
+        with self._lock:
+            if func_id in self._functions:
+                func_info = self._functions[func_id]
+                plugin_name = func_info['plugin']
+            
+                # 从插件关联中移除
+                if plugin_name in self._plugin_functions and func_id in self._plugin_functions[plugin_name]:
+                    self._plugin_functions[plugin_name].remove(func_id)
             
-            # 从插件关联中移除
-            if plugin_name in self._plugin_functions and func_id in self._plugin_functions[plugin_name]:
-                self._plugin_functions[plugin_name].remove(func_id)
+                # 从函数列表中移除
+                del self._functions[func_id]
             
-            # 从函数列表中移除
-            del self._functions[func_id]
+                # 插件中没有同名处理器时移除它的指标
+                if not any(self._functions[other_id]['name'] == func_info['name']
+                           for other_id in self._plugin_functions.get(plugin_name, ())):
+                    remove_handler_metrics(plugin_name, func_info['name'])
+            
+                if func_info['matcher'] == 'command':
+                    self._command_trie = None
+            
+                # 从分派索引中移除
+                for key, handlers in self._dispatch_index.items():
+                    if any(handler[0] is func_info for handler in handlers):
+                        self._dispatch_index[key] = tuple(handler for handler in handlers if handler[0] is not func_info)
     
     def unregister_plugin(self, plugin_name: str):
-        """注销插件的所有函数"""
+        """注销插件的所有函数和生命周期钩子"""
         if plugin_name in self._plugin_functions:
             for func_id in self._plugin_functions[plugin_name][:]:
                 self.unregister(func_id)
+        for kind, hooks in self._hooks.items():
+            self._hooks[kind] = [hook for hook in hooks if hook['plugin'] != plugin_name]
+    
+    def register_hook(self, kind: str, func: Callable, plugin_name: str = "unknown", after: Tuple[str, ...] = ()):
+        """注册生命周期钩子，kind 为 startup 或 shutdown，after 为需要先于本插件执行启动钩子的插件"""
+        if kind not in self._hooks:
+            raise ValueError(f"未知的钩子类型: {kind}")
+        self._hooks[kind].append({
+            'name': func.__name__,
+            'function': func,
+            'plugin': plugin_name,
+            'after': tuple(after),
+        })
+    
+    def get_hooks(self, kind: str, plugin_names: Optional[List[str]] = None) -> List[Dict]:
+        """获取生命周期钩子，可只取指定插件的钩子"""
+        hooks = self._hooks[kind]
+        if plugin_names is None:
+            return list(hooks)
+        return [hook for hook in hooks if hook['plugin'] in plugin_names]
     
     def get_functions(self) -> List[Dict]:
         """获取所有函数信息"""
         return list(self._functions.values())
     
+    def get_handlers(self, post_type: Optional[str], event_class: type) -> Tuple[Tuple[Dict, Tuple], ...]:
+        """获取可能匹配指定事件的处理器及其参数绑定方式，结果按优先级排列，同优先级按注册顺序"""
+        key = (post_type, event_class)
+        handlers = self._dispatch_index.get(key)
+        if handlers is None:
+            with self._lock:
+                handlers = tuple(sorted(((func_info, _build_call_plan(func_info, event_class))
+                                         for func_info in self._functions.values()
+                                         if _accepts_event(func_info, post_type, event_class)),
+                                        key=lambda handler: handler[0]['priority']))
+                self._dispatch_index[key] = handlers
+        return handlers
+    
+    def get_command_trie(self) -> CommandTrie:
+        """获取所有 on_command 处理器指令组成的前缀树"""
+        trie = self._command_trie
+        if trie is None:
+            with self._lock:
+                trie = self._command_trie = CommandTrie(func_info['name'] for func_info in self._functions.values()
+                                                        if func_info['matcher'] == 'command')
+        return trie
+    
     def get_plugin_functions(self, plugin_name: str) -> List[Dict]:
         """获取指定插件的函数"""
         if plugin_name not in self._plugin_functions:
@@ -78,8 +212,14 @@ class FunctionRegistry:
     
     def clear(self):
         """清空所有注册的函数"""
-        self._functions.clear()
-        self._plugin_functions.clear()
+        with self._lock:
+            for func_info in self._functions.values():
+                remove_handler_metrics(func_info['plugin'], func_info['name'])
+            self._functions.clear()
+            self._plugin_functions.clear()
+            self._dispatch_index.clear()
+            self._command_trie = None
+        self._hooks = {'startup': [], 'shutdown': []}
 
 # 全局注册器实例
 registry = FunctionRegistry()
\ No newline at end of file
@@ -1,60 +1,118 @@
 # main/response_handler.py
-import json
 import asyncio
-import uuid
-from typing import Dict, Any, Optional
+import itertools
+import math
+from typing import Dict, Any, Optional, Tuple, Union
 from logger import Logging
 
 logger = Logging.logger
 
 class ResponseHandler:
-    """独立的响应处理器"""
-    
-    def __init__(self):
-        self._pending_requests: Dict[str, asyncio.Future] = {}
-        self._lock = asyncio.Lock()
-    
-    async def wait_for_response(self, echo: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
-        """等待指定 echo 的响应"""
-        async with self._lock:
-            if echo not in self._pending_requests:
-                future = asyncio.Future()
-                self._pending_requests[echo] = future
-            else:
-                future = self._pending_requests[echo]
-        
-        try:
-            return await asyncio.wait_for(future, timeout=timeout)
-        except asyncio.TimeoutError:
-            async with self._lock:
-                if echo in self._pending_requests:
-                    del self._pending_requests[echo]
-            raise
-        except Exception as e:
-            async with self._lock:
-                if echo in self._pending_requests:
-                    del self._pending_requests[echo]
-            raise
-    
+    """独立的响应处理器
+
+    echo 使用单调递增的整数；响应到达时在事件循环中直接完成对应的 Future，
+    不创建任务也不加锁。超时由一个共享的时间轮统一处理，不再为每个请求单独计时。
+    """
+
+    def __init__(self, timeout: float = 10.0, resolution: float = 0.1, slots: int = 128, echo_prefix: str = ''):
+        self.timeout = timeout
+        """默认超时时间（秒）"""
+        self.echo_prefix = echo_prefix
+        """echo 前缀，非空时 echo 为 "前缀+序号" 的字符串，分片模式下用于把响应转交给对应的工作进程"""
+        self.resolution = resolution
+        """时间轮每一格的时长（秒），超时误差不超过一格"""
+        self._pending_requests: Dict[Union[int, str], asyncio.Future] = {}
+        self._echo_counter = itertools.count(1)
+        # 时间轮：每格保存 (到期格数, echo)，到期时若请求仍未完成则设置超时异常
+        self._wheel: list[list[Tuple[int, Union[int, str]]]] = [[] for _ in range(slots)]
+        self._wheel_entries = 0
+        self._current_tick = 0
+        self._tick_handle: Optional[asyncio.TimerHandle] = None
+
+    def register_request(self, timeout: Optional[float] = None,
+                         start: bool = True) -> Tuple[Union[int, str], asyncio.Future]:
+        """登记一个等待响应的请求，返回 (echo, future)
+
+        start 为 False 时暂不开始计时，请求帧真正写出后再调用 start_timeout，
+        在发送队列中等待的时间不计入超时。
+        """
+        echo = next(self._echo_counter)
+        if self.echo_prefix:
+            echo = f"{self.echo_prefix}{echo}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending_requests[echo] = future
+        if start:
+            self.start_timeout(echo, timeout)
+        return echo, future
+
+    def start_timeout(self, echo: Union[int, str], timeout: Optional[float] = None):
+        """开始为已登记的请求计时，请求已完成或已放弃时忽略"""
+        if echo not in self._pending_requests:
+            return
+        ticks = max(1, math.ceil((self.timeout if timeout is None else timeout) / self.resolution))
+        deadline = self._current_tick + ticks
+        self._wheel[deadline % len(self._wheel)].append((deadline, echo))
+        self._wheel_entries += 1
+        if self._tick_handle is None:
+            self._tick_handle = asyncio.get_running_loop().call_later(self.resolution, self._tick)
+
+    def discard(self, echo: Union[int, str]):
+        """放弃等待指定 echo 的响应"""
+        future = self._pending_requests.pop(echo, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def wait_for_response(self, echo: Union[int, str]) -> Optional[Dict[str, Any]]:
+        """等待已登记的 echo 的响应，超时由时间轮处理"""
+        future = self._pending_requests.get(echo)
+        if future is None:
+            raise KeyError(f"没有登记的请求，echo: {echo}")
+        return await future
+
     def handle_response(self, response_data: Dict[str, Any]):
         """处理响应数据"""
         echo = response_data.get('echo')
-        if not echo:
+        if echo is None:
             return
-        
-        async def _process_response():
-            async with self._lock:
-                if echo in self._pending_requests:
-                    future = self._pending_requests[echo]
-                    if not future.done():
-                        future.set_result(response_data)
-                    del self._pending_requests[echo]
-                    logger.debug(f"成功处理响应，echo: {echo}")
-                else:
-                    logger.warning(f"响应到达时没有对应的等待，echo: {echo}")
-        
-        # 立即处理，不等待
-        asyncio.create_task(_process_response())
+
+        future = self._pending_requests.pop(echo, None)
+        if future is None and isinstance(echo, str) and echo.isdigit():
+            # 部分实现会把 echo 转为字符串返回
+            future = self._pending_requests.pop(int(echo), None)
+
+        if future is None:
+            logger.warning("响应到达时没有对应的等待，echo: %s", echo)
+        elif not future.done():
+            future.set_result(response_data)
+            logger.debug("成功处理响应，echo: %s", echo)
+
+    def _tick(self):
+        """时间轮前进一格，处理到期的请求"""
+        self._current_tick += 1
+        index = self._current_tick % len(self._wheel)
+        bucket = self._wheel[index]
+        if bucket:
+            remaining = []
+            for deadline, echo in bucket:
+                if deadline > self._current_tick:
+                    remaining.append((deadline, echo))
+                    continue
+                future = self._pending_requests.pop(echo, None)
+                if future is not None and not future.done():
+                    future.set_exception(asyncio.TimeoutError())
+            self._wheel_entries -= len(bucket) - len(remaining)
+            self._wheel[index] = remaining
+
+        # 时间轮为空时停止计时，下次登记请求时再启动
+        if self._wheel_entries:
+            self._tick_handle = asyncio.get_running_loop().call_later(self.resolution, self._tick)
+        else:
+            self._tick_handle = None
+
+    @property
+    def pending_count(self) -> int:
+        """等待响应的请求数"""
+        return len(self._pending_requests)
 
 # 全局响应处理器实例
-response_handler = ResponseHandler()
\ No newline at end of file
+response_handler = ResponseHandler()
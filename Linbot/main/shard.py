@@ -0,0 +1,357 @@
+# main/shard.py
+import asyncio
+import os
+import secrets
+import struct
+import sys
+import time
+from collections import deque
+from typing import List, Optional
+from aiohttp import WSMsgType
+from logger import Logging
+import codec
+from event import base_event, parse_event
+from context import get_current_event
+from dispatcher import EventDispatcher, session_key
+from connections import BotConnection, connection_registry
+from message_method import message_sender, outbound_pipeline
+from response_handler import response_handler
+from onebot_api import onebot_api
+from plugins_manager import plugin_manager, PluginWatcher
+from http_client import http_client
+from executors import handler_executors
+
+logger = Logging.logger
+
+# 主进程与工作进程之间的消息：(头长度, 正文长度) + JSON 头 + 正文
+# 正文是原样转发的 OneBot 帧，不重新编码
+_LENGTHS = struct.Struct('>II')
+TOKEN_ENV = 'LINBOT_SHARD_TOKEN'
+
+def _pack(header: dict, body: bytes = b'') -> bytes:
+    header_bytes = codec.encode(header)
+    return _LENGTHS.pack(len(header_bytes), len(body)) + header_bytes + body
+
+async def _read(reader: asyncio.StreamReader) -> tuple:
+    header_size, body_size = _LENGTHS.unpack(await reader.readexactly(_LENGTHS.size))
+    payload = await reader.readexactly(header_size + body_size)
+    return codec.decode(payload[:header_size]), payload[header_size:]
+
+class ShardPool:
+    """分片模式的主进程端
+
+    主进程保留 OneBot 的 WebSocket 连接，按会话（群号或 QQ 号）把事件转发给固定的工作进程，
+    同一会话总是落在同一个进程中，进程内再由分派器保证顺序。
+    通知事件另外发给其余分片，只用于使各自的查询缓存失效，不交给处理器。
+    工作进程发出的请求经本地连接交给主进程写出，响应按 echo 前缀转交回对应的工作进程。
+    工作进程意外退出时会被重新启动，期间发往该分片的事件被丢弃。
+    转发事件不等待工作进程读取：某个分片的发送缓冲超过 buffer_limit 字节时，发往它的事件被丢弃，
+    读取 OneBot 连接的循环不会因为一个分片处理不过来而停下，其他分片的响应照常转交。
+    """
+
+    def __init__(self, shards: int, argv: list, host: str = '127.0.0.1', ready_timeout: float = 120.0,
+                 buffer_limit: int = 4 * 1024 * 1024):
+        self.shards = shards
+        self.argv = list(argv)
+        """启动工作进程时传给 wsclient.py 的参数"""
+        self.host = host
+        self.ready_timeout = ready_timeout
+        self.buffer_limit = buffer_limit
+        """每个分片发送缓冲的上限（字节），超过时丢弃发往该分片的事件"""
+        self.address: Optional[str] = None
+        self._token = secrets.token_hex(16)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: List[Optional[asyncio.StreamWriter]] = [None] * shards
+        self._ready = [asyncio.Event() for _ in range(shards)]
+        self._processes: List[Optional[asyncio.subprocess.Process]] = [None] * shards
+        self._watchers: List[Optional[asyncio.Task]] = [None] * shards
+        self._running = False
+        self._last_drop_warning = 0.0
+        # 统计
+        self.forwarded = [0] * shards
+        self.relayed = [0] * shards
+        self.dropped = [0] * shards
+        self.restarts = [0] * shards
+
+    def shard_for(self, event: base_event) -> int:
+        """事件所属的分片，没有会话的事件交给 0 号分片"""
+        key = session_key(event)
+        if key is None:
+            return 0
+        return hash(key[1]) % self.shards
+
+    async def start(self):
+        """启动工作进程，等待它们全部加载完插件"""
+        self._server = await asyncio.start_server(self._on_worker, self.host, 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.address = f"{self.host}:{port}"
+        self._running = True
+        for index in range(self.shards):
+            await self._spawn(index)
+        await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in self._ready)), self.ready_timeout)
+        logger.info(f"{self.shards} 个分片工作进程已就绪")
+
+    async def _spawn(self, index: int):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wsclient.py')
+        command = [sys.executable, script, *self.argv, '--shard-worker', str(index), '--shard-address', self.address]
+        process = await asyncio.create_subprocess_exec(*command, env=dict(os.environ, **{TOKEN_ENV: self._token}))
+        self._processes[index] = process
+        self._watchers[index] = asyncio.create_task(self._watch(index, process))
+        logger.debug(f"分片工作进程 {index} 已启动，PID: {process.pid}")
+
+    async def _watch(self, index: int, process: asyncio.subprocess.Process):
+        returncode = await process.wait()
+        if not self._running:
+            return
+        logger.error(f"分片工作进程 {index} 意外退出，返回码: {returncode}，1 秒后重启")
+        self.restarts[index] += 1
+        await asyncio.sleep(1)
+        if self._running:
+            await self._spawn(index)
+
+    async def _on_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        index = None
+        try:
+            header, _ = await _read(reader)
+            if header.get('t') != 'hello' or header.get('token') != self._token:
+                logger.warning("拒绝了未知的分片连接")
+                return
+            index = header['shard']
+            self._writers[index] = writer
+            while True:
+                header, body = await _read(reader)
+                kind = header['t']
+                if kind == 'send':
+                    self._relay(index, header, body)
+                elif kind == 'ready':
+                    self._ready[index].set()
+                    logger.debug(f"分片工作进程 {index} 已就绪")
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            if index is not None and self._writers[index] is writer:
+                self._writers[index] = None
+                self._ready[index].clear()
+            writer.close()
+
+    def _relay(self, index: int, header: dict, frame: bytes):
+        """替工作进程写出一个请求帧"""
+        self.relayed[index] += 1
+        connection = connection_registry.resolve(header.get('self_id'))
+        if connection is None:
+            self._fail(index, header['echo'], f"账号 {header.get('self_id')} 未连接")
+            return
+        target = header.get('target')
+        # 消息发送可能在限速管线中等待，不能阻塞读取工作进程的后续请求
+        asyncio.ensure_future(self._send(index, connection, frame, tuple(target) if target else None, header['echo']))
+
+    async def _send(self, index: int, connection: BotConnection, frame: bytes, target: Optional[tuple], echo: str):
+        connection.requests += 1
+        try:
+            if target is None:
+                await connection.ws.send_frame(frame, WSMsgType.TEXT)
+            else:
+                await outbound_pipeline.send(connection.ws, frame, target)
+                # 帧在限速管线中排过队，写出后通知工作进程开始计时
+                writer = self._writers[index]
+                if writer is not None:
+                    writer.write(_pack({'t': 'sent', 'echo': echo}))
+        except Exception as e:
+            self._fail(index, echo, f"发送失败: {e}")
+
+    def _fail(self, index: int, echo: str, message: str):
+        """直接回复失败，工作进程不必等到超时"""
+        writer = self._writers[index]
+        if writer is not None:
+            response = {"status": "failed", "retcode": -1, "data": {}, "message": message, "echo": echo}
+            writer.write(_pack({'t': 'response'}, codec.encode(response)))
+
+    def route_response(self, data: dict, raw) -> bool:
+        """响应属于工作进程的请求时转交给它并返回 True"""
+        echo = data.get('echo')
+        if not isinstance(echo, str):
+            return False
+        shard, separator, _ = echo.partition(':')
+        if not separator or not shard.isdigit() or int(shard) >= self.shards:
+            return False
+        writer = self._writers[int(shard)]
+        if writer is not None:
+            writer.write(_pack({'t': 'response'}, raw if isinstance(raw, bytes) else raw.encode('utf-8')))
+        return True
+
+    def _drop(self, index: int, reason: str):
+        self.dropped[index] += 1
+        # 避免每丢弃一条就输出一次日志
+        now = time.monotonic()
+        if now - self._last_drop_warning >= 10:
+            self._last_drop_warning = now
+            logger.warning(f"分片工作进程 {index} {reason}，丢弃事件，累计丢弃: {self.dropped}")
+
+    async def dispatch(self, event: base_event, raw) -> bool:
+        """把事件原样转发给所属分片，返回事件是否被接收；不等待工作进程读取"""
+        index = self.shard_for(event)
+        writer = self._writers[index]
+        if writer is None or not self._ready[index].is_set():
+            self._drop(index, "未就绪")
+            return False
+        # 响应和通知不受此限制，只丢弃事件
+        if writer.transport.get_write_buffer_size() >= self.buffer_limit:
+            self._drop(index, "处理不过来")
+            return False
+        body = raw if isinstance(raw, bytes) else raw.encode('utf-8')
+        writer.write(_pack({'t': 'event'}, body))
+        self.forwarded[index] += 1
+        if event.post_type == 'notice':
+            # 每个分片都有自己的查询缓存，成员变动等通知要让所有分片失效
+            for other, other_writer in enumerate(self._writers):
+                if other != index and other_writer is not None and self._ready[other].is_set():
+                    other_writer.write(_pack({'t': 'notice'}, body))
+        return True
+
+    async def stop(self, timeout: float = 15.0):
+        """关闭与工作进程的连接，等待它们执行完关闭钩子后退出"""
+        self._running = False
+        for writer in self._writers:
+            if writer is not None:
+                writer.close()
+        processes = [process for process in self._processes if process is not None]
+        try:
+            await asyncio.wait_for(asyncio.gather(*(process.wait() for process in processes)), timeout)
+        except asyncio.TimeoutError:
+            for process in processes:
+                if process.returncode is None:
+                    logger.error(f"分片工作进程 PID {process.pid} 未正常退出，强制终止")
+                    process.kill()
+        for watcher in self._watchers:
+            if watcher is not None:
+                watcher.cancel()
+        if self._server is not None:
+            self._server.close()
+
+    def stats(self) -> list:
+        """各分片的状态"""
+        return [{
+            'shard': index,
+            'ready': self._ready[index].is_set(),
+            'forwarded': self.forwarded[index],
+            'relayed': self.relayed[index],
+            'dropped': self.dropped[index],
+            'restarts': self.restarts[index],
+        } for index in range(self.shards)]
+
+class ShardWorker:
+    """分片模式的工作进程端：加载插件，处理主进程转发来的事件，请求经主进程发出
+
+    读取主进程消息的循环只做不会等待的事：响应、计时通知立即处理，事件放入本地缓冲，
+    由单独的任务交给分派器。分派器的队列阻塞时响应仍能读到；
+    本地缓冲的上限与分派器队列相同，满时按分派器队列的过载策略丢弃。
+    """
+
+    def __init__(self, index: int, address: str, dispatcher: EventDispatcher, plugins_base_dir: str,
+                 plugin_load: str = 'eager', lazy_events: bool = False, reload_plugins: bool = False):
+        self.index = index
+        self.address = address
+        self.dispatcher = dispatcher
+        self.plugins_base_dir = plugins_base_dir
+        self.plugin_load = plugin_load
+        self.lazy_events = lazy_events
+        self.reload_plugins = reload_plugins
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._events: deque = deque()
+        self._events_ready = asyncio.Event()
+
+    async def _relay(self, frame: bytes, target: Optional[tuple], self_id: Optional[int], echo: str):
+        """MessageSender 的转发函数，未指定账号时使用当前事件的账号
+
+        消息发送帧要经过主进程的限速管线，收到主进程的 sent 通知后才开始计时；其他请求直接开始计时。
+        """
+        if self_id is None:
+            event = get_current_event()
+            self_id = event.self_id if event is not None else None
+        self._writer.write(_pack({'t': 'send', 'echo': echo, 'self_id': self_id, 'target': target}, frame))
+        await self._writer.drain()
+        if target is None:
+            response_handler.start_timeout(echo)
+
+    async def _read_loop(self):
+        while True:
+            header, body = await _read(self._reader)
+            kind = header['t']
+            if kind == 'response':
+                response_handler.handle_response(codec.decode(body))
+            elif kind == 'sent':
+                response_handler.start_timeout(header['echo'])
+            elif kind == 'notice':
+                # 其他分片的通知，只更新查询缓存
+                try:
+                    onebot_api.handle_notice(parse_event(codec.decode(body)))
+                except Exception as e:
+                    logger.error(f"解析通知失败: {e}")
+            elif kind == 'event':
+                try:
+                    event = parse_event(codec.decode(body), lazy=self.lazy_events)
+                except Exception as e:
+                    logger.error(f"解析事件失败: {e}")
+                    continue
+                if event.post_type == 'notice':
+                    onebot_api.handle_notice(event)
+                queue = self.dispatcher.queue
+                if len(self._events) < queue.maxsize:
+                    self._events.append((event, None))
+                else:
+                    queue.overflow(self._events, (event, None), f"分片 {self.index} 待入队的事件已满（{queue.maxsize}）")
+                self._events_ready.set()
+
+    async def _ingest(self):
+        """把读到的事件依次交给分派器，分派器的队列阻塞时只阻塞这里"""
+        while True:
+            await self._events_ready.wait()
+            self._events_ready.clear()
+            while self._events:
+                await self.dispatcher.submit(*self._events.popleft())
+
+    async def run(self):
+        """运行直到主进程断开连接"""
+        host, _, port = self.address.rpartition(':')
+        self._reader, self._writer = await asyncio.open_connection(host, int(port))
+        response_handler.echo_prefix = f"{self.index}:"
+        message_sender.relay = self._relay
+        self._writer.write(_pack({'t': 'hello', 'shard': self.index, 'token': os.environ.get(TOKEN_ENV)}))
+        # 启动钩子中的请求需要读取响应，先开始读取
+        reader = asyncio.create_task(self._read_loop())
+        ingest = asyncio.create_task(self._ingest())
+
+        plugin_manager.load_plugins(self.plugins_base_dir, self.plugin_load)
+        self.dispatcher.start()
+        watcher = None
+        if self.reload_plugins:
+            watcher = PluginWatcher(plugin_manager, asyncio.get_running_loop())
+            watcher.start()
+        await http_client.start()
+        await plugin_manager.run_startup_hooks()
+        self._writer.write(_pack({'t': 'ready'}))
+
+        background_load = None
+        if self.plugin_load == 'background' and plugin_manager.pending:
+            background_load = asyncio.create_task(plugin_manager.load_pending_in_background())
+        logger.info(f"分片工作进程 {self.index} 已启动，PID: {os.getpid()}")
+
+        try:
+            await reader
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info(f"分片工作进程 {self.index} 与主进程的连接已断开")
+        except asyncio.CancelledError:
+            pass
+        finally:
+            reader.cancel()
+            ingest.cancel()
+            if watcher is not None:
+                watcher.stop()
+            if background_load is not None:
+                background_load.cancel()
+            await self.dispatcher.stop()
+            await plugin_manager.run_shutdown_hooks()
+            handler_executors.shutdown()
+            await http_client.close()
+            self._writer.close()
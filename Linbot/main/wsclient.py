@@ -1,23 +1,47 @@
 # main/wsclient.py
 from aiohttp import web
-import aiohttp, json
+import aiohttp
 import asyncio
 import os
+import sys
 import argparse
-from event import base_event, GroupMessageEvent, PrivateMessageEvent, MessageEvent
-from _event_logger import call_logger, logger
-from message_method import message_sender
-from plugins_manager import plugin_manager
-from context import EventContext
+from event import parse_event
+import codec
+from _event_logger import logger, event_log_sampler
+from logger import Logging
+from message_method import message_sender, outbound_pipeline
+from plugins_manager import plugin_manager, PluginWatcher, LOAD_MODES
 from response_handler import response_handler
-
-connected_clients = set()
+from dispatcher import EventDispatcher, OVERLOAD_POLICIES
+from metrics import metrics
+from profiler import handler_profiler
+from http_client import http_client
+from onebot_api import onebot_api
+from connections import connection_registry
+from shard import ShardPool, ShardWorker
+from executors import handler_executors
 
 class WebSocketServer:
-    def __init__(self, working_dir=None):
+    def __init__(self, working_dir=None, lazy_events=False, workers=16, queue_size=1000,
+                 overload_policy='drop_oldest', reject_post_types=('meta_event',), ordered=True,
+                 session_queue_size=100, profile_handlers=False, slow_handler_threshold=None,
+                 reload_plugins=False, plugin_load='eager', shards=0, shard_argv=()):
         self.app = web.Application()
         self.working_dir = working_dir
+        self.lazy_events = lazy_events
+        self.reload_plugins = reload_plugins
+        self.plugin_load = plugin_load
+        self.dispatcher = EventDispatcher(workers, queue_size, overload_policy, reject_post_types,
+                                          ordered, session_queue_size)
+        # 分片模式下插件在工作进程中加载和运行，本进程只负责连接和转发
+        self.shard_pool = ShardPool(shards, shard_argv) if shards else None
         self.setup_routes()
+        self.setup_metrics()
+        if self.shard_pool is not None:
+            return
+        if profile_handlers:
+            handler_profiler.enable(slow_handler_threshold)
+            self.setup_debug_routes()
         self.load_plugins()
         
     def load_plugins(self):
@@ -40,40 +64,137 @@ class WebSocketServer:
         from registry import registry
         registry.clear()
         
-        plugin_manager.load_plugins(plugins_base_dir)
+        plugin_manager.load_plugins(plugins_base_dir, self.plugin_load)
 
     def setup_routes(self):
         self.app.router.add_get('/onebot/v11/ws', self.websocket_handler)
+        self.app.router.add_get('/metrics', self.metrics_handler)
+
+    def setup_metrics(self):
+        """注册在导出时才读取的状态指标"""
+        queue = self.dispatcher.queue
+        metrics.callback('linbot_connected_clients', '当前 WebSocket 连接数', lambda: len(connection_registry))
+        metrics.callback('linbot_account_in_flight', '各账号正在等待响应的请求数',
+                         lambda: {(str(item['self_id']),): item['in_flight'] for item in connection_registry.stats()},
+                         ('self_id',))
+        metrics.callback('linbot_account_requests_total', '各账号累计发出的请求数',
+                         lambda: {(str(item['self_id']),): item['requests'] for item in connection_registry.stats()},
+                         ('self_id',), 'counter')
+        metrics.callback('linbot_pending_responses', '等待响应的 API 请求数', lambda: response_handler.pending_count)
+        metrics.callback('linbot_event_queue_depth', '事件队列当前深度', lambda: queue.depth)
+        metrics.callback('linbot_event_queue_max_depth', '事件队列深度峰值', lambda: queue.max_depth)
+        metrics.callback('linbot_events_dropped_total', '过载时丢弃的事件数',
+                         lambda: {(post_type,): count for post_type, count in queue.dropped.items()},
+                         ('post_type',), 'counter')
+        metrics.callback('linbot_active_sessions', '正在处理中的会话数', lambda: len(self.dispatcher._sessions))
+        metrics.callback('linbot_http_requests_total', '共享 HTTP 客户端发出的请求数',
+                         lambda: http_client.stats()['requests'], type='counter')
+        metrics.callback('linbot_http_errors_total', '共享 HTTP 客户端请求出错的次数',
+                         lambda: http_client.stats()['errors'], type='counter')
+        metrics.callback('linbot_http_in_flight', '共享 HTTP 客户端进行中的请求数', lambda: http_client.stats()['in_flight'])
+        metrics.callback('linbot_http_connections', '共享 HTTP 连接池的连接数',
+                         lambda: {('acquired',): http_client.stats()['acquired'], ('idle',): http_client.stats()['idle']},
+                         ('state',))
+        metrics.callback('linbot_http_pool_utilization', '共享 HTTP 连接池占用比例', lambda: http_client.stats()['utilization'])
+        metrics.callback('linbot_http_pool_waiting', '等待空闲连接的请求数', lambda: http_client.stats()['waiting'])
+        metrics.callback('linbot_http_connections_total', '共享 HTTP 连接池新建与复用连接的次数',
+                         lambda: {('created',): http_client.stats()['connections_created'],
+                                  ('reused',): http_client.stats()['connections_reused']},
+                         ('kind',), 'counter')
+        for name, key, help_text, metric_type in (
+                ('linbot_executor_workers', 'workers', '处理器线程池和进程池的大小', 'gauge'),
+                ('linbot_executor_in_flight', 'in_flight', '在线程池和进程池中执行或排队的处理器调用数', 'gauge'),
+                ('linbot_executor_utilization', 'utilization', '处理器线程池和进程池的占用比例', 'gauge'),
+                ('linbot_executor_calls_total', 'completed', '在线程池和进程池中完成的处理器调用数', 'counter'),
+                ('linbot_executor_busy_seconds_total', 'busy_seconds', '处理器在线程池和进程池中的累计执行时间', 'counter')):
+            metrics.callback(name, help_text,
+                             lambda key=key: {(mode,): item[key] for mode, item in handler_executors.stats().items()},
+                             ('mode',), metric_type)
+        if self.shard_pool is not None:
+            self.setup_shard_metrics()
+        metrics.callback('linbot_api_cache_requests_total', 'OneBot 查询接口按缓存结果统计的调用次数',
+                         lambda: {(result,): onebot_api.stats()[result] for result in ('hits', 'misses', 'shared')},
+                         ('result',), 'counter')
+        metrics.callback('linbot_api_cache_invalidations_total', '通知导致的查询缓存失效次数',
+                         lambda: onebot_api.invalidations, type='counter')
+        metrics.callback('linbot_api_cache_entries', 'OneBot 查询缓存的条目数', lambda: len(onebot_api.cache))
+
+    def setup_shard_metrics(self):
+        """分片模式下各工作进程的转发统计"""
+        pool = self.shard_pool
+        for name, key, help_text in (('linbot_shard_events_total', 'forwarded', '转发给各分片的事件数'),
+                                     ('linbot_shard_requests_total', 'relayed', '各分片经主进程发出的请求数'),
+                                     ('linbot_shard_dropped_total', 'dropped', '分片未就绪时丢弃的事件数'),
+                                     ('linbot_shard_restarts_total', 'restarts', '分片工作进程重启次数')):
+            metrics.callback(name, help_text,
+                             lambda key=key: {(str(item['shard']),): item[key] for item in pool.stats()},
+                             ('shard',), 'counter')
+
+    def setup_debug_routes(self):
+        """处理器性能分析接口，仅在开启处理器统计时注册"""
+        self.app.router.add_get('/debug/handlers', self.handler_stats_handler)
+        self.app.router.add_get('/debug/profile', self.profile_handler)
+
+    async def handler_stats_handler(self, request):
+        """各处理器的调用次数、耗时分位数和异常次数，可用 plugin 参数筛选"""
+        return web.json_response(handler_profiler.report(request.query.get('plugin')))
+
+    async def profile_handler(self, request):
+        """对指定插件进行 cProfile 采集：/debug/profile?plugin=名称&seconds=10"""
+        plugin_name = request.query.get('plugin')
+        if not plugin_name:
+            raise web.HTTPBadRequest(text='缺少 plugin 参数')
+        try:
+            report = await handler_profiler.profile_plugin(plugin_name, float(request.query.get('seconds', 10)))
+        except KeyError as e:
+            raise web.HTTPNotFound(text=str(e))
+        except RuntimeError as e:
+            raise web.HTTPConflict(text=str(e))
+        return web.Response(text=report)
+
+    async def metrics_handler(self, request):
+        """以 Prometheus 文本格式导出指标"""
+        return web.Response(body=metrics.render().encode('utf-8'),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
 
     async def websocket_handler(self, request):
         ws = web.WebSocketResponse()
         await ws.prepare(request)
 
-        connected_clients.add(ws)
-        logger.info(f"新的 WebSocket 连接建立。当前连接数: {len(connected_clients)}")
+        # 反向 WebSocket 握手时 OneBot 实现会在 X-Self-ID 中给出账号
+        self_id = request.headers.get('X-Self-ID')
+        connection_registry.add(ws, int(self_id) if self_id and self_id.isdigit() else None)
+        logger.info(f"新的 WebSocket 连接建立。当前连接数: {len(connection_registry)}")
         
         try:
             async for msg in ws:
-                if msg.type == aiohttp.WSMsgType.TEXT:
-                    data = json.loads(msg.data)
+                if msg.type == aiohttp.WSMsgType.TEXT or msg.type == aiohttp.WSMsgType.BINARY:
+                    # 二进制帧直接解码，不经过 str
+                    data = codec.decode(msg.data)
                     
                     # 优先处理响应消息
                     if 'echo' in data:
-                        logger.debug(f"处理响应消息: {data}")
-                        # 立即同步处理响应
-                        response_handler.handle_response(data)
+                        logger.debug("处理响应消息: %s", data)
+                        # 工作进程发出的请求的响应原样转交，其余立即同步处理
+                        if self.shard_pool is None or not self.shard_pool.route_response(data, msg.data):
+                            response_handler.handle_response(data)
                         continue
                     
+                    # 分片模式下按会话转发给工作进程
+                    elif self.shard_pool is not None:
+                        event_obj = parse_event(data, lazy=True)
+                        connection_registry.observe(ws, event_obj)
+                        await self.shard_pool.dispatch(event_obj, msg.data)
+                    
                     # 然后处理事件消息
                     else:
-                        data = base_event(**data)
-                        # 异步处理事件日志
-                        asyncio.create_task(call_logger(data.post_type, data))
-                        event_obj = self._create_event_object(data)
-                        
-                        # 异步处理插件事件
-                        async with EventContext(event_obj, ws):
-                            asyncio.create_task(plugin_manager.handle_event(event_obj.post_type, event_obj))
+                        event_obj = parse_event(data, lazy=self.lazy_events)
+                        connection_registry.observe(ws, event_obj)
+                        # 通知在入队前就使查询缓存失效，避免排队期间读到旧数据
+                        if event_obj.post_type == 'notice':
+                            onebot_api.handle_notice(event_obj)
+                        # 放入事件队列，由工作协程记录日志并调用插件
+                        await self.dispatcher.submit(event_obj, ws)
                     
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     logger.error(f"WebSocket 错误: {ws.exception()}")
@@ -81,48 +202,142 @@ class WebSocketServer:
         except Exception as e:
             logger.warning(f"处理 WebSocket 时发生错误: {e}")
         finally:
-            connected_clients.remove(ws)
-            logger.info(f"WebSocket 连接关闭。当前连接数: {len(connected_clients)}")
+            connection_registry.remove(ws)
+            logger.info(f"WebSocket 连接关闭。当前连接数: {len(connection_registry)}")
         
         return ws
     
-    def _create_event_object(self, data: base_event):
-        """根据数据类型创建对应的事件对象"""
-        post_type = data.post_type
-        message_type = data.model_dump().get("message_type")
-        
-        if post_type == 'message':
-            if message_type == 'group':
-                return GroupMessageEvent(**data.model_dump())
-            elif message_type == 'private':
-                return PrivateMessageEvent(**data.model_dump())
-            else:
-                return MessageEvent(**data.model_dump())
-        else:
-            return data
-
     async def start_server(self, host='localhost', port=8050):
         runner = web.AppRunner(self.app)
         await runner.setup()
         
+        if self.shard_pool is not None:
+            # 工作进程全部加载完插件后才开始接受连接
+            await self.shard_pool.start()
+        else:
+            self.dispatcher.start()
+        watcher = None
+        if self.reload_plugins and plugin_manager.plugins_base_dir:
+            watcher = PluginWatcher(plugin_manager, asyncio.get_running_loop())
+            watcher.start()
+        
+        # 插件启动钩子可能用到共享 HTTP 客户端，先于钩子创建
+        await http_client.start()
+        # 插件启动钩子完成后才开始接受连接
+        await plugin_manager.run_startup_hooks()
+        
         site = web.TCPSite(runner, host, port)
         await site.start()
         
+        # 开始接受连接后再在后台导入推迟的插件
+        background_load = None
+        if self.plugin_load == 'background' and plugin_manager.pending:
+            background_load = asyncio.create_task(plugin_manager.load_pending_in_background())
+        
         logger.info(f"WebSocket 服务器启动在: ws://{host}:{port}/onebot/v11/ws")
+        logger.info(f"指标接口: http://{host}:{port}/metrics")
         
         try:
             while True:
                 await asyncio.sleep(3600)
         except asyncio.exceptions.CancelledError:
             logger.info("服务器关闭")
+            if watcher is not None:
+                watcher.stop()
+            if background_load is not None:
+                background_load.cancel()
+            if self.shard_pool is not None:
+                await self.shard_pool.stop()
+            await self.dispatcher.stop()
+            await plugin_manager.run_shutdown_hooks()
+            handler_executors.shutdown()
+            await http_client.close()
+
+def _positive_int(value: str) -> int:
+    """argparse 类型：不小于 1 的整数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须为不小于 1 的整数: {value}")
+    return number
 
 async def main():
     parser = argparse.ArgumentParser(description='LinBot WebSocket 服务器')
     parser.add_argument('-p', '--working-dir', help='工作目录路径')
+    parser.add_argument('--host', default='localhost', help='监听地址')
+    parser.add_argument('--port', type=int, default=8050, help='监听端口')
+    parser.add_argument('--lazy-events', action='store_true', help='使用延迟事件视图，子对象在访问时才构建')
+    parser.add_argument('--workers', type=int, default=16, help='事件处理工作协程数')
+    parser.add_argument('--queue-size', type=int, default=1000, help='事件队列容量')
+    parser.add_argument('--overload-policy', choices=OVERLOAD_POLICIES, default='drop_oldest',
+                        help='事件队列满时的处理策略；除 drop_oldest 外都可能阻塞读取端，使 API 响应等到超时')
+    parser.add_argument('--reject-post-types', nargs='*', default=['meta_event'], help='reject 策略下队列满时拒绝的上报类型')
+    parser.add_argument('--unordered', action='store_true', help='不保证同一会话内事件的处理顺序')
+    parser.add_argument('--session-queue-size', type=_positive_int, default=100, help='每个会话排队事件的上限，超出时按过载策略丢弃')
+    parser.add_argument('--group-rate', type=float, default=2.0, help='每个群每秒最多发送的消息数，0 表示不限制')
+    parser.add_argument('--user-rate', type=float, default=2.0, help='每个用户每秒最多发送的私聊消息数，0 表示不限制')
+    parser.add_argument('--global-rate', type=float, default=20.0, help='全局每秒最多发送的消息数，0 表示不限制')
+    parser.add_argument('--send-queue-timeout', type=float, default=30.0,
+                        help='消息在发送队列中最多等待的秒数，超过后放弃发送，0 表示不限制')
+    parser.add_argument('--json-backend', choices=list(codec.available_codecs()), help='JSON 后端，默认自动选择')
+    parser.add_argument('--log-format', choices=['color', 'json'], help='日志格式，json 为每行一条 JSON 记录')
+    parser.add_argument('--log-sample', nargs='*', default=[], metavar='TYPE=RATE',
+                        help='事件日志采样比例，如 message.group=0.1 meta_event=0')
+    parser.add_argument('--log-group-cap', type=int, help='每个群在一个汇总周期内最多记录的日志条数')
+    parser.add_argument('--log-summary-interval', type=float, default=60.0, help='事件汇总日志的间隔（秒），0 表示关闭')
+    parser.add_argument('--profile-handlers', action='store_true',
+                        help='记录每个处理器的耗时统计，并开放 /debug/handlers 和 /debug/profile 接口')
+    parser.add_argument('--slow-handler-threshold', type=float, help='处理器单次执行超过该秒数时输出警告')
+    parser.add_argument('--reload-plugins', action='store_true', help='插件文件变化时在进程内重载该插件，不断开连接')
+    parser.add_argument('--plugin-load', choices=LOAD_MODES, default='eager',
+                        help='插件加载方式：eager 启动时全部导入；lazy 按缓存的处理器信息在首个可能匹配的事件时导入；background 启动后在后台导入')
+    parser.add_argument('--http-limit', type=int, default=100, help='共享 HTTP 连接池的总连接数上限，0 表示不限制')
+    parser.add_argument('--http-limit-per-host', type=int, default=10, help='共享 HTTP 连接池每个主机的连接数上限')
+    parser.add_argument('--http-timeout', type=float, default=30.0, help='共享 HTTP 客户端单个请求的总超时（秒）')
+    parser.add_argument('--http-connect-timeout', type=float, default=10.0, help='共享 HTTP 客户端建立连接的超时（秒）')
+    parser.add_argument('--http-keepalive', type=float, default=30.0, help='共享 HTTP 连接池空闲连接保留的秒数')
+    parser.add_argument('--api-cache-size', type=int, default=1024, help='OneBot 查询缓存的条目上限，0 表示不缓存')
+    parser.add_argument('--api-cache-ttl', type=float, help='OneBot 查询缓存的秒数，默认按动作分别设置')
+    parser.add_argument('--thread-pool-size', type=int, help='执行方式为 thread 的处理器所用线程池的大小，默认 min(32, CPU 数 + 4)')
+    parser.add_argument('--process-pool-size', type=int, help='执行方式为 process 的处理器所用进程池的大小，默认为 CPU 数')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='分片工作进程数，按群号或 QQ 号把事件分给多个进程处理，0 表示在本进程处理')
+    parser.add_argument('--shard-worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--shard-address', help=argparse.SUPPRESS)
     args = parser.parse_args()
     
-    server = WebSocketServer(working_dir=args.working_dir)
-    await server.start_server()
+    sample_rates = {}
+    for item in args.log_sample:
+        event_type, _, rate = item.partition('=')
+        sample_rates[event_type] = float(rate)
+    event_log_sampler.configure(sample_rates, args.log_group_cap, args.log_summary_interval or None)
+    if args.log_format:
+        Logging.configure(log_format=args.log_format)
+    if args.json_backend:
+        codec.set_codec(args.json_backend)
+    http_client.configure(limit=args.http_limit, limit_per_host=args.http_limit_per_host, timeout=args.http_timeout,
+                          connect_timeout=args.http_connect_timeout, keepalive_timeout=args.http_keepalive)
+    onebot_api.configure(maxsize=args.api_cache_size, ttl=args.api_cache_ttl)
+    handler_executors.configure(args.thread_pool_size, args.process_pool_size)
+    outbound_pipeline.configure(group_rate=args.group_rate, user_rate=args.user_rate, global_rate=args.global_rate,
+                                max_queue_wait=args.send_queue_timeout)
+    if args.shard_worker is not None:
+        if args.profile_handlers:
+            handler_profiler.enable(args.slow_handler_threshold)
+        dispatcher = EventDispatcher(args.workers, args.queue_size, args.overload_policy, args.reject_post_types,
+                                     not args.unordered, args.session_queue_size)
+        worker = ShardWorker(args.shard_worker, args.shard_address, dispatcher,
+                             os.path.join(args.working_dir or os.getcwd(), 'plugins'), args.plugin_load,
+                             args.lazy_events, args.reload_plugins)
+        await worker.run()
+        return
+    server = WebSocketServer(working_dir=args.working_dir, lazy_events=args.lazy_events,
+                             workers=args.workers, queue_size=args.queue_size,
+                             overload_policy=args.overload_policy, reject_post_types=args.reject_post_types,
+                             ordered=not args.unordered, session_queue_size=args.session_queue_size,
+                             profile_handlers=args.profile_handlers, slow_handler_threshold=args.slow_handler_threshold,
+                             reload_plugins=args.reload_plugins, plugin_load=args.plugin_load,
+                             shards=args.shards, shard_argv=sys.argv[1:])
+    await server.start_server(args.host, args.port)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
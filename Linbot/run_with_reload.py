@@ -11,10 +11,11 @@ from main.logger import Logging
 logger = Logging.logger
 
 class PythonFileChangeHandler(FileSystemEventHandler):
-    def __init__(self, script_path, working_dir=None, plugins_base_dir=None, debounce_interval=1.0):
+    def __init__(self, script_path, working_dir=None, plugins_base_dir=None, debounce_interval=1.0, hot_plugins=False):
         self.script_path = script_path
         self.working_dir = working_dir
         self.plugins_base_dir = plugins_base_dir
+        self.hot_plugins = hot_plugins
         self.debounce_interval = debounce_interval
         self.timer = None
         self.last_modified = {}
@@ -28,6 +29,10 @@ class PythonFileChangeHandler(FileSystemEventHandler):
         """
         # 只处理.py文件且不是目录
         if event.src_path.endswith('.py') and not event.is_directory:
+            # 插件由服务器进程内重载，不需要重启
+            if self.hot_plugins and self._in_plugins_dir(event.src_path):
+                return
+            
             # 获取文件当前的修改时间
             current_mtime = os.path.getmtime(event.src_path)
             
@@ -49,6 +54,12 @@ class PythonFileChangeHandler(FileSystemEventHandler):
             self.timer = threading.Timer(self.debounce_interval, self._delayed_restart, [event.src_path])
             self.timer.start()
     
+    def _in_plugins_dir(self, file_path):
+        if not self.plugins_base_dir:
+            return False
+        plugins_dir = os.path.abspath(self.plugins_base_dir)
+        return os.path.abspath(file_path).startswith(plugins_dir + os.sep)
+    
     def _delayed_restart(self, file_path):
         """延迟重启，确保文件修改完成"""
         logger.debug(f"检测到文件变更: {os.path.basename(file_path)}")
@@ -74,6 +85,8 @@ class PythonFileChangeHandler(FileSystemEventHandler):
         cmd = [sys.executable, self.script_path]
         if self.working_dir:
             cmd.extend(['-p', self.working_dir])
+        if self.hot_plugins:
+            cmd.append('--reload-plugins')
         
         self.process = subprocess.Popen(cmd)
 
@@ -87,6 +100,7 @@ class PythonFileChangeHandler(FileSystemEventHandler):
 def main():
     parser = argparse.ArgumentParser(description='LinBot 热重载启动器')
     parser.add_argument('-p', '--working-dir', help='工作目录路径')
+    parser.add_argument('--hot-plugins', action='store_true', help='插件变化时在服务器进程内重载，只有框架代码变化才重启')
     args = parser.parse_args()
     
     script_to_run = "main/wsclient.py"
@@ -114,7 +128,8 @@ def main():
         script_to_run, 
         working_dir=working_dir,
         plugins_base_dir=plugins_base_dir,
-        debounce_interval=1.0
+        debounce_interval=1.0,
+        hot_plugins=args.hot_plugins
     )
     
     observer = Observer()
@@ -0,0 +1,63 @@
+# benchmarks/bench_codec.py
+"""JSON 编解码基准测试：比较各可用后端在 OneBot 上报与发送数据上的吞吐"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Linbot', 'main'))
+
+from codec import available_codecs
+from bench_event_decode import PAYLOADS
+from report import add_output_argument, write_results
+
+def _large_group_message() -> dict:
+    """包含大量消息段和 raw_pb 的群消息"""
+    payload = dict(PAYLOADS["group_message"])
+    payload["message"] = [
+        {"type": "at", "data": {"qq": str(20000 + i)}} if i % 3 == 0 else
+        {"type": "text", "data": {"text": f"第 {i} 段消息内容，包含一些中文与 emoji 😀"}}
+        for i in range(60)
+    ]
+    payload["raw_message"] = "".join(segment["data"].get("text", "") for segment in payload["message"])
+    payload["raw_pb"] = "CgQIARAB" * 512
+    return payload
+
+def _send_group_msg() -> dict:
+    return {
+        "action": "send_group_msg",
+        "params": {"group_id": 30003, "message": [{"type": "text", "data": {"text": "收到：你好 " * 20}}]},
+        "echo": 12345,
+    }
+
+def bench(func, arg, number: int) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(number):
+        func(arg)
+    return (time.perf_counter() - start) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 编解码基准测试')
+    parser.add_argument('-n', '--number', type=int, default=20000, help='每项测试的调用次数')
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    payloads = dict(PAYLOADS)
+    payloads["large_group_message"] = _large_group_message()
+    payloads["send_group_msg"] = _send_group_msg()
+
+    codecs = available_codecs()
+    results = []
+    for name, payload in payloads.items():
+        frame = codecs['json'].encode(payload)
+        for codec in codecs.values():
+            decode_us = bench(codec.decode, frame, args.number)
+            encode_us = bench(codec.encode, payload, args.number)
+            print(f"{name:<20} {codec.name:<8} {len(frame):7d} B  decode {decode_us:8.2f} us  encode {encode_us:8.2f} us")
+            results.append({'name': name, 'backend': codec.name, 'bytes': len(frame),
+                            'decode_us': decode_us, 'encode_us': encode_us})
+    write_results('codec', results, args.json, number=args.number)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_dispatch.py
+"""分派路径微基准：fun_call 在 N 个处理器下的耗时、on_command 匹配与 ResponseHandler 往返"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Linbot', 'main'))
+
+from event import parse_event, GroupMessageEvent
+from registry import registry
+from message_type import Messgaechat, CommandTrie
+from chat import fun_call, fun_call_register, set_current_plugin_name, clear_current_plugin_name
+from response_handler import ResponseHandler
+from generator import EventGenerator
+from logger import Logging
+from report import add_output_argument, write_results
+
+def _register_handlers(count: int, kind: str):
+    """注册 count 个处理器：command 为互不相同的指令，message 为匹配所有消息"""
+    registry.clear()
+    set_current_plugin_name('bench')
+    try:
+        for index in range(count):
+            if kind == 'command':
+                @fun_call_register(f"/cmd{index}", on_msg=Messgaechat.on_command)
+                async def handler(event: GroupMessageEvent, commandargs):
+                    pass
+            else:
+                @fun_call_register(f"handler{index}")
+                async def handler(event: GroupMessageEvent):
+                    pass
+    finally:
+        clear_current_plugin_name()
+
+async def bench_fun_call(count: int, kind: str, number: int, lazy: bool) -> dict:
+    """一条群消息经过 fun_call 分派的平均耗时"""
+    _register_handlers(count, kind)
+    text = f"/cmd{count // 2} 参数" if kind == 'command' else "普通消息"
+    event = parse_event(EventGenerator(seed=0).group_message(text), lazy=lazy)
+    await fun_call(event)
+    start = time.perf_counter()
+    for _ in range(number):
+        await fun_call(event)
+    elapsed = time.perf_counter() - start
+    registry.clear()
+    return {'name': f'fun_call.{kind}', 'handlers': count, 'us_per_op': elapsed / number * 1e6}
+
+def bench_on_command(count: int, number: int) -> list:
+    """逐个处理器调用 on_command 与一次前缀树匹配的比较"""
+    instructions = [f"/cmd{index}" for index in range(count)]
+    msg = f"/cmd{count // 2} 参数"
+    start = time.perf_counter()
+    for _ in range(number):
+        for instruction in instructions:
+            Messgaechat.on_command(instruction, msg)
+    linear = (time.perf_counter() - start) / number * 1e6
+
+    trie = CommandTrie(instructions)
+    start = time.perf_counter()
+    for _ in range(number):
+        trie.match(msg)
+    trie_us = (time.perf_counter() - start) / number * 1e6
+    return [
+        {'name': 'on_command.linear', 'handlers': count, 'us_per_op': linear},
+        {'name': 'on_command.trie', 'handlers': count, 'us_per_op': trie_us},
+    ]
+
+async def bench_response_roundtrip(number: int, concurrency: int) -> dict:
+    """登记请求、收到响应并唤醒等待者的平均耗时"""
+    handler = ResponseHandler()
+
+    async def one():
+        echo, future = handler.register_request()
+        asyncio.get_running_loop().call_soon(handler.handle_response, {'status': 'ok', 'echo': echo})
+        await future
+
+    start = time.perf_counter()
+    for _ in range(number // concurrency):
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {'name': 'response_handler.roundtrip', 'concurrency': concurrency,
+            'us_per_op': elapsed / (number // concurrency * concurrency) * 1e6}
+
+async def run(args) -> list:
+    results = []
+    for count in args.handlers:
+        for kind in ('command', 'message'):
+            results.append(await bench_fun_call(count, kind, args.number, args.lazy))
+        results.extend(bench_on_command(count, args.number))
+    for concurrency in (1, 100):
+        results.append(await bench_response_roundtrip(args.number, concurrency))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='分派路径微基准')
+    parser.add_argument('-n', '--number', type=int, default=5000, help='每项测试的次数')
+    parser.add_argument('--handlers', type=int, nargs='*', default=[1, 10, 100], help='注册的处理器数量')
+    parser.add_argument('--lazy', action='store_true', help='使用延迟事件视图')
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    # 调试日志的入队开销会计入结果，测试时只保留警告
+    Logging.configure(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    for result in results:
+        detail = ' '.join(f"{key}={value}" for key, value in result.items() if key not in ('name', 'us_per_op'))
+        print(f"{result['name']:<28} {detail:<16} {result['us_per_op']:10.2f} us/op")
+    write_results('dispatch', results, args.json, number=args.number, lazy=args.lazy)
+
+if __name__ == "__main__":
+    main()
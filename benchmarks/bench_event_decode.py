@@ -0,0 +1,78 @@
+# benchmarks/bench_event_decode.py
+"""事件解析基准测试：测量单条上报从 JSON 帧到事件对象的 CPU 耗时与内存占用"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Linbot', 'main'))
+
+from event import parse_event
+from codec import codec
+from report import add_output_argument, write_results
+
+PAYLOADS = {
+    "group_message": {
+        "self_id": 10001, "user_id": 20002, "time": 1735689600, "message_id": 123456,
+        "message_seq": 123456, "real_id": 123456, "message_type": "group",
+        "sender": {"user_id": 20002, "nickname": "测试用户", "card": "", "role": "member"},
+        "raw_message": "/echo 你好", "font": 14, "sub_type": "normal",
+        "message": [{"type": "text", "data": {"text": "/echo 你好"}}],
+        "message_format": "array", "post_type": "message",
+        "group_id": 30003, "group_name": "测试群", "raw_pb": "",
+    },
+    "private_message": {
+        "self_id": 10001, "user_id": 20002, "time": 1735689600, "message_id": 123457,
+        "message_seq": 123457, "real_id": 123457, "message_type": "private",
+        "sender": {"user_id": 20002, "nickname": "测试用户", "card": ""},
+        "raw_message": "你好", "font": 14, "sub_type": "friend",
+        "message": [{"type": "text", "data": {"text": "你好"}}],
+        "message_format": "array", "post_type": "message",
+        "target_id": 20002, "raw_pb": "",
+    },
+    "heartbeat": {
+        "time": 1735689600, "self_id": 10001, "post_type": "meta_event",
+        "meta_event_type": "heartbeat", "status": {"online": True, "good": True}, "interval": 30000,
+    },
+}
+
+def bench(frame: bytes, number: int, lazy: bool = False) -> float:
+    """返回每条事件的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(number):
+        parse_event(codec.decode(frame), lazy=lazy)
+    return (time.perf_counter() - start) / number * 1e6
+
+def bench_memory(frame: bytes, number: int, lazy: bool = False) -> tuple[float, float]:
+    """返回每条事件常驻的字节数与内存块数（不含 JSON 解码产生的字典）"""
+    datas = [codec.decode(frame) for _ in range(number)]
+    tracemalloc.start()
+    before_size, _ = tracemalloc.get_traced_memory()
+    before_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    events = [parse_event(data, lazy=lazy) for data in datas]
+    after_size, _ = tracemalloc.get_traced_memory()
+    after_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del events
+    return (after_size - before_size) / number, (after_blocks - before_blocks) / number
+
+def main():
+    parser = argparse.ArgumentParser(description='事件解析基准测试')
+    parser.add_argument('-n', '--number', type=int, default=20000, help='每种事件的解析次数')
+    parser.add_argument('--lazy', action='store_true', help='使用延迟事件视图')
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    print(f"JSON 后端: {codec.name}")
+    results = []
+    for name, payload in PAYLOADS.items():
+        frame = codec.encode(payload)
+        per_event = bench(frame, args.number, args.lazy)
+        size, blocks = bench_memory(frame, min(args.number, 5000), args.lazy)
+        print(f"{name:<16} {per_event:8.2f} us/event {size:8.0f} B/event {blocks:6.1f} allocs/event")
+        results.append({'name': name, 'us_per_event': per_event, 'bytes_per_event': size, 'allocs_per_event': blocks})
+    write_results('event_decode', results, args.json, number=args.number, lazy=args.lazy)
+
+if __name__ == "__main__":
+    main()
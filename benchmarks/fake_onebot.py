@@ -0,0 +1,233 @@
+# benchmarks/fake_onebot.py
+"""模拟 OneBot 实现的压测客户端
+
+连接到 /onebot/v11/ws，按目标速率发送合成上报，对收到的 API 请求按设定的延迟返回响应。
+一部分消息是带编号的 /echo 指令，配合 workdir/plugins/bench_echo 插件可以测量
+从上报到收到回复的端到端延迟。使用 --serve 时会在子进程中启动服务器，监听 --port 指定的端口。
+"""
+import os
+import re
+import sys
+import time
+import shlex
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Linbot', 'main'))
+
+import aiohttp
+from codec import codec
+from generator import EventGenerator
+from report import ROOT, add_output_argument, write_results
+
+_TOKEN = re.compile(r'bench-(\d+)')
+
+def _percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+class FakeOneBot:
+    """按 rate 条/秒发送 duration 秒的上报，ack_latency 为响应 API 请求前的等待时间（秒）"""
+
+    def __init__(self, url: str, rate: float = 500.0, duration: float = 10.0, ack_latency: float = 0.005,
+                 generator: EventGenerator = None, drain_timeout: float = 5.0):
+        self.url = url
+        self.rate = rate
+        self.duration = duration
+        self.ack_latency = ack_latency
+        self.generator = generator or EventGenerator(seed=0)
+        self.drain_timeout = drain_timeout
+        self._sent_at: dict = {}
+        self._seq = 0
+        self._latencies: list = []
+        self._actions: dict = {}
+        self._events_sent = 0
+        self._send_lag = 0.0
+        self._send_elapsed = 0.0
+        self._sending = True
+        self._done = asyncio.Event()
+        self._responding: set = set()
+        self._response_errors = 0
+
+    def _next_frame(self) -> bytes:
+        """生成下一帧；指令消息带上编号，回复中出现该编号即视为完成"""
+        event = self.generator.next()
+        if event["post_type"] == "message" and event["raw_message"].startswith(self.generator.commands):
+            seq = self._seq = self._seq + 1
+            text = f"{self.generator.commands[0]} bench-{seq}"
+            event["message"] = [{"type": "text", "data": {"text": text}}]
+            event["raw_message"] = text
+            self._sent_at[seq] = time.perf_counter()
+        return codec.encode(event)
+
+    async def _send_events(self, ws):
+        total = int(self.rate * self.duration)
+        start = time.perf_counter()
+        for index in range(total):
+            target = start + index / self.rate
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self._send_lag = max(self._send_lag, -delay)
+            await ws.send_bytes(self._next_frame())
+            self._events_sent += 1
+        self._send_elapsed = time.perf_counter() - start
+        self._sending = False
+
+    def _on_action(self, ws, request: dict):
+        action = request.get("action")
+        self._actions[action] = self._actions.get(action, 0) + 1
+        if action in ("send_group_msg", "send_private_msg"):
+            for segment in request.get("params", {}).get("message", []):
+                match = _TOKEN.search(segment.get("data", {}).get("text", ""))
+                if match:
+                    sent_at = self._sent_at.pop(int(match.group(1)), None)
+                    if sent_at is not None:
+                        self._latencies.append(time.perf_counter() - sent_at)
+                    break
+            data = {"message_id": 1}
+        else:
+            data = {}
+        response = codec.encode({"status": "ok", "retcode": 0, "data": data, "echo": request.get("echo")})
+        task = asyncio.create_task(self._respond(ws, response))
+        self._responding.add(task)
+        task.add_done_callback(self._responded)
+        if not self._sent_at and not self._sending:
+            self._done.set()
+
+    async def _respond(self, ws, response: bytes):
+        if self.ack_latency > 0:
+            await asyncio.sleep(self.ack_latency)
+        await ws.send_bytes(response)
+
+    def _responded(self, task: asyncio.Task):
+        """取回响应任务的结果，发送失败时计数"""
+        self._responding.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._response_errors += 1
+
+    async def _receive(self, ws):
+        async for msg in ws:
+            if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                request = codec.decode(msg.data)
+                if "action" in request:
+                    self._on_action(ws, request)
+
+    async def run(self) -> dict:
+        """执行压测并返回结果"""
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.url, max_msg_size=0) as ws:
+                receiver = asyncio.create_task(self._receive(ws))
+                await self._send_events(ws)
+                # 发送结束后等待剩余的回复
+                if self._sent_at:
+                    try:
+                        await asyncio.wait_for(self._done.wait(), self.drain_timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                receiver.cancel()
+                await asyncio.gather(receiver, return_exceptions=True)
+                # 关闭连接前等待尚未发出的响应
+                await asyncio.gather(*self._responding, return_exceptions=True)
+
+        latencies = sorted(self._latencies)
+        return {
+            'events_sent': self._events_sent,
+            'target_rate': self.rate,
+            'achieved_rate': self._events_sent / self._send_elapsed if self._send_elapsed else 0.0,
+            'max_send_lag': self._send_lag,
+            'actions': dict(self._actions),
+            'replies': len(latencies),
+            'missing_replies': len(self._sent_at),
+            'response_errors': self._response_errors,
+            'reply_latency_p50': _percentile(latencies, 50),
+            'reply_latency_p90': _percentile(latencies, 90),
+            'reply_latency_p99': _percentile(latencies, 99),
+            'reply_latency_max': latencies[-1] if latencies else 0.0,
+        }
+
+async def _port_open(host: str, port: int) -> bool:
+    try:
+        _, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+async def _wait_for_server(server: subprocess.Popen, host: str, port: int, timeout: float = 30.0):
+    """等待子进程中的服务器开始监听；子进程退出（如端口绑定失败）或超时时报错"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(f"服务器进程在监听端口 {port} 之前退出，返回码 {server.returncode}")
+        if await _port_open(host, port):
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"等待服务器监听端口 {port} 超时（{timeout} 秒）")
+        await asyncio.sleep(0.2)
+
+async def main():
+    parser = argparse.ArgumentParser(description='模拟 OneBot 客户端压测')
+    parser.add_argument('--url', help='服务器地址，默认为 ws://localhost:<port>/onebot/v11/ws')
+    parser.add_argument('--port', type=int, default=8050, help='服务器端口，--serve 时也是子进程监听的端口')
+    parser.add_argument('--rate', type=float, default=500.0, help='每秒发送的上报数')
+    parser.add_argument('--duration', type=float, default=10.0, help='发送时长（秒）')
+    parser.add_argument('--ack-latency', type=float, default=0.005, help='响应 API 请求前等待的秒数')
+    parser.add_argument('--command-ratio', type=float, default=0.1, help='消息中 /echo 指令的比例')
+    parser.add_argument('--groups', type=int, default=50, help='模拟的群数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--serve', action='store_true', help='在子进程中启动服务器，加载 workdir 中的压测插件')
+    parser.add_argument('--server-args', default='--global-rate 0 --group-rate 0 --user-rate 0',
+                        help='--serve 时传给 wsclient.py 的额外参数')
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    url = args.url or f'ws://localhost:{args.port}/onebot/v11/ws'
+
+    server = None
+    if args.serve:
+        # 端口已被占用时会连到别的服务器上，直接报错
+        if await _port_open('localhost', args.port):
+            parser.error(f"端口 {args.port} 已被占用，请用 --port 指定其他端口")
+        command = [sys.executable, os.path.join(ROOT, 'Linbot', 'main', 'wsclient.py'),
+                   '-p', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workdir'),
+                   '--port', str(args.port),
+                   '--log-sample', 'message=0', 'meta_event=0', *shlex.split(args.server_args)]
+        # 输出写到临时文件而不是管道，避免管道写满后阻塞服务器
+        server_log = tempfile.TemporaryFile()
+        server = subprocess.Popen(command, stdout=server_log, stderr=subprocess.STDOUT)
+
+    try:
+        if server is not None:
+            try:
+                await _wait_for_server(server, 'localhost', args.port)
+            except (RuntimeError, TimeoutError) as e:
+                if server.poll() is not None:
+                    server_log.seek(0)
+                    sys.stderr.write(server_log.read().decode(errors='replace'))
+                raise SystemExit(f"启动服务器失败: {e}")
+        generator = EventGenerator(seed=args.seed, groups=args.groups, command_ratio=args.command_ratio)
+        bot = FakeOneBot(url, args.rate, args.duration, args.ack_latency, generator)
+        result = await bot.run()
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            server_log.close()
+
+    for key, value in result.items():
+        print(f"{key:<20} {value:.4f}" if isinstance(value, float) else f"{key:<20} {value}")
+    write_results('fake_onebot', [result], args.json, rate=args.rate, duration=args.duration,
+                  ack_latency=args.ack_latency, command_ratio=args.command_ratio, groups=args.groups,
+                  serve=args.serve, port=args.port, server_args=args.server_args if args.serve else None)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+# benchmarks/generator.py
+"""合成 OneBot v11 上报：群消息、私聊消息与心跳，群和用户的活跃度呈长尾分布"""
+import random
+import time
+from typing import Optional
+
+_PHRASES = (
+    "早上好", "有人在吗", "哈哈哈哈", "这个怎么弄", "收到", "明天几点开会", "我也是这么想的",
+    "刚看到消息", "晚上一起打游戏吗", "图片挂了", "谢谢大佬", "+1", "这是什么意思", "已经修好了",
+    "今天天气不错 😀", "链接发我一下 https://example.com/a/b?c=1", "好的好的", "？",
+)
+
+class EventGenerator:
+    """可复现的事件生成器
+
+    command_ratio 为消息中指令所占比例，指令从 commands 中随机选择。
+    weights 为 (群消息, 私聊消息, 心跳) 的相对比例。
+    """
+
+    def __init__(self, seed: Optional[int] = None, self_id: int = 10001, groups: int = 50, users: int = 500,
+                 command_ratio: float = 0.1, commands=('/echo',), weights=(0.85, 0.1, 0.05)):
+        self.random = random.Random(seed)
+        self.self_id = self_id
+        self.groups = [30000 + i for i in range(groups)]
+        self.users = [20000 + i for i in range(users)]
+        self.command_ratio = command_ratio
+        self.commands = tuple(commands)
+        self.weights = weights
+        self._message_id = 100000
+
+    def _pick(self, population: list) -> int:
+        """少数群和用户产生大部分消息"""
+        index = int(self.random.paretovariate(1.2)) - 1
+        return population[index % len(population)]
+
+    def _text(self) -> str:
+        if self.commands and self.random.random() < self.command_ratio:
+            return f"{self.random.choice(self.commands)} {self.random.choice(_PHRASES)}"
+        return " ".join(self.random.choice(_PHRASES) for _ in range(self.random.randint(1, 3)))
+
+    def _segments(self, text: str) -> list:
+        segments = [{"type": "text", "data": {"text": text}}]
+        # 指令消息保持为纯文本，便于匹配
+        if self.commands and text.startswith(self.commands):
+            return segments
+        roll = self.random.random()
+        if roll < 0.15:
+            segments.insert(0, {"type": "at", "data": {"qq": str(self._pick(self.users))}})
+        elif roll < 0.25:
+            segments.append({"type": "image", "data": {
+                "file": f"{self.random.getrandbits(128):032x}.jpg",
+                "url": f"https://multimedia.nt.qq.com.cn/download?appid=1407&fileid={self.random.getrandbits(64):x}",
+                "file_size": str(self.random.randint(10000, 2000000)),
+            }})
+        elif roll < 0.3:
+            segments.append({"type": "face", "data": {"id": str(self.random.randint(0, 300))}})
+        return segments
+
+    @staticmethod
+    def _raw_message(segments: list) -> str:
+        parts = []
+        for segment in segments:
+            if segment["type"] == "text":
+                parts.append(segment["data"]["text"])
+            else:
+                parts.append(f"[CQ:{segment['type']},{','.join(f'{k}={v}' for k, v in segment['data'].items())}]")
+        return "".join(parts)
+
+    def _message(self, message_type: str, user_id: int, text: Optional[str]) -> dict:
+        self._message_id += 1
+        segments = self._segments(self._text() if text is None else text)
+        return {
+            "self_id": self.self_id, "user_id": user_id, "time": int(time.time()),
+            "message_id": self._message_id, "message_seq": self._message_id, "real_id": self._message_id,
+            "message_type": message_type,
+            "raw_message": self._raw_message(segments), "font": 14,
+            "message": segments, "message_format": "array", "post_type": "message",
+            "raw_pb": "",
+        }
+
+    def group_message(self, text: Optional[str] = None, group_id: Optional[int] = None) -> dict:
+        """群消息上报，text 为空时随机生成内容"""
+        user_id = self._pick(self.users)
+        group_id = group_id if group_id is not None else self._pick(self.groups)
+        event = self._message("group", user_id, text)
+        event.update({
+            "sender": {"user_id": user_id, "nickname": f"用户{user_id}", "card": "",
+                       "role": self.random.choice(("member", "member", "member", "admin", "owner"))},
+            "sub_type": "normal", "group_id": group_id, "group_name": f"测试群{group_id}",
+        })
+        return event
+
+    def private_message(self, text: Optional[str] = None, user_id: Optional[int] = None) -> dict:
+        """好友私聊上报"""
+        user_id = user_id if user_id is not None else self._pick(self.users)
+        event = self._message("private", user_id, text)
+        event.update({
+            "sender": {"user_id": user_id, "nickname": f"用户{user_id}", "card": ""},
+            "sub_type": "friend", "target_id": user_id,
+        })
+        return event
+
+    def heartbeat(self) -> dict:
+        """心跳上报"""
+        return {
+            "time": int(time.time()), "self_id": self.self_id, "post_type": "meta_event",
+            "meta_event_type": "heartbeat", "status": {"online": True, "good": True}, "interval": 30000,
+        }
+
+    def next(self) -> dict:
+        """按比例随机生成下一条上报"""
+        kind = self.random.choices(("group", "private", "heartbeat"), self.weights)[0]
+        if kind == "group":
+            return self.group_message()
+        elif kind == "private":
+            return self.private_message()
+        return self.heartbeat()
+
+    def batch(self, number: int) -> list:
+        return [self.next() for _ in range(number)]
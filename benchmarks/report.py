@@ -0,0 +1,52 @@
+# benchmarks/report.py
+"""基准测试结果输出：除控制台文本外，可写出带运行环境信息的 JSON，便于在版本之间比较"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import List, Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def add_output_argument(parser):
+    """为基准测试脚本添加 --json 参数"""
+    parser.add_argument('--json', metavar='PATH', help='将结果以 JSON 写入文件，- 表示输出到标准输出')
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment() -> dict:
+    """运行环境信息"""
+    from codec import codec
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'json_backend': codec.name,
+    }
+
+def write_results(benchmark: str, results: List[dict], path: Optional[str], **params):
+    """写出一次运行的全部结果：{benchmark, environment, params, results}"""
+    if not path:
+        return
+    document = {
+        'benchmark': benchmark,
+        'environment': environment(),
+        'params': params,
+        'results': results,
+    }
+    text = json.dumps(document, ensure_ascii=False, indent=2)
+    if path == '-':
+        print(text)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+    print(f"结果已写入: {path}", file=sys.stderr)
@@ -0,0 +1,13 @@
+# 压测用插件：把指令参数原样发回，fake_onebot 据此计算端到端延迟
+from chat import fun_call_register
+from message_type import Messgaechat
+from event import MessageEvent
+from message_method import send_group_msg, send_private_msg
+
+@fun_call_register("/echo", on_msg=Messgaechat.on_command)
+async def bench_echo(event: MessageEvent, commandargs):
+    message = [{"type": "text", "data": {"text": commandargs.strip()}}]
+    if event.message_type == "group":
+        await send_group_msg(message)
+    else:
+        await send_private_msg(message)
@@ -0,0 +1,112 @@
+# tests/conftest.py
+"""测试公共设置：框架模块使用 main 目录内的平级导入，这里把该目录加入 sys.path"""
+import os
+import sys
+import asyncio
+import itertools
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Linbot', 'main'))
+
+from registry import registry
+from chat import set_current_plugin_name, clear_current_plugin_name
+
+_message_ids = itertools.count(1000)
+
+def _message(message_type: str, user_id: int, text: str, self_id: int) -> dict:
+    message_id = next(_message_ids)
+    return {
+        "self_id": self_id, "user_id": user_id, "time": 1700000000,
+        "message_id": message_id, "message_seq": message_id, "message_type": message_type,
+        "raw_message": text, "font": 14, "message": [{"type": "text", "data": {"text": text}}],
+        "message_format": "array", "post_type": "message", "raw_pb": "",
+    }
+
+@pytest.fixture
+def group_message():
+    """构造群消息上报字典的函数"""
+    def make(text: str = "你好", group_id: int = 30001, user_id: int = 20001, self_id: int = 10001) -> dict:
+        data = _message("group", user_id, text, self_id)
+        data.update({
+            "sender": {"user_id": user_id, "nickname": f"用户{user_id}", "card": "", "role": "member"},
+            "sub_type": "normal", "group_id": group_id, "group_name": f"测试群{group_id}",
+        })
+        return data
+    return make
+
+@pytest.fixture
+def private_message():
+    """构造私聊消息上报字典的函数"""
+    def make(text: str = "你好", user_id: int = 20001, self_id: int = 10001) -> dict:
+        data = _message("private", user_id, text, self_id)
+        data.update({
+            "sender": {"user_id": user_id, "nickname": f"用户{user_id}", "card": ""},
+            "sub_type": "friend", "target_id": user_id,
+        })
+        return data
+    return make
+
+@pytest.fixture
+def plugin():
+    """在名为 test 的插件下注册处理器，测试结束后清空注册表"""
+    set_current_plugin_name('test')
+    try:
+        yield registry
+    finally:
+        clear_current_plugin_name()
+        registry.clear()
+
+class FakeOneBot:
+    """代替 OneBot 实现的 WebSocket 连接：记录写出的请求，并把 reply(请求) 的返回值作为响应交给 response_handler
+
+    reply 返回 None 时不响应；delay 为响应延迟的秒数。
+    """
+
+    def __init__(self, self_id: int, reply=None, delay: float = 0.0):
+        self.self_id = self_id
+        self.reply = reply or (lambda request: {"status": "ok", "retcode": 0, "data": {"message_id": 1}})
+        self.delay = delay
+        self.requests = []
+        self.sent_at = []
+
+    async def send_frame(self, frame: bytes, opcode):
+        import codec
+        from response_handler import response_handler
+        request = codec.decode(frame)
+        loop = asyncio.get_running_loop()
+        self.requests.append(request)
+        self.sent_at.append(loop.time())
+        response = self.reply(request)
+        if response is not None:
+            loop.call_later(self.delay, response_handler.handle_response, dict(response, echo=request["echo"]))
+
+    def get_extra_info(self, name: str):
+        return None
+
+@pytest.fixture
+def onebot():
+    """连接假的 OneBot 账号：onebot(self_id, reply=None, delay=0.0) 返回 FakeOneBot
+
+    测试前后重置连接表、响应处理器和发送管线等全局状态，默认不限速。
+    """
+    from connections import connection_registry
+    from response_handler import response_handler
+    from message_method import outbound_pipeline
+
+    def reset():
+        connection_registry.__init__()
+        response_handler.__init__()
+        outbound_pipeline.__init__()
+        outbound_pipeline.configure(group_rate=0, user_rate=0, global_rate=0)
+
+    def connect(self_id: int = 10001, reply=None, delay: float = 0.0) -> FakeOneBot:
+        bot = FakeOneBot(self_id, reply, delay)
+        connection_registry.add(bot, self_id)
+        return bot
+
+    reset()
+    try:
+        yield connect
+    finally:
+        reset()
+        outbound_pipeline.configure()
@@ -0,0 +1,82 @@
+# tests/test_broadcast.py
+import asyncio
+from message_method import message_sender
+
+TEXT = [{"type": "text", "data": {"text": "hi"}}]
+
+def test_every_target_gets_a_result(onebot):
+    bot = onebot(reply=lambda request: (
+        {"status": "failed", "retcode": 1200, "data": None} if request['params'].get('group_id') == 30002
+        else {"status": "ok", "retcode": 0, "data": {"message_id": 1}}))
+    progress = []
+
+    async def main():
+        job = message_sender.broadcast(TEXT, group_ids=[30001, 30002, 30003], user_ids=[20001], window=2,
+                                       on_progress=lambda job: progress.append(job.done))
+        return job, await job
+
+    job, results = asyncio.run(main())
+    assert results[("group", 30002)] is None
+    assert results[("private", 20001)].retcode == 0
+    assert job.progress() == {'total': 4, 'done': 4, 'succeeded': 3, 'failed': 1, 'cancelled': False}
+    assert progress == [1, 2, 3, 4]
+    # 消息只编码一次，各目标的请求帧仍是完整的动作
+    assert {request['action'] for request in bot.requests} == {'send_group_msg', 'send_private_msg'}
+    assert all(request['params']['message'] == TEXT for request in bot.requests)
+
+def test_error_for_one_target_does_not_stop_the_others(onebot, monkeypatch):
+    """回归：单个目标的请求抛出异常时，整个工作协程退出，gather 把异常抛给调用方"""
+    onebot()
+    send_and_wait = message_sender._send_and_wait
+
+    async def flaky(data, self_id=None, encode=None):
+        if data['params'].get('group_id') == 30002:
+            raise RuntimeError("bad response")
+        return await send_and_wait(data, self_id, encode)
+
+    monkeypatch.setattr(message_sender, '_send_and_wait', flaky)
+
+    async def main():
+        job = message_sender.broadcast(TEXT, group_ids=[30001, 30002, 30003, 30004], window=1)
+        return job, await job
+
+    job, results = asyncio.run(main())
+    assert job.done == job.total == 4
+    assert results[("group", 30002)] is None
+    assert job.succeeded == 3 and job.failed == 1
+
+def test_window_bounds_requests_in_flight(onebot):
+    bot = onebot(delay=0.02)
+
+    async def main():
+        return await message_sender.broadcast(TEXT, group_ids=range(30001, 30011), window=3)
+
+    assert len(asyncio.run(main())) == 10
+    # 前三个请求同时发出，第四个要等第一个响应
+    assert bot.sent_at[2] - bot.sent_at[0] < 0.01
+    assert bot.sent_at[3] - bot.sent_at[0] >= 0.015
+
+def test_cancel_stops_remaining_targets(onebot):
+    bot = onebot(delay=0.05)
+
+    async def main():
+        job = message_sender.broadcast(TEXT, group_ids=range(30001, 30011), window=2)
+        await asyncio.sleep(0.01)
+        job.cancel()
+        return job, await job
+
+    job, results = asyncio.run(main())
+    assert job.cancelled and job.progress()['cancelled']
+    assert results == {}
+    assert len(bot.requests) == 2
+    assert job.finished_at is not None
+
+def test_balance_spreads_group_sends_across_accounts(onebot):
+    first = onebot(10001, delay=0.01)
+    second = onebot(10002, delay=0.01)
+
+    async def main():
+        return await message_sender.broadcast(TEXT, group_ids=range(30001, 30005), window=4, balance=True)
+
+    assert len(asyncio.run(main())) == 4
+    assert len(first.requests) == len(second.requests) == 2
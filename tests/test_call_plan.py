@@ -0,0 +1,44 @@
+# tests/test_call_plan.py
+import asyncio
+from event import parse_event, GroupMessageEvent, MessageEvent
+from message_type import Messgaechat
+from chat import fun_call, fun_call_register
+from context import get_current_event
+
+def test_call_plan_binds_event_parameters_and_commandargs(plugin, group_message):
+    received = []
+
+    @fun_call_register("/cmd", on_msg=Messgaechat.on_command)
+    async def handler(event: GroupMessageEvent, same: MessageEvent, commandargs):
+        received.append((event, same, commandargs))
+
+    event = parse_event(group_message("/cmd x"))
+    asyncio.run(fun_call(event))
+    assert received == [(event, event, " x")]
+
+def test_context_is_set_once_per_dispatch(plugin, group_message):
+    seen = []
+
+    @fun_call_register("a")
+    async def a(event: GroupMessageEvent):
+        seen.append(get_current_event())
+
+    event = parse_event(group_message())
+
+    async def main():
+        await fun_call(event)
+        return get_current_event()
+
+    assert asyncio.run(main()) is None
+    assert seen == [event]
+
+def test_direct_call_of_wrapper_enters_the_event_context(plugin, group_message):
+    seen = []
+
+    @fun_call_register("a")
+    async def a(event: GroupMessageEvent):
+        seen.append(get_current_event())
+
+    event = parse_event(group_message())
+    asyncio.run(a(event))
+    assert seen == [event]
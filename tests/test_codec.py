@@ -0,0 +1,28 @@
+# tests/test_codec.py
+import pytest
+import codec
+
+SAMPLE = {"action": "send_group_msg", "params": {"group_id": 1, "message": [{"type": "text", "data": {"text": "你好 😀"}}]},
+          "echo": 7}
+
+@pytest.mark.parametrize("name", list(codec.available_codecs()))
+def test_backends_round_trip_and_emit_compact_utf8(name):
+    backend = codec.select_codec(name)
+    encoded = backend.encode(SAMPLE)
+    assert isinstance(encoded, bytes)
+    assert "你好 😀".encode("utf-8") in encoded
+    assert b", " not in encoded and b": " not in encoded
+    assert backend.decode(encoded) == SAMPLE
+    assert backend.decode(encoded.decode("utf-8")) == SAMPLE
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        codec.select_codec("unknown")
+
+def test_set_codec_switches_the_module_level_functions():
+    previous = codec.codec
+    try:
+        assert codec.set_codec("json").name == "json"
+        assert codec.decode(codec.encode(SAMPLE)) == SAMPLE
+    finally:
+        codec.codec = previous
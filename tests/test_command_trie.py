@@ -0,0 +1,37 @@
+# tests/test_command_trie.py
+import asyncio
+from message_type import CommandTrie, Messgaechat
+from event import parse_event, GroupMessageEvent
+from chat import fun_call, fun_call_register
+
+def test_trie_matches_every_prefix_command():
+    trie = CommandTrie(["/a", "/ab", "/b"])
+    results = trie.match("/abc 参数")
+    assert set(results) == {"/a", "/ab"}
+    assert results["/ab"].commandargs == "c 参数"
+
+def test_trie_agrees_with_on_command():
+    instructions = ["/echo", "/e", "help", "/echo2"]
+    trie = CommandTrie(instructions)
+    for msg in ["/echo hi", "/e", "/echo2\n第二行", "help me", "无关消息", ""]:
+        matched = trie.match(msg)
+        for instruction in instructions:
+            expected = Messgaechat.on_command(instruction, msg)
+            actual = matched.get(instruction)
+            assert (actual is not None) == expected.type
+            if actual is not None:
+                assert actual.commandargs == expected.commandargs
+
+def test_command_handlers_are_dispatched_through_the_trie(plugin, group_message):
+    calls = []
+
+    @fun_call_register("/echo", on_msg=Messgaechat.on_command)
+    async def echo(event: GroupMessageEvent, commandargs):
+        calls.append(commandargs)
+
+    @fun_call_register("/other", on_msg=Messgaechat.on_command)
+    async def other(event: GroupMessageEvent, commandargs):
+        calls.append("other")
+
+    asyncio.run(fun_call(parse_event(group_message("/echo 你好"))))
+    assert calls == [" 你好"]
@@ -0,0 +1,87 @@
+# tests/test_connections.py
+import asyncio
+from connections import ConnectionRegistry
+from context import current_websocket
+from event import parse_event
+from message_method import message_sender
+
+def _event(**fields):
+    return parse_event(dict({"time": 0, "self_id": 10001}, **fields))
+
+def test_self_id_is_bound_from_the_first_report():
+    registry = ConnectionRegistry()
+    ws = object()
+    connection = registry.add(ws)
+    assert registry.accounts == []
+    registry.observe(ws, _event(post_type="meta_event", meta_event_type="heartbeat"))
+    assert registry.get(10001) is connection
+    assert connection.last_heartbeat is not None
+
+def test_reconnect_replaces_the_old_connection_and_keeps_groups():
+    registry = ConnectionRegistry()
+    old, new = object(), object()
+    registry.add(old, 10001).groups.add(30001)
+    connection = registry.add(new, 10001)
+    assert registry.get(10001) is connection
+    assert connection.groups == {30001}
+    # 旧连接随后关闭，不影响新连接
+    registry.remove(old)
+    assert registry.get(10001) is connection
+    assert len(registry) == 1
+
+def test_group_membership_follows_reports(group_message):
+    registry = ConnectionRegistry()
+    ws = object()
+    connection = registry.add(ws, 10001)
+    registry.observe(ws, parse_event(group_message(group_id=30001)))
+    registry.observe(ws, _event(post_type="notice", notice_type="group_increase", group_id=30002, user_id=20001))
+    assert connection.groups == {30001, 30002}
+    registry.observe(ws, _event(post_type="notice", notice_type="group_decrease", group_id=30001, user_id=20001))
+    assert connection.groups == {30001, 30002}
+    registry.observe(ws, _event(post_type="notice", notice_type="group_decrease", group_id=30001, user_id=10001))
+    assert connection.groups == {30002}
+
+def test_resolve_prefers_explicit_account_then_current_connection():
+    registry = ConnectionRegistry()
+    first, second = object(), object()
+    registry.add(first, 10001)
+    registry.add(second, 10002)
+    assert registry.resolve(10002).ws is second
+    assert registry.resolve(10003) is None
+    # 不在事件上下文中时使用最早连接的账号
+    assert registry.resolve().ws is first
+    token = current_websocket.set(second)
+    try:
+        assert registry.resolve().ws is second
+    finally:
+        current_websocket.reset(token)
+
+def test_pick_prefers_members_with_the_lowest_load():
+    registry = ConnectionRegistry()
+    a = registry.add(object(), 10001)
+    b = registry.add(object(), 10002)
+    c = registry.add(object(), 10003)
+    a.groups.add(30001)
+    b.groups.add(30001)
+    a.in_flight = 2
+    assert registry.pick(30001) is b
+    b.requests = 5
+    b.in_flight = 2
+    a.requests = 1
+    assert registry.pick(30001) is a
+    # 没有已知在群中的账号时在全部账号中选择
+    assert registry.pick(30009) is c
+    assert ConnectionRegistry().pick() is None
+
+def test_sends_go_through_the_chosen_account(onebot):
+    first = onebot(10001)
+    second = onebot(10002)
+    text = [{"type": "text", "data": {"text": "hi"}}]
+
+    async def main():
+        await message_sender.send_group_msg(text, 30001, self_id=10002)
+        await message_sender.send_group_msg(text, 30001)
+        assert await message_sender.send_group_msg(text, 30001, self_id=10003) is None
+
+    asyncio.run(main())
+    assert len(first.requests) == 1 and len(second.requests) == 1
@@ -0,0 +1,37 @@
+# tests/test_event.py
+from event import (parse_event, get_event_class, base_event, MessageEvent, GroupMessageEvent,
+                   PrivateMessageEvent, Sender, fix_event)
+
+def test_group_message_is_decoded_into_final_class(group_message):
+    event = parse_event(group_message("/echo 你好", group_id=30003))
+    assert type(event) is GroupMessageEvent
+    assert event.group_id == 30003
+    assert event.raw_message == "/echo 你好"
+    # 声明为子模型的字段保持原类型，不被改写为 fix_event
+    assert type(event.sender) is Sender
+    assert event.sender.user_id == 20001
+
+def test_private_message_is_decoded_into_final_class(private_message):
+    event = parse_event(private_message(user_id=20005))
+    assert type(event) is PrivateMessageEvent
+    assert event.target_id == 20005
+
+def test_unknown_message_type_falls_back_to_message_event(group_message):
+    data = group_message()
+    data["message_type"] = "guild"
+    assert get_event_class(data) is MessageEvent
+
+def test_other_post_types_use_base_event_with_attribute_access():
+    event = parse_event({"post_type": "meta_event", "self_id": 10001, "meta_event_type": "heartbeat",
+                         "status": {"online": True, "stat": {"packet_lost": 0}}})
+    assert type(event) is base_event
+    assert event.meta_event_type == "heartbeat"
+    # 额外字段中的字典支持属性访问，嵌套字典同样如此
+    assert isinstance(event.status, fix_event)
+    assert event.status.online is True
+    assert event.status.stat.packet_lost == 0
+
+def test_model_dump_round_trip(group_message):
+    data = group_message()
+    event = parse_event(data)
+    assert parse_event(event.model_dump(exclude_none=True)) == event
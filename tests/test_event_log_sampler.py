@@ -0,0 +1,60 @@
+# tests/test_event_log_sampler.py
+import asyncio
+import logging
+from event import parse_event
+from _event_logger import EventLogSampler
+
+def _events(group_message, count: int, group_id: int = 30001):
+    return [parse_event(group_message(group_id=group_id), lazy=True) for _ in range(count)]
+
+def test_rates_by_post_type_and_message_type(group_message, private_message):
+    sampler = EventLogSampler({"message": 0.0, "message.private": 1.0, "meta_event": 0}, summary_interval=None)
+    assert not sampler.should_log(parse_event(group_message(), lazy=True))
+    # post_type.message_type 优先于 post_type
+    assert sampler.should_log(parse_event(private_message(), lazy=True))
+    assert not sampler.should_log(parse_event({"post_type": "meta_event"}, lazy=True))
+
+def test_group_cap_limits_lines_per_group_but_counts_everything(group_message):
+    sampler = EventLogSampler(group_cap=2, summary_interval=None)
+    logged = [sampler.should_log(event) for event in _events(group_message, 5)]
+    assert logged == [True, True, False, False, False]
+    assert sampler.should_log(_events(group_message, 1, group_id=30002)[0])
+    assert sampler._group_counts == {30001: 5, 30002: 1}
+    assert sampler._suppressed == 3
+
+def test_summary_reports_counts_and_starts_a_new_window(group_message, caplog):
+    sampler = EventLogSampler({"message": 0}, summary_interval=None)
+    for event in _events(group_message, 3):
+        sampler.should_log(event)
+    linbot_logger = logging.getLogger("linbot")
+    linbot_logger.addHandler(caplog.handler)
+    try:
+        sampler.log_summary()
+    finally:
+        linbot_logger.removeHandler(caplog.handler)
+    text = caplog.text
+    assert "message.group 3" in text
+    assert "省略日志 3 条" in text
+    assert "群 30001" in text
+    assert sampler._totals == {}
+
+def test_summary_is_emitted_by_the_timer_without_new_events(group_message, caplog):
+    sampler = EventLogSampler({"message": 0}, summary_interval=0.05)
+
+    async def main():
+        sampler.start()
+        for event in _events(group_message, 2):
+            sampler.should_log(event)
+        # 之后不再有事件到达，汇总仍按时输出
+        await asyncio.sleep(0.12)
+        sampler.stop()
+
+    linbot_logger = logging.getLogger("linbot")
+    linbot_logger.addHandler(caplog.handler)
+    try:
+        asyncio.run(main())
+    finally:
+        linbot_logger.removeHandler(caplog.handler)
+    assert "message.group 2" in caplog.text
+    assert sampler._totals == {}
+    assert sampler._summary_handle is None
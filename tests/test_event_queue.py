@@ -0,0 +1,89 @@
+# tests/test_event_queue.py
+import asyncio
+import pytest
+from event import parse_event
+from dispatcher import EventQueue
+
+def _event(post_type: str, index: int = 0):
+    return parse_event({"post_type": post_type, "self_id": 10001, "index": index}, lazy=True)
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        EventQueue(policy='unknown')
+
+def test_default_policy_never_blocks_the_reader():
+    """回归：默认的 block 策略在队列满时阻塞读取端，同一连接上的 API 响应也读不到"""
+    from dispatcher import EventDispatcher
+
+    async def main():
+        dispatcher = EventDispatcher(queue_size=3)
+        for index in range(10):
+            await asyncio.wait_for(dispatcher.submit(_event('message', index)), 0.1)
+        return dispatcher.stats()
+
+    stats = asyncio.run(main())
+    assert stats['policy'] == 'drop_oldest'
+    assert stats['depth'] == 3 and stats['dropped'] == {'message': 7}
+
+def test_drop_oldest_keeps_the_newest_events():
+    async def main():
+        queue = EventQueue(maxsize=2, policy='drop_oldest')
+        for index in range(4):
+            assert await queue.put(_event('notice', index))
+        return [(await queue.get())[0].index for _ in range(queue.depth)], queue.dropped
+
+    assert asyncio.run(main()) == ([2, 3], {'notice': 2})
+
+def test_drop_meta_prefers_meta_events():
+    async def main():
+        queue = EventQueue(maxsize=2, policy='drop_meta')
+        await queue.put(_event('meta_event', 0))
+        await queue.put(_event('message', 1))
+        # 新的 meta_event 在队列满时直接被丢弃
+        assert not await queue.put(_event('meta_event', 2))
+        # 其他事件挤掉队列中最早的 meta_event
+        assert await queue.put(_event('notice', 3))
+        return [(await queue.get())[0].index for _ in range(queue.depth)], queue.dropped
+
+    assert asyncio.run(main()) == ([1, 3], {'meta_event': 2})
+
+def test_reject_drops_listed_types_and_blocks_others():
+    async def main():
+        queue = EventQueue(maxsize=1, policy='reject')
+        await queue.put(_event('message', 0))
+        assert not await queue.put(_event('meta_event', 1))
+        blocked = asyncio.ensure_future(queue.put(_event('notice', 2)))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        first = await queue.get()
+        assert await blocked
+        return first[0].index, (await queue.get())[0].index, queue.max_depth
+
+    assert asyncio.run(main()) == (0, 2, 1)
+
+def test_worker_pool_bounds_concurrency(plugin, group_message):
+    from event import GroupMessageEvent
+    from chat import fun_call_register
+    from dispatcher import EventDispatcher
+    running = []
+    peak = []
+
+    @fun_call_register("slow")
+    async def slow(event: GroupMessageEvent):
+        running.append(event)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(event)
+
+    async def main():
+        dispatcher = EventDispatcher(workers=2, queue_size=10, ordered=False)
+        dispatcher.start()
+        for index in range(6):
+            await dispatcher.submit(parse_event(group_message(group_id=index)))
+        while len(peak) < 6 or running:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert len(peak) == 6
+    assert max(peak) == 2
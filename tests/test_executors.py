@@ -0,0 +1,167 @@
+# tests/test_executors.py
+import asyncio
+import json
+import os
+import sys
+import textwrap
+import threading
+import pytest
+from chat import fun_call, fun_call_register
+from context import get_current_event
+from event import parse_event, GroupMessageEvent
+from executors import handler_executors
+from message_method import message_sender
+from onebot_api import onebot_api
+from plugins_manager import plugin_manager
+from registry import registry
+
+TEXT = [{"type": "text", "data": {"text": "hi"}}]
+
+@pytest.fixture
+def executors():
+    try:
+        yield handler_executors
+    finally:
+        handler_executors.shutdown()
+        message_sender.loop = None
+        onebot_api.__init__()
+
+def test_sync_handler_runs_in_a_thread_with_the_event_context(plugin, executors, onebot, group_message):
+    onebot()
+    seen = []
+
+    @fun_call_register("h", executor='thread')
+    def handler(event: GroupMessageEvent):
+        seen.append((threading.current_thread().name, get_current_event() is event))
+
+    asyncio.run(fun_call(parse_event(group_message())))
+    (thread_name, has_context), = seen
+    assert thread_name.startswith('linbot-handler') and has_context
+    stats = executors.stats()['thread']
+    assert stats['started'] and stats['completed'] == 1 and stats['in_flight'] == 0
+
+def test_async_thread_handler_sends_through_the_main_loop(plugin, executors, onebot, group_message):
+    bot = onebot()
+    results = []
+
+    @fun_call_register("h", executor='thread')
+    async def handler(event: GroupMessageEvent):
+        results.append(await message_sender.send_group_msg(TEXT))
+
+    asyncio.run(fun_call(parse_event(group_message(group_id=30005))))
+    assert results[0].retcode == 0
+    assert bot.requests[0]['params']['group_id'] == 30005
+
+def test_thread_handler_shares_queries_with_the_main_loop(plugin, executors, onebot, group_message):
+    """回归：线程中的查询等待了主事件循环创建的共享 Future，报 attached to a different loop"""
+    bot = onebot(reply=lambda request: {"status": "ok", "retcode": 0, "data": {"group_id": 30001}}, delay=0.05)
+    results = []
+
+    @fun_call_register("h", executor='thread')
+    async def handler(event: GroupMessageEvent):
+        results.append(await onebot_api.get_group_info(30001))
+
+    async def main():
+        query = asyncio.ensure_future(onebot_api.get_group_info(30001))
+        await asyncio.sleep(0)
+        await fun_call(parse_event(group_message()))
+        results.append(await query)
+        # 线程中的查询命中主事件循环的缓存
+        await fun_call(parse_event(group_message()))
+
+    asyncio.run(main())
+    assert results == [{"group_id": 30001}] * 3
+    assert len(bot.requests) == 1
+    assert onebot_api.stats()['shared'] == 1 and onebot_api.stats()['hits'] == 1
+
+def _info_reply(request):
+    if request['action'] == 'get_group_info':
+        return {"status": "ok", "retcode": 0, "data": {"group_id": request['params']['group_id']}}
+    return {"status": "ok", "retcode": 0, "data": {"message_id": 1}}
+
+def test_process_handler_gets_real_replies(executors, onebot, group_message, tmp_path):
+    """回归：进程池中的请求曾得到伪造的 async 响应（retcode 1），查询总是返回 None"""
+    bot = onebot(reply=_info_reply)
+    result_file = tmp_path / 'result.json'
+    plugin_dir = tmp_path / 'plugins' / 'worker'
+    plugin_dir.mkdir(parents=True)
+    (plugin_dir / '__init__.py').write_text(textwrap.dedent(f'''
+        import json
+        from chat import fun_call_register
+        from event import GroupMessageEvent
+        from message_method import send_group_msg
+        from onebot_api import get_group_info
+
+        @fun_call_register("h", executor='process')
+        async def handler(event: GroupMessageEvent):
+            sent = await send_group_msg([{{"type": "text", "data": {{"text": str(event.group_id)}}}}])
+            info = await get_group_info(event.group_id)
+            with open({str(result_file)!r}, 'w') as f:
+                json.dump({{"retcode": sent.retcode, "info": info}}, f)
+    '''), encoding='utf-8')
+    executors.configure(process_workers=1)
+    plugin_manager.load_plugins(str(tmp_path / 'plugins'))
+    try:
+        asyncio.run(fun_call(parse_event(group_message(group_id=30007))))
+    finally:
+        plugin_manager.unload_plugin('worker')
+        plugin_manager.plugins_base_dir = None
+        registry.clear()
+        executors.configure()
+    assert json.loads(result_file.read_text()) == {"retcode": 0, "info": {"group_id": 30007}}
+    assert [request['action'] for request in bot.requests] == ['send_group_msg', 'get_group_info']
+    assert bot.requests[0]['params'] == {"group_id": 30007, "message": [{"type": "text", "data": {"text": "30007"}}]}
+
+def test_thread_workers_reuse_their_event_loop(plugin, executors, onebot, group_message):
+    onebot()
+    loops = []
+    executors.configure(thread_workers=1)
+
+    @fun_call_register("h", executor='thread')
+    async def handler(event: GroupMessageEvent):
+        loops.append(asyncio.get_running_loop())
+
+    async def main():
+        for _ in range(3):
+            await fun_call(parse_event(group_message()))
+
+    try:
+        asyncio.run(main())
+    finally:
+        executors.configure()
+    assert len(loops) == 3 and len(set(map(id, loops))) == 1
+
+def test_shared_http_session_is_refused_in_thread_handlers(plugin, executors, onebot, group_message):
+    from http_client import http_client
+    from context import get_http_session
+    errors = []
+
+    @fun_call_register("h", executor='thread')
+    async def handler(event: GroupMessageEvent):
+        try:
+            get_http_session()
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    async def main():
+        await http_client.start()
+        try:
+            assert get_http_session() is http_client.session
+            await fun_call(parse_event(group_message()))
+        finally:
+            await http_client.close()
+
+    asyncio.run(main())
+    assert len(errors) == 1 and '主事件循环' in errors[0]
+
+def test_process_handlers_must_be_top_level(plugin):
+    with pytest.raises(TypeError):
+        @fun_call_register("h", executor='process')
+        async def handler(event: GroupMessageEvent):
+            pass
+
+def test_unknown_execution_mode_is_rejected(plugin):
+    with pytest.raises(ValueError):
+        @fun_call_register("h", executor='gpu')
+        async def handler(event: GroupMessageEvent):
+            pass
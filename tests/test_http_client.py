@@ -0,0 +1,90 @@
+# tests/test_http_client.py
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from http_client import HttpClient
+from context import get_http_session
+
+def _app() -> web.Application:
+    async def ok(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get('/', ok)
+    return app
+
+def test_session_is_unavailable_before_start():
+    client = HttpClient()
+    assert not client.started
+    with pytest.raises(RuntimeError):
+        client.session
+
+def test_start_is_idempotent_and_close_releases_the_session():
+    async def main():
+        client = HttpClient()
+        await client.start()
+        session = client.session
+        await client.start()
+        assert client.session is session
+        await client.close()
+        assert not client.started
+        assert session.closed
+        await client.close()
+
+    asyncio.run(main())
+
+def test_requests_share_the_connection_pool():
+    async def main():
+        client = HttpClient(limit=4, limit_per_host=2)
+        async with TestServer(_app()) as server:
+            await client.start()
+            try:
+                for _ in range(3):
+                    async with client.session.get(server.make_url('/')) as response:
+                        assert await response.text() == "ok"
+                return client.stats()
+            finally:
+                await client.close()
+
+    stats = asyncio.run(main())
+    assert stats['requests'] == 3
+    assert stats['in_flight'] == 0
+    assert stats['errors'] == 0
+    assert stats['connections_created'] == 1
+    assert stats['connections_reused'] == 2
+    assert stats['idle'] == 1 and stats['acquired'] == 0
+    assert stats['limit'] == 4 and stats['limit_per_host'] == 2
+
+def test_failed_requests_are_counted():
+    async def main():
+        client = HttpClient(connect_timeout=1.0)
+        async with TestServer(_app()) as server:
+            url = server.make_url('/')
+        await client.start()
+        try:
+            with pytest.raises(Exception):
+                await client.session.get(url)
+            return client.stats()
+        finally:
+            await client.close()
+
+    stats = asyncio.run(main())
+    assert stats['errors'] == 1
+    assert stats['in_flight'] == 0
+
+def test_stats_without_a_session():
+    stats = HttpClient(limit=0).stats()
+    assert stats['acquired'] == 0 and stats['utilization'] == 0.0
+
+def test_context_helper_returns_the_shared_session():
+    from http_client import http_client
+
+    async def main():
+        await http_client.start()
+        try:
+            return get_http_session() is http_client.session
+        finally:
+            await http_client.close()
+
+    assert asyncio.run(main())
@@ -0,0 +1,26 @@
+# tests/test_lazy_event.py
+from event import parse_event, GroupMessageEvent, PrivateMessageEvent, Sender, fix_event, LazyGroupMessageEvent
+
+def test_lazy_event_keeps_isinstance_compatibility(group_message, private_message):
+    group = parse_event(group_message(), lazy=True)
+    assert type(group) is LazyGroupMessageEvent
+    assert isinstance(group, GroupMessageEvent)
+    assert isinstance(parse_event(private_message(), lazy=True), PrivateMessageEvent)
+
+def test_sub_objects_are_built_on_first_access(group_message):
+    event = parse_event(group_message(), lazy=True)
+    assert isinstance(event.__dict__['sender'], dict)
+    sender = event.sender
+    assert type(sender) is Sender
+    # 构建结果被缓存
+    assert event.sender is sender
+
+def test_extra_dict_fields_get_attribute_access():
+    event = parse_event({"post_type": "notice", "notice_type": "notify", "extra": {"a": {"b": 1}}}, lazy=True)
+    assert isinstance(event.extra, fix_event)
+    assert event.extra.a.b == 1
+    assert event.time is None
+
+def test_lazy_and_eager_dumps_match(group_message):
+    data = group_message("/echo 1")
+    assert parse_event(data, lazy=True).model_dump() == parse_event(data).model_dump()
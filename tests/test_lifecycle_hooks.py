@@ -0,0 +1,95 @@
+# tests/test_lifecycle_hooks.py
+import asyncio
+import pytest
+from chat import on_startup, on_shutdown
+from plugins_manager import PluginManager
+from registry import registry
+
+@pytest.fixture
+def hooks():
+    """按插件名注册钩子，钩子执行时把 (插件名, 阶段) 记入 log"""
+    log = []
+
+    def register(kind: str, plugin_name: str, after=(), delay: float = 0.0, error: bool = False):
+        async def hook():
+            log.append((plugin_name, 'start'))
+            await asyncio.sleep(delay)
+            if error:
+                raise RuntimeError(plugin_name)
+            log.append((plugin_name, 'end'))
+        hook.__name__ = f"{plugin_name}_{kind}"
+        registry.register_hook(kind, hook, plugin_name, tuple(after))
+
+    try:
+        yield register, log
+    finally:
+        registry.clear()
+
+def test_startup_waits_for_after_plugins(hooks):
+    register, log = hooks
+    register('startup', 'web', after=['db'])
+    register('startup', 'db', delay=0.01)
+    manager = PluginManager()
+    assert asyncio.run(manager.run_startup_hooks()) == []
+    assert log.index(('db', 'end')) < log.index(('web', 'start'))
+    assert manager.started
+
+def test_independent_plugins_start_concurrently(hooks):
+    register, log = hooks
+    register('startup', 'a', delay=0.01)
+    register('startup', 'b', delay=0.01)
+    asyncio.run(PluginManager().run_startup_hooks())
+    assert log[:2] == [('a', 'start'), ('b', 'start')]
+
+def test_shutdown_runs_in_reverse_order(hooks):
+    register, log = hooks
+    register('startup', 'web', after=['db'])
+    register('shutdown', 'db')
+    register('shutdown', 'web', delay=0.01)
+    manager = PluginManager()
+    manager.started = True
+    assert asyncio.run(manager.run_shutdown_hooks()) == []
+    assert log.index(('web', 'end')) < log.index(('db', 'start'))
+    assert not manager.started
+
+def test_failed_hook_does_not_stop_other_plugins(hooks):
+    register, log = hooks
+    register('startup', 'bad', error=True)
+    register('startup', 'bad')
+    register('startup', 'good')
+    assert asyncio.run(PluginManager().run_startup_hooks()) == ['bad']
+    # 同一插件出错后的钩子不再执行
+    assert log.count(('bad', 'start')) == 1
+    assert ('good', 'end') in log
+
+def test_cycle_falls_back_to_unordered(hooks):
+    register, log = hooks
+    register('startup', 'a', after=['b'])
+    register('startup', 'b', after=['a'])
+    assert asyncio.run(PluginManager().run_startup_hooks()) == []
+    assert {('a', 'end'), ('b', 'end')} <= set(log)
+
+def test_shutdown_timeout_cancels_slow_hooks(hooks):
+    register, log = hooks
+    register('shutdown', 'slow', delay=10)
+    assert asyncio.run(PluginManager().run_shutdown_hooks(timeout=0.01)) == []
+    assert ('slow', 'end') not in log
+
+def test_decorators_register_for_the_current_plugin(plugin):
+    @on_startup(after=['db'])
+    async def start():
+        pass
+
+    @on_shutdown
+    async def stop():
+        pass
+
+    startup, = registry.get_hooks('startup', ['test'])
+    assert startup['function'] is start and startup['after'] == ('db',)
+    assert registry.get_hooks('shutdown', ['test'])[0]['function'] is stop
+
+def test_sync_hooks_are_rejected(plugin):
+    with pytest.raises(TypeError):
+        @on_startup
+        def start():
+            pass
@@ -0,0 +1,58 @@
+# tests/test_load_generator.py
+import asyncio
+import os
+import sys
+import pytest
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks')
+sys.path.insert(0, BENCHMARKS)
+
+from generator import EventGenerator
+from event import parse_event, GroupMessageEvent, PrivateMessageEvent
+
+def test_generator_is_reproducible_and_produces_valid_events():
+    first = EventGenerator(seed=1).batch(200)
+    second = EventGenerator(seed=1).batch(200)
+    for left, right in zip(first, second):
+        left.pop("time"), right.pop("time")
+        assert left == right
+    classes = {type(parse_event(dict(data, time=0))) for data in first}
+    assert {GroupMessageEvent, PrivateMessageEvent} <= classes
+
+@pytest.fixture
+def bench_server(onebot):
+    from wsclient import WebSocketServer
+    from plugins_manager import plugin_manager
+    from registry import registry
+    server = WebSocketServer(working_dir=os.path.join(BENCHMARKS, 'workdir'))
+    try:
+        yield server
+    finally:
+        for plugin_name in list(plugin_manager.plugins):
+            plugin_manager.unload_plugin(plugin_name)
+        registry.clear()
+
+def test_fake_onebot_gets_a_reply_for_every_command(bench_server):
+    from aiohttp.test_utils import TestServer
+    from fake_onebot import FakeOneBot
+    from _event_logger import event_log_sampler
+
+    async def main():
+        bench_server.dispatcher.start()
+        async with TestServer(bench_server.app) as server:
+            url = str(server.make_url('/onebot/v11/ws'))
+            generator = EventGenerator(seed=0, command_ratio=0.5)
+            result = await FakeOneBot(url, rate=200, duration=0.5, ack_latency=0.001, generator=generator).run()
+        await bench_server.dispatcher.stop()
+        return result
+
+    event_log_sampler.configure({'message': 0, 'meta_event': 0}, summary_interval=None)
+    try:
+        result = asyncio.run(main())
+    finally:
+        event_log_sampler.configure()
+    assert result['events_sent'] == 100
+    assert result['replies'] > 0
+    assert result['missing_replies'] == 0
+    assert result['response_errors'] == 0
+    assert result['actions'].get('send_group_msg', 0) + result['actions'].get('send_private_msg', 0) == result['replies']
@@ -0,0 +1,50 @@
+# tests/test_logger.py
+import json
+import logging
+import queue
+from logger import DeferredQueueHandler, JsonFormatter, ColorFormatter, Colors, SUCCESS
+
+def _record(message, *args, exc_info=None):
+    return logging.LogRecord("linbot", logging.INFO, __file__, 1, message, args, exc_info)
+
+def test_deferred_handler_keeps_arguments_unformatted():
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+
+    class Expensive:
+        formatted = 0
+        def __str__(self):
+            Expensive.formatted += 1
+            return "值"
+
+    handler.emit(_record("消息 %s", Expensive()))
+    record = records.get_nowait()
+    # 调用线程中不拼接消息
+    assert Expensive.formatted == 0
+    assert record.getMessage() == "消息 值"
+
+def test_deferred_handler_turns_exceptions_into_text():
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    try:
+        raise RuntimeError("出错了")
+    except RuntimeError:
+        import sys
+        record = _record("失败", exc_info=sys.exc_info())
+    handler.emit(record)
+    record = records.get_nowait()
+    assert record.exc_info is None
+    assert "RuntimeError: 出错了" in record.exc_text
+
+def test_json_formatter_strips_colors_and_keeps_extra_fields():
+    record = _record(f"{Colors.GREEN}成功{Colors.END} %d", 3)
+    record.group_id = 30001
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "成功 3"
+    assert entry["group_id"] == 30001
+    assert entry["level"] == "INFO"
+
+def test_color_formatter_tags_success_level():
+    record = _record("完成")
+    record.levelno = SUCCESS
+    assert "[SUCCESS]" in ColorFormatter().format(record)
@@ -0,0 +1,76 @@
+# tests/test_metrics.py
+import asyncio
+import pytest
+from metrics import MetricsRegistry, _Metric
+
+def test_metric_without_overrides_cannot_be_created():
+    class Incomplete(_Metric):
+        type = 'gauge'
+
+    with pytest.raises(TypeError):
+        Incomplete('linbot_incomplete', '缺少实现')
+
+def test_render_counters_histograms_and_callbacks():
+    registry = MetricsRegistry()
+    counter = registry.counter('linbot_test_total', '计数', ('post_type',))
+    histogram = registry.histogram('linbot_test_seconds', '耗时', ('plugin',), buckets=(0.1, 1.0))
+    registry.callback('linbot_test_depth', '深度', lambda: {('a',): 2}, ('queue',))
+    registry.callback('linbot_test_clients', '连接数', lambda: 3)
+
+    child = counter.labels('message')
+    assert counter.labels('message') is child
+    child.inc()
+    child.inc(2)
+    observer = histogram.labels('p"1')
+    for value in (0.05, 0.5, 5.0):
+        observer.observe(value)
+    with pytest.raises(ValueError):
+        counter.labels()
+
+    lines = registry.render().splitlines()
+    assert '# TYPE linbot_test_total counter' in lines
+    assert 'linbot_test_total{post_type="message"} 3' in lines
+    # 分桶为累计计数，标签值中的引号被转义
+    assert 'linbot_test_seconds_bucket{plugin="p\\"1",le="0.1"} 1' in lines
+    assert 'linbot_test_seconds_bucket{plugin="p\\"1",le="1"} 2' in lines
+    assert 'linbot_test_seconds_bucket{plugin="p\\"1",le="+Inf"} 3' in lines
+    assert 'linbot_test_seconds_count{plugin="p\\"1"} 3' in lines
+    assert 'linbot_test_depth{queue="a"} 2' in lines
+    assert 'linbot_test_clients 3' in lines
+
+def test_metrics_route_serves_prometheus_text(tmp_path):
+    from aiohttp.test_utils import TestClient, TestServer
+    from wsclient import WebSocketServer
+
+    async def main():
+        server = WebSocketServer(working_dir=str(tmp_path))
+        async with TestClient(TestServer(server.app)) as client:
+            response = await client.get('/metrics')
+            return response.status, response.headers['Content-Type'], await response.text()
+
+    status, content_type, text = asyncio.run(main())
+    assert status == 200
+    assert content_type.startswith('text/plain')
+    assert '# TYPE linbot_events_total counter' in text
+    assert 'linbot_connected_clients 0' in text
+
+def test_handler_metrics_are_removed_when_handlers_are_unregistered(plugin):
+    from chat import fun_call_register
+    from metrics import metrics
+
+    @fun_call_register("first")
+    async def first(event):
+        pass
+
+    @fun_call_register("second")
+    async def second(event):
+        pass
+
+    assert 'linbot_handler_errors_total{plugin="test",handler="first"} 0' in metrics.render()
+    plugin.unregister(first._fun_call_register_meta['id'])
+    text = metrics.render()
+    assert 'handler="first"' not in text
+    assert 'linbot_handler_errors_total{plugin="test",handler="second"} 0' in text
+    # 插件重载时先注销全部处理器，指标不会随重载次数增长
+    plugin.unregister_plugin('test')
+    assert 'plugin="test"' not in metrics.render()
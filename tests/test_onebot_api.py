@@ -0,0 +1,122 @@
+# tests/test_onebot_api.py
+import asyncio
+import time
+from event import parse_event
+from message_method import message_sender
+from onebot_api import OneBotAPI, TTLCache
+
+def _info_reply(request):
+    if request['action'] == 'get_group_member_list':
+        return {"status": "ok", "retcode": 0,
+                "data": [{"user_id": 1, "card": "a"}, {"user_id": 2, "card": "b"}]}
+    return {"status": "ok", "retcode": 0, "data": dict(request['params'], name="info")}
+
+def _notice(notice_type: str, **fields) -> dict:
+    return dict({"time": 0, "self_id": 10001, "post_type": "notice", "notice_type": notice_type,
+                 "group_id": 30001, "user_id": 20001}, **fields)
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1, ttl=10)
+    cache.set('b', 2, ttl=10)
+    cache.get('a')
+    cache.set('c', 3, ttl=10)
+    # b 最久未使用
+    assert 'b' not in cache and cache.get('a') == 1
+    now[0] += 10
+    assert cache.get('a') is None
+
+def test_queries_are_cached_per_account_and_params(onebot):
+    bot = onebot(reply=_info_reply)
+    api = OneBotAPI()
+
+    async def main():
+        first = await api.get_group_info(30001)
+        again = await api.get_group_info(30001)
+        other = await api.get_group_info(30002)
+        fresh = await api.get_group_info(30001, no_cache=True)
+        return first, again, other, fresh
+
+    first, again, other, fresh = asyncio.run(main())
+    assert first is again and first['group_id'] == 30001
+    assert other['group_id'] == 30002 and fresh == first
+    assert len(bot.requests) == 3
+    assert api.stats()['hits'] == 1 and api.stats()['misses'] == 3
+
+def test_concurrent_queries_share_one_request(onebot):
+    bot = onebot(reply=_info_reply, delay=0.01)
+    api = OneBotAPI()
+
+    async def main():
+        return await asyncio.gather(*(api.get_login_info() for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(bot.requests) == 1
+    assert all(result is results[0] for result in results)
+    assert api.stats()['shared'] == 4 and api.stats()['in_flight'] == 0
+
+def test_member_list_fills_member_info(onebot):
+    bot = onebot(reply=_info_reply)
+    api = OneBotAPI()
+
+    async def main():
+        await api.get_group_member_list(30001)
+        return await api.get_group_member_info(30001, 2)
+
+    assert asyncio.run(main()) == {"user_id": 2, "card": "b"}
+    assert [request['action'] for request in bot.requests] == ['get_group_member_list']
+
+def test_notices_invalidate_related_entries(onebot):
+    bot = onebot(reply=_info_reply)
+    api = OneBotAPI()
+
+    async def main():
+        await api.get_group_info(30001)
+        await api.get_group_member_info(30001, 20001)
+        await api.get_friend_list()
+        api.handle_notice(parse_event(_notice("group_card")))
+        await api.get_group_info(30001)
+        await api.get_group_member_info(30001, 20001)
+        api.handle_notice(parse_event(_notice("friend_add")))
+        await api.get_friend_list()
+
+    asyncio.run(main())
+    assert [request['action'] for request in bot.requests] == [
+        'get_group_info', 'get_group_member_info', 'get_friend_list',
+        'get_group_member_info', 'get_friend_list']
+    assert api.stats()['invalidations'] == 2
+
+def test_notice_during_a_query_keeps_its_result_out_of_the_cache(onebot):
+    bot = onebot(reply=_info_reply, delay=0.01)
+    api = OneBotAPI()
+
+    async def main():
+        query = asyncio.ensure_future(api.get_group_member_info(30001, 20001))
+        await asyncio.sleep(0)
+        api.handle_notice(parse_event(_notice("group_decrease")))
+        assert await query is not None
+        await api.get_group_member_info(30001, 20001)
+
+    asyncio.run(main())
+    assert len(bot.requests) == 2
+
+def test_failed_queries_are_not_cached(onebot):
+    bot = onebot(reply=lambda request: {"status": "failed", "retcode": 100, "data": None})
+    api = OneBotAPI()
+
+    async def main():
+        return [await api.get_group_info(30001) for _ in range(2)]
+
+    assert asyncio.run(main()) == [None, None]
+    assert len(bot.requests) == 2
+
+def test_failed_send_with_null_data_returns_none(onebot, group_message):
+    """回归：发送失败的响应中 data 为 null 时，构造 SendReturn 的校验错误曾直接抛给插件"""
+    onebot(reply=lambda request: {"status": "failed", "retcode": 1200, "data": None, "message": "muted"})
+
+    async def main():
+        return await message_sender.send_group_msg([{"type": "text", "data": {"text": "hi"}}], 30001)
+
+    assert asyncio.run(main()) is None
@@ -0,0 +1,115 @@
+# tests/test_ordered_dispatch.py
+import asyncio
+import random
+import pytest
+from event import parse_event, GroupMessageEvent
+from chat import fun_call_register
+from dispatcher import EventDispatcher
+
+def test_session_queue_size_below_one_is_rejected():
+    with pytest.raises(ValueError):
+        EventDispatcher(session_queue_size=0)
+
+def _run(dispatcher: EventDispatcher, events: list, done, timeout: float = 5.0):
+    async def main():
+        dispatcher.start()
+        for event in events:
+            await dispatcher.submit(event)
+        await asyncio.wait_for(done(), timeout)
+        sessions = len(dispatcher._sessions)
+        await dispatcher.stop()
+        return sessions
+    return asyncio.run(main())
+
+def test_events_of_one_session_run_in_order_sessions_in_parallel(plugin, group_message):
+    seen = {}
+    active = set()
+    overlap = []
+
+    @fun_call_register("record")
+    async def record(event: GroupMessageEvent):
+        active.add(event.group_id)
+        overlap.append(len(active))
+        # 随机耗时，不保证顺序时后到的事件会先完成
+        await asyncio.sleep(random.random() * 0.01)
+        seen.setdefault(event.group_id, []).append(event.message_id)
+        active.discard(event.group_id)
+
+    events = [parse_event(group_message(group_id=30000 + index % 3)) for index in range(30)]
+
+    async def done():
+        while sum(map(len, seen.values())) < len(events):
+            await asyncio.sleep(0.005)
+
+    sessions = _run(EventDispatcher(workers=8), events, done)
+    for group_id, message_ids in seen.items():
+        assert message_ids == sorted(message_ids)
+    assert max(overlap) > 1
+    # 处理完的会话被移除
+    assert sessions == 0
+
+def test_full_session_queue_drops_oldest_and_keeps_order(plugin, group_message):
+    seen = []
+    release = asyncio.Event()
+
+    @fun_call_register("record")
+    async def record(event: GroupMessageEvent):
+        await release.wait()
+        seen.append(event.message_id)
+
+    events = [parse_event(group_message(group_id=30001)) for _ in range(6)]
+
+    async def main():
+        dispatcher = EventDispatcher(workers=2, session_queue_size=2)
+        dispatcher.start()
+        for event in events:
+            await dispatcher.submit(event)
+        await asyncio.sleep(0.01)
+        release.set()
+        while len(seen) < 3:
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.01)
+        stats = dispatcher.stats()
+        await dispatcher.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    # 第一个事件正在处理，会话队列保留最新的两个
+    assert seen == [events[0].message_id, events[4].message_id, events[5].message_id]
+    assert stats['dropped'] == {'message': 3}
+
+def test_hot_session_does_not_hold_workers(plugin, group_message):
+    """回归：繁忙会话的队列满后，取出其事件的工作协程都停在会话上等待，其他会话无人处理"""
+    seen = []
+    release = asyncio.Event()
+
+    @fun_call_register("record")
+    async def record(event: GroupMessageEvent):
+        if event.group_id == 30001:
+            await release.wait()
+        seen.append(event.group_id)
+
+    async def main():
+        dispatcher = EventDispatcher(workers=2, session_queue_size=1)
+        dispatcher.start()
+        for _ in range(10):
+            await dispatcher.submit(parse_event(group_message(group_id=30001)))
+        await dispatcher.submit(parse_event(group_message(group_id=30002)))
+        try:
+            while 30002 not in seen:
+                await asyncio.sleep(0.005)
+        finally:
+            release.set()
+            await dispatcher.stop()
+
+    asyncio.run(asyncio.wait_for(main(), 2))
+    assert 30002 in seen
+
+def test_session_overflow_follows_reject_policy():
+    from collections import deque
+    from dispatcher import EventQueue
+    queue = EventQueue(policy='reject', reject_post_types=('notice',))
+    items = deque([(parse_event({"post_type": "message", "self_id": 1}, lazy=True), None)])
+    notice = (parse_event({"post_type": "notice", "self_id": 1}, lazy=True), None)
+    assert not queue.overflow(items, notice, "会话已满")
+    assert len(items) == 1 and queue.dropped == {'notice': 1}
@@ -0,0 +1,74 @@
+# tests/test_outbound_pipeline.py
+import asyncio
+from message_method import TokenBucket, message_sender, outbound_pipeline
+from response_handler import response_handler
+
+def test_token_bucket_refills_at_rate_up_to_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=2, now=0.0)
+    assert bucket.wait_time(0.0) == 0.0
+    bucket.consume()
+    bucket.consume()
+    assert bucket.wait_time(0.0) == 0.5
+    assert bucket.wait_time(0.25) == 0.25
+    assert bucket.wait_time(10.0) == 0.0
+    assert bucket.tokens == 2
+
+def test_group_rate_spaces_out_sends(onebot):
+    bot = onebot()
+    outbound_pipeline.configure(group_rate=20, group_burst=2, user_rate=0, global_rate=0)
+
+    async def main():
+        return await asyncio.gather(*(message_sender.send_group_msg([], group_id=1) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert all(result.retcode == 0 for result in results)
+    gaps = [later - earlier for earlier, later in zip(bot.sent_at, bot.sent_at[1:])]
+    # 前两帧用掉突发额度，之后每帧间隔约 1/20 秒
+    assert gaps[0] < 0.02
+    assert all(gap > 0.04 for gap in gaps[1:])
+
+def test_time_spent_queued_does_not_count_towards_the_response_timeout(onebot):
+    """回归：超时曾在帧进入限速队列前开始计时，已经写出的消息被报告为发送失败"""
+    bot = onebot(delay=0.05)
+    outbound_pipeline.configure(group_rate=10, group_burst=1, user_rate=0, global_rate=0)
+    response_handler.timeout = 0.15
+
+    async def main():
+        return await asyncio.gather(*(message_sender.send_group_msg([], group_id=1) for _ in range(4)))
+
+    results = asyncio.run(main())
+    # 最后一帧在约 0.3 秒后才写出，超过了超时时间，但它的响应仍被收到
+    assert len(bot.requests) == 4
+    assert bot.sent_at[-1] - bot.sent_at[0] > response_handler.timeout
+    assert [result is not None and result.retcode == 0 for result in results] == [True] * 4
+
+def test_unanswered_request_times_out_after_it_is_written(onebot):
+    onebot(reply=lambda request: None)
+    response_handler.timeout = 0.1
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await message_sender.send_group_msg([], group_id=1)
+        return result, loop.time() - start
+
+    result, elapsed = asyncio.run(main())
+    assert result is None
+    assert 0.1 <= elapsed < 0.5
+    assert response_handler.pending_count == 0
+
+def test_frames_queued_too_long_are_not_sent(onebot):
+    """回归：排队时间不计入响应超时后，排在限速队列里的请求没有任何时限"""
+    bot = onebot()
+    outbound_pipeline.configure(group_rate=1, group_burst=1, user_rate=0, global_rate=0, max_queue_wait=0.1)
+
+    async def main():
+        start = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*(message_sender.send_group_msg([], group_id=1) for _ in range(3)))
+        return results, asyncio.get_running_loop().time() - start
+
+    results, elapsed = asyncio.run(main())
+    assert results[0].retcode == 0 and results[1:] == [None, None]
+    assert elapsed < 0.5
+    assert len(bot.requests) == 1
+    assert outbound_pipeline.stats()['expired'] == 2
@@ -0,0 +1,203 @@
+# tests/test_plugin_loading.py
+import asyncio
+import json
+import os
+import sys
+import types
+import textwrap
+import pytest
+from event import parse_event
+from plugins_manager import PluginManager, PluginWatcher, CACHE_FILE
+from registry import registry
+
+COMMAND_PLUGIN = '''
+from chat import fun_call_register
+from event import GroupMessageEvent
+from message_type import Messgaechat
+import results
+
+@fun_call_register("/{name}", on_msg=Messgaechat.on_command)
+async def handler(event: GroupMessageEvent):
+    results.calls.append("{name}")
+'''
+
+def _write(path, source: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(textwrap.dedent(source))
+
+@pytest.fixture
+def plugins_dir(tmp_path, monkeypatch):
+    results = types.ModuleType('results')
+    results.calls = []
+    monkeypatch.setitem(sys.modules, 'results', results)
+    for name in ('alpha', 'beta'):
+        _write(tmp_path / name / '__init__.py', COMMAND_PLUGIN.format(name=name))
+    managers = []
+
+    def make() -> PluginManager:
+        manager = PluginManager()
+        managers.append(manager)
+        return manager
+
+    try:
+        yield tmp_path, make, results.calls
+    finally:
+        for manager in managers:
+            for plugin_name in list(manager.plugins):
+                manager.unload_plugin(plugin_name)
+        registry.clear()
+
+def _reload_lazily(base, make) -> PluginManager:
+    """第一次加载写入缓存，第二次加载时缓存有效的插件被推迟"""
+    first = make()
+    first.load_plugins(str(base), mode='lazy')
+    for plugin_name in list(first.plugins):
+        first.unload_plugin(plugin_name)
+    manager = make()
+    manager.load_plugins(str(base), mode='lazy')
+    return manager
+
+def test_eager_mode_imports_everything_and_writes_no_cache(plugins_dir):
+    base, make, _ = plugins_dir
+    manager = make()
+    manager.load_plugins(str(base))
+    assert set(manager.plugins) == {'alpha', 'beta'}
+    assert not manager.pending
+    assert not os.path.exists(base / CACHE_FILE)
+
+def test_lazy_mode_defers_plugins_with_a_valid_cache(plugins_dir):
+    base, make, _ = plugins_dir
+    manager = _reload_lazily(base, make)
+    assert set(manager.pending) == {'alpha', 'beta'}
+    assert not manager.plugins
+    with open(base / CACHE_FILE, encoding='utf-8') as f:
+        cache = json.load(f)
+    assert cache['alpha']['handlers'][0]['matcher'] == 'command'
+
+def test_changed_source_invalidates_the_cache(plugins_dir):
+    base, make, _ = plugins_dir
+    make().load_plugins(str(base), mode='lazy')
+    registry.clear()
+    _write(base / 'beta' / '__init__.py', COMMAND_PLUGIN.format(name='beta') + '\n# changed\n')
+    manager = make()
+    manager.load_plugins(str(base), mode='lazy')
+    assert set(manager.pending) == {'alpha'}
+    assert 'beta' in manager.plugins
+
+def test_matching_event_imports_only_the_needed_plugin(plugins_dir, group_message):
+    base, make, calls = plugins_dir
+    manager = _reload_lazily(base, make)
+
+    asyncio.run(manager.handle_event('message', parse_event(group_message("/beta"))))
+    assert calls == ['beta']
+    assert set(manager.plugins) == {'beta'}
+    assert set(manager.pending) == {'alpha'}
+
+    asyncio.run(manager.handle_event('message', parse_event(group_message("hello"))))
+    assert set(manager.pending) == {'alpha'}
+
+def test_background_mode_imports_the_rest(plugins_dir):
+    base, make, _ = plugins_dir
+    manager = _reload_lazily(base, make)
+    asyncio.run(manager.load_pending_in_background())
+    assert not manager.pending
+    assert set(manager.plugins) == {'alpha', 'beta'}
+
+def test_background_imports_run_off_the_event_loop(plugins_dir, group_message):
+    base, make, calls = plugins_dir
+    results = sys.modules['results']
+    results.import_delay = 0
+    _write(base / 'alpha' / '__init__.py', 'import time\nimport results\ntime.sleep(results.import_delay)\n'
+           + COMMAND_PLUGIN.format(name='alpha'))
+    manager = _reload_lazily(base, make)
+    results.import_delay = 0.3
+
+    async def main():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticking = asyncio.create_task(ticker())
+        background = asyncio.create_task(manager.load_pending_in_background())
+        await asyncio.sleep(0.05)
+        # alpha 正在导入：不匹配它的事件不用等待，匹配它的事件等到导入完成后再处理
+        await manager.handle_event('message', parse_event(group_message("hello")))
+        assert 'alpha' not in manager.plugins
+        await manager.handle_event('message', parse_event(group_message("/alpha")))
+        assert 'alpha' in manager.plugins
+        await background
+        ticking.cancel()
+        return ticks
+
+    ticks = asyncio.run(main())
+    assert calls == ['alpha']
+    assert set(manager.plugins) == {'alpha', 'beta'}
+    # 导入期间事件循环没有被阻塞
+    assert ticks >= 10
+
+def test_events_wait_only_for_matching_plugins_that_are_starting(plugins_dir, group_message):
+    base, make, calls = plugins_dir
+    manager = make()
+    manager.load_plugins(str(base))
+    manager.started = True
+
+    async def main():
+        release = asyncio.Event()
+        async def slow_startup():
+            await release.wait()
+        registry.register_hook('startup', slow_startup, 'alpha')
+        starting = asyncio.create_task(manager._start_loaded(['alpha']))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(manager.handle_event('message', parse_event(group_message("/beta"))), 1)
+        assert calls == ['beta']
+        waiting = asyncio.create_task(manager.handle_event('message', parse_event(group_message("/alpha"))))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        release.set()
+        await waiting
+        await starting
+
+    asyncio.run(main())
+    assert calls == ['beta', 'alpha']
+
+def test_import_report_is_sorted_by_time(plugins_dir):
+    base, make, _ = plugins_dir
+    manager = make()
+    manager.load_plugins(str(base))
+    manager.import_times.update(alpha=0.01, beta=0.2)
+    assert [plugin_name for plugin_name, _ in manager.import_report()] == ['beta', 'alpha']
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        PluginManager().load_plugins(str(tmp_path), mode='sometimes')
+
+class _Loop:
+    def __init__(self):
+        self.scheduled = []
+
+    def call_soon_threadsafe(self, callback, *args):
+        self.scheduled.append(args)
+
+def _event(event_type: str, src_path: str, is_directory: bool = False, dest_path: str = ''):
+    return types.SimpleNamespace(event_type=event_type, src_path=src_path,
+                                 is_directory=is_directory, dest_path=dest_path)
+
+def test_watcher_ignores_directories_and_non_python_files(tmp_path):
+    """回归：写入插件缓存文件时插件目录本身的修改事件曾触发根目录插件重载"""
+    manager = PluginManager()
+    manager.plugins_base_dir = str(tmp_path)
+    loop = _Loop()
+    watcher = PluginWatcher(manager, loop)
+
+    watcher.on_event(_event('modified', str(tmp_path), is_directory=True))
+    watcher.on_event(_event('modified', str(tmp_path / CACHE_FILE)))
+    watcher.on_event(_event('created', str(tmp_path / 'alpha'), is_directory=True))
+    watcher.on_event(_event('opened', str(tmp_path / 'alpha' / '__init__.py')))
+    assert loop.scheduled == []
+
+    watcher.on_event(_event('modified', str(tmp_path / 'alpha' / '__init__.py')))
+    watcher.on_event(_event('moved', str(tmp_path / 'alpha' / 'a.tmp'), dest_path=str(tmp_path / 'alpha' / 'a.py')))
+    assert loop.scheduled == [(str(tmp_path / 'alpha' / '__init__.py'),), (str(tmp_path / 'alpha' / 'a.py'),)]
@@ -0,0 +1,104 @@
+# tests/test_plugin_reload.py
+import asyncio
+import os
+import sys
+import textwrap
+import pytest
+from event import parse_event
+from chat import fun_call
+from plugins_manager import PluginManager
+from registry import registry
+
+HANDLER = '''
+from chat import fun_call_register
+from event import GroupMessageEvent
+import results
+
+@fun_call_register("{name}")
+async def handler(event: GroupMessageEvent):
+    results.calls.append("{name}:{version}")
+'''
+
+def _write(path, source: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(textwrap.dedent(source))
+    # 保证同一秒内的修改也能被识别
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def plugins(tmp_path, monkeypatch):
+    """临时插件目录；插件通过 results 模块记录调用"""
+    import types
+    results = types.ModuleType('results')
+    results.calls = []
+    monkeypatch.setitem(sys.modules, 'results', results)
+    manager = PluginManager()
+    try:
+        yield manager, tmp_path, results.calls
+    finally:
+        for plugin_name in list(manager.plugins):
+            manager.unload_plugin(plugin_name)
+        registry.clear()
+
+def _dispatch(group_message):
+    asyncio.run(fun_call(parse_event(group_message())))
+
+def test_reload_replaces_only_the_changed_plugin(plugins, group_message):
+    manager, base, calls = plugins
+    _write(base / 'a' / '__init__.py', HANDLER.format(name='a', version=1))
+    _write(base / 'b' / '__init__.py', HANDLER.format(name='b', version=1))
+    manager.load_plugins(str(base))
+    module_a = manager.plugins['a']
+
+    _write(base / 'b' / '__init__.py', HANDLER.format(name='b', version=2))
+    assert asyncio.run(manager.reload_plugin('b')) == ['b']
+    assert manager.plugins['a'] is module_a
+    _dispatch(group_message)
+    assert sorted(calls) == ['a:1', 'b:2']
+
+def test_shared_library_modules_are_not_tracked_or_reloaded(plugins):
+    """回归：插件首次导入的标准库模块曾被记为插件模块，重载时被移除，导入它的其他插件也被当作依赖者重载"""
+    manager, base, _ = plugins
+    sys.modules.pop('wave', None)
+    _write(base / 'b' / '__init__.py', 'import wave\n')
+    _write(base / 'a' / '__init__.py', 'import wave\n')
+    manager.load_plugins(str(base))
+    wave = sys.modules['wave']
+    assert 'wave' not in manager.plugin_modules['b']
+
+    assert asyncio.run(manager.reload_plugin('b')) == ['b']
+    assert sys.modules['wave'] is wave
+
+def test_dependents_of_plugin_local_modules_are_reloaded(plugins):
+    manager, base, _ = plugins
+    _write(base / 'b' / 'b_helper.py', 'VALUE = 1\n')
+    _write(base / 'b' / '__init__.py', 'import b_helper\n')
+    manager.load_plugins(str(base))
+    # a 在 b 之后加载，使用 b 目录中的模块
+    _write(base / 'a' / '__init__.py', 'import b_helper\nVALUE = b_helper.VALUE\n')
+    manager._load_single_plugin('a', *manager._plugin_location('a'))
+    assert manager.plugins['a'].VALUE == 1
+
+    _write(base / 'b' / 'b_helper.py', 'VALUE = 2\n')
+    assert asyncio.run(manager.reload_plugin('b')) == ['b', 'a']
+    assert manager.plugins['a'].VALUE == 2
+
+def test_syntax_error_keeps_the_running_plugin(plugins, group_message):
+    manager, base, calls = plugins
+    _write(base / 'a' / '__init__.py', HANDLER.format(name='a', version=1))
+    manager.load_plugins(str(base))
+    _write(base / 'a' / '__init__.py', 'def broken(:\n')
+    assert asyncio.run(manager.reload_plugin('a')) == []
+    _dispatch(group_message)
+    assert calls == ['a:1']
+
+def test_deleted_plugin_is_unloaded(plugins):
+    manager, base, _ = plugins
+    _write(base / 'a' / '__init__.py', HANDLER.format(name='a', version=1))
+    manager.load_plugins(str(base))
+    os.remove(base / 'a' / '__init__.py')
+    assert asyncio.run(manager.reload_plugin('a')) == []
+    assert 'a' not in manager.plugins
+    assert registry.get_plugin_functions('a') == []
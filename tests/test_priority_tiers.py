@@ -0,0 +1,108 @@
+# tests/test_priority_tiers.py
+import asyncio
+import time
+from event import parse_event, GroupMessageEvent
+from chat import fun_call, fun_call_register
+
+def test_single_handler_runs_on_the_dispatching_task(plugin, group_message):
+    calls = []
+
+    async def main():
+        dispatching = asyncio.current_task()
+
+        @fun_call_register("only")
+        async def handler(event: GroupMessageEvent):
+            calls.append(asyncio.current_task() is dispatching)
+
+        await fun_call(parse_event(group_message()))
+
+    asyncio.run(main())
+    assert calls == [True]
+
+def test_same_tier_handlers_overlap(plugin, group_message):
+    for index in range(3):
+        @fun_call_register(f"slow{index}")
+        async def slow(event: GroupMessageEvent):
+            await asyncio.sleep(0.2)
+
+    start = time.perf_counter()
+    asyncio.run(fun_call(parse_event(group_message())))
+    # 同一优先级的耗时由最慢的处理器决定，而不是三者之和
+    assert time.perf_counter() - start < 0.4
+
+def test_block_stops_lower_tiers_only(plugin, group_message):
+    calls = []
+
+    @fun_call_register("late", priority=5)
+    async def late(event: GroupMessageEvent):
+        calls.append("late")
+
+    @fun_call_register("early", priority=0, block=True)
+    async def early(event: GroupMessageEvent):
+        calls.append("early")
+
+    @fun_call_register("same_tier", priority=0)
+    async def same_tier(event: GroupMessageEvent):
+        calls.append("same_tier")
+
+    asyncio.run(fun_call(parse_event(group_message())))
+    assert sorted(calls) == ["early", "same_tier"]
+
+def test_tiers_run_in_priority_order(plugin, group_message):
+    calls = []
+
+    @fun_call_register("second", priority=2)
+    async def second(event: GroupMessageEvent):
+        calls.append("second")
+
+    @fun_call_register("first", priority=0)
+    async def first(event: GroupMessageEvent):
+        await asyncio.sleep(0.01)
+        calls.append("first")
+
+    @fun_call_register("first_too", priority=0)
+    async def first_too(event: GroupMessageEvent):
+        calls.append("first_too")
+
+    asyncio.run(fun_call(parse_event(group_message())))
+    assert calls[-1] == "second"
+
+def test_errors_are_isolated_per_handler(plugin, group_message):
+    calls = []
+
+    @fun_call_register("broken")
+    async def broken(event: GroupMessageEvent):
+        raise RuntimeError("故意的错误")
+
+    @fun_call_register("fine")
+    async def fine(event: GroupMessageEvent):
+        calls.append("fine")
+
+    @fun_call_register("broken_last")
+    async def broken_last(event: GroupMessageEvent):
+        raise RuntimeError("故意的错误")
+
+    @fun_call_register("next_tier", priority=2)
+    async def next_tier(event: GroupMessageEvent):
+        calls.append("next_tier")
+
+    asyncio.run(fun_call(parse_event(group_message())))
+    assert calls == ["fine", "next_tier"]
+
+def test_cancelled_dispatch_cancels_running_handlers(plugin, group_message):
+    finished = []
+
+    for index in range(2):
+        @fun_call_register(f"slow{index}")
+        async def slow(event: GroupMessageEvent, index=index):
+            await asyncio.sleep(0.2)
+            finished.append(index)
+
+    async def main():
+        dispatch = asyncio.ensure_future(fun_call(parse_event(group_message())))
+        await asyncio.sleep(0.01)
+        dispatch.cancel()
+        await asyncio.sleep(0.3)
+
+    asyncio.run(main())
+    assert finished == []
@@ -0,0 +1,80 @@
+# tests/test_profiler.py
+import asyncio
+import logging
+import pytest
+from event import parse_event, GroupMessageEvent
+from chat import fun_call, fun_call_register
+from profiler import HandlerStats, handler_profiler
+
+@pytest.fixture
+def profiling():
+    handler_profiler.enable(slow_threshold=0.02)
+    try:
+        yield handler_profiler
+    finally:
+        handler_profiler.disable()
+        handler_profiler.slow_threshold = None
+
+def test_handler_stats_snapshot():
+    stats = HandlerStats(sample_size=4)
+    for elapsed in (0.1, 0.2, 0.3, 0.4, 0.5):
+        stats.record(elapsed)
+    stats.record(0.6, failed=True)
+    snapshot = stats.snapshot()
+    assert snapshot['calls'] == 6
+    assert snapshot['errors'] == 1
+    assert snapshot['max_time'] == 0.6
+    # 分位数只基于最近的样本
+    assert snapshot['p50'] == 0.5
+    assert snapshot['p99'] == 0.6
+
+def test_stats_are_recorded_only_when_enabled(plugin, group_message):
+    @fun_call_register("fast")
+    async def fast(event: GroupMessageEvent):
+        pass
+
+    asyncio.run(fun_call(parse_event(group_message())))
+    assert handler_profiler.report()[0]['calls'] == 0
+
+def test_report_and_slow_handler_warning(plugin, profiling, group_message, caplog):
+    @fun_call_register("slow")
+    async def slow(event: GroupMessageEvent):
+        await asyncio.sleep(0.03)
+
+    @fun_call_register("broken")
+    async def broken(event: GroupMessageEvent):
+        raise RuntimeError("故意的错误")
+
+    linbot_logger = logging.getLogger("linbot")
+    linbot_logger.addHandler(caplog.handler)
+    try:
+        asyncio.run(fun_call(parse_event(group_message())))
+    finally:
+        linbot_logger.removeHandler(caplog.handler)
+
+    report = profiling.report('test')
+    assert [row['handler'] for row in report] == ['slow', 'broken']
+    assert report[0]['calls'] == 1 and report[0]['total_time'] >= 0.03
+    assert report[1]['errors'] == 1
+    assert "慢处理器: test.slow" in caplog.text
+    profiling.reset()
+    assert profiling.report('test')[0]['calls'] == 0
+
+def test_profile_plugin_reports_only_that_plugin(plugin, group_message):
+    @fun_call_register("busy")
+    async def busy(event: GroupMessageEvent):
+        sum(range(1000))
+
+    async def main():
+        async def traffic():
+            for _ in range(20):
+                await fun_call(parse_event(group_message()))
+                await asyncio.sleep(0.001)
+        _, report = await asyncio.gather(traffic(), handler_profiler.profile_plugin('test', seconds=0.1))
+        return report
+
+    report = asyncio.run(main())
+    assert "test_profiler.py" in report
+    assert "chat.py" not in report
+    with pytest.raises(KeyError):
+        asyncio.run(handler_profiler.profile_plugin('missing', seconds=0))
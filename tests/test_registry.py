@@ -0,0 +1,50 @@
+# tests/test_registry.py
+import asyncio
+from event import parse_event, base_event, GroupMessageEvent, PrivateMessageEvent
+from chat import fun_call, fun_call_register
+
+def test_dispatch_index_filters_by_event_class_and_post_type(plugin, group_message, private_message):
+    calls = []
+
+    @fun_call_register("group_only")
+    async def group_only(event: GroupMessageEvent):
+        calls.append("group")
+
+    @fun_call_register("private_only")
+    async def private_only(event: PrivateMessageEvent):
+        calls.append("private")
+
+    @fun_call_register("notices", event_types=["notice"])
+    async def notices(event: base_event):
+        calls.append("notice")
+
+    asyncio.run(fun_call(parse_event(group_message())))
+    assert calls == ["group"]
+    handlers = plugin.get_handlers("message", GroupMessageEvent)
+    assert [func_info['name'] for func_info, _ in handlers] == ["group_only"]
+    assert [func_info['name'] for func_info, _ in plugin.get_handlers("notice", base_event)] == ["notices"]
+
+def test_index_is_updated_on_register_and_unregister(plugin, group_message):
+    calls = []
+    event = parse_event(group_message())
+
+    @fun_call_register("first")
+    async def first(event: GroupMessageEvent):
+        calls.append("first")
+
+    asyncio.run(fun_call(event))
+    # 索引建立之后注册的处理器同样会被调用
+    @fun_call_register("second")
+    async def second(event: GroupMessageEvent):
+        calls.append("second")
+
+    asyncio.run(fun_call(event))
+    assert calls == ["first", "first", "second"]
+
+    plugin.unregister(first._fun_call_register_meta['id'])
+    calls.clear()
+    asyncio.run(fun_call(event))
+    assert calls == ["second"]
+
+    plugin.unregister_plugin('test')
+    assert plugin.get_handlers("message", GroupMessageEvent) == ()
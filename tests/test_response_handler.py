@@ -0,0 +1,62 @@
+# tests/test_response_handler.py
+import asyncio
+import pytest
+from response_handler import ResponseHandler
+
+def test_response_resolves_the_matching_request():
+    async def main():
+        handler = ResponseHandler()
+        first, first_future = handler.register_request()
+        second, second_future = handler.register_request()
+        assert second == first + 1
+        handler.handle_response({"echo": second, "retcode": 0})
+        # 部分实现把 echo 转为字符串返回
+        handler.handle_response({"echo": str(first), "retcode": 1})
+        return await first_future, await second_future, handler.pending_count
+
+    first, second, pending = asyncio.run(main())
+    assert first["retcode"] == 1 and second["retcode"] == 0
+    assert pending == 0
+
+def test_timeout_wheel_expires_requests_and_stops_ticking():
+    async def main():
+        handler = ResponseHandler(resolution=0.01, slots=8)
+        _, future = handler.register_request(timeout=0.05)
+        # 超时时间超过一圈时间轮
+        _, later = handler.register_request(timeout=0.15)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with pytest.raises(asyncio.TimeoutError):
+            await future
+        first_elapsed = loop.time() - start
+        assert not later.done()
+        with pytest.raises(asyncio.TimeoutError):
+            await later
+        return first_elapsed, loop.time() - start, handler._tick_handle, handler.pending_count
+
+    first_elapsed, later_elapsed, tick_handle, pending = asyncio.run(main())
+    assert 0.04 <= first_elapsed < 0.12
+    assert 0.14 <= later_elapsed < 0.3
+    assert tick_handle is None
+    assert pending == 0
+
+def test_discard_cancels_and_late_response_is_ignored():
+    async def main():
+        handler = ResponseHandler()
+        echo, future = handler.register_request()
+        handler.discard(echo)
+        handler.handle_response({"echo": echo})
+        return future.cancelled(), handler.pending_count
+
+    assert asyncio.run(main()) == (True, 0)
+
+def test_echo_prefix():
+    async def main():
+        handler = ResponseHandler(echo_prefix="2:")
+        echo, future = handler.register_request()
+        handler.handle_response({"echo": echo, "retcode": 0})
+        return echo, await future
+
+    echo, response = asyncio.run(main())
+    assert echo.startswith("2:")
+    assert response["retcode"] == 0
@@ -0,0 +1,152 @@
+# tests/test_shard.py
+import asyncio
+import pytest
+import codec
+from event import parse_event
+from onebot_api import onebot_api, _cache_key
+from shard import ShardPool, ShardWorker, _pack, _read
+
+class _Writer:
+    """记录写入内容的 StreamWriter 替身，buffered 为模拟的发送缓冲大小"""
+
+    def __init__(self):
+        self.messages = []
+        self.buffered = 0
+        self.transport = self
+
+    def get_write_buffer_size(self) -> int:
+        return self.buffered
+
+    def write(self, data: bytes):
+        self.messages.append(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+def _unpack(data: bytes) -> tuple:
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await _read(reader)
+    return asyncio.run(read())
+
+def _notice(group_id: int = 30001) -> dict:
+    return {"time": 0, "self_id": 10001, "post_type": "notice", "notice_type": "group_decrease",
+            "group_id": group_id, "user_id": 20001}
+
+def _ready_pool(shards: int) -> tuple:
+    pool = ShardPool(shards, [])
+    writers = [_Writer() for _ in range(shards)]
+    pool._writers = list(writers)
+    for ready in pool._ready:
+        ready.set()
+    return pool, writers
+
+def test_pack_and_read_round_trip():
+    body = codec.encode({"post_type": "message", "text": "你好"})
+    header, read_body = _unpack(_pack({'t': 'event', 'n': 1}, body))
+    assert header == {'t': 'event', 'n': 1}
+    assert read_body == body
+
+def test_events_of_one_session_go_to_one_shard(group_message, private_message):
+    pool = ShardPool(4, [])
+    first = pool.shard_for(parse_event(group_message("a", group_id=30001, user_id=1)))
+    assert pool.shard_for(parse_event(group_message("b", group_id=30001, user_id=2))) == first
+    assert pool.shard_for(parse_event(private_message(user_id=20001))) == 20001 % 4
+    assert pool.shard_for(parse_event({"time": 0, "self_id": 10001, "post_type": "meta_event",
+                                       "meta_event_type": "heartbeat"})) == 0
+
+def test_responses_are_routed_by_echo_prefix():
+    pool, writers = _ready_pool(2)
+    assert pool.route_response({"echo": "1:abc"}, '{"echo":"1:abc"}')
+    assert _unpack(writers[1].messages[0]) == ({'t': 'response'}, b'{"echo":"1:abc"}')
+    assert not pool.route_response({"echo": "abc"}, '')
+    assert not pool.route_response({"echo": "7:abc"}, '')
+    assert not pool.route_response({"echo": 3}, '')
+
+def test_unready_shard_drops_events(group_message):
+    pool, writers = _ready_pool(2)
+    event = parse_event(group_message(group_id=30001))
+    index = pool.shard_for(event)
+    pool._ready[index].clear()
+    assert not asyncio.run(pool.dispatch(event, b'{}'))
+    assert pool.dropped[index] == 1 and writers[index].messages == []
+
+def test_notices_reach_every_shard():
+    """回归：通知只发给所属分片，其余分片的查询缓存一直是旧的"""
+    pool, writers = _ready_pool(3)
+    raw = codec.encode(_notice())
+    event = parse_event(_notice())
+    owner = pool.shard_for(event)
+    assert asyncio.run(pool.dispatch(event, raw))
+    for index, writer in enumerate(writers):
+        header, body = _unpack(writer.messages[0])
+        assert header == {'t': 'event' if index == owner else 'notice'}
+        assert body == raw
+    assert pool.forwarded[owner] == 1 and sum(pool.forwarded) == 1
+
+def test_messages_go_only_to_their_shard(group_message):
+    pool, writers = _ready_pool(3)
+    event = parse_event(group_message())
+    assert asyncio.run(pool.dispatch(event, codec.encode(group_message())))
+    assert [len(writer.messages) for writer in writers].count(1) == 1
+
+def test_slow_shard_drops_events_without_blocking_the_reader(group_message):
+    """回归：转发事件时在 OneBot 读取循环中等待 drain，一个分片堵住后所有分片的响应都停下"""
+    pool, writers = _ready_pool(2)
+    pool.buffer_limit = 1000
+    event = parse_event(group_message())
+    index = pool.shard_for(event)
+    writers[index].buffered = 1000
+    assert not asyncio.run(asyncio.wait_for(pool.dispatch(event, codec.encode(group_message())), 0.1))
+    assert pool.dropped[index] == 1 and writers[index].messages == []
+    # 响应仍然转交
+    assert pool.route_response({"echo": f"{index}:x"}, '{}')
+    assert len(writers[index].messages) == 1
+
+def test_worker_reads_responses_while_the_dispatcher_is_blocked(group_message):
+    from dispatcher import EventDispatcher
+    from response_handler import response_handler
+
+    async def main():
+        # 分派器没有启动，block 策略下第二个事件的入队会一直等待
+        dispatcher = EventDispatcher(queue_size=1, policy='block')
+        worker = ShardWorker(0, '127.0.0.1:0', dispatcher, '')
+        ingest = asyncio.ensure_future(worker._ingest())
+        echo, future = response_handler.register_request()
+        worker._reader = asyncio.StreamReader()
+        for _ in range(3):
+            worker._reader.feed_data(_pack({'t': 'event'}, codec.encode(group_message())))
+        worker._reader.feed_data(_pack({'t': 'response'}, codec.encode({"status": "ok", "retcode": 0, "echo": echo})))
+        worker._reader.feed_eof()
+        with pytest.raises(asyncio.IncompleteReadError):
+            await worker._read_loop()
+        response = await asyncio.wait_for(future, 0.1)
+        ingest.cancel()
+        return response, dispatcher.queue.depth
+
+    response, depth = asyncio.run(main())
+    assert response['retcode'] == 0
+    assert depth == 1
+
+def test_worker_invalidates_cache_on_notice_from_another_shard():
+    key = _cache_key(10001, 'get_group_member_list', {'group_id': 30001})
+    onebot_api.cache.set(key, [], ttl=60)
+
+    async def main():
+        worker = ShardWorker(1, '127.0.0.1:0', None, '')
+        worker._reader = asyncio.StreamReader()
+        worker._reader.feed_data(_pack({'t': 'notice'}, codec.encode(_notice())))
+        worker._reader.feed_eof()
+        with pytest.raises(asyncio.IncompleteReadError):
+            await worker._read_loop()
+
+    try:
+        asyncio.run(main())
+        assert key not in onebot_api.cache
+    finally:
+        onebot_api.cache.clear()